@@ -12,6 +12,7 @@ from app.models.profile import UserProfile
 from app.models.program import Program
 from app.models.scholarship import Scholarship
 from app.models.application import Application
+from app.models.document import StoredDocument, CollectionVersion
 
 # this is the Alembic Config object
 config = context.config
@@ -0,0 +1,55 @@
+"""add chat tables
+
+Revision ID: 7c2d9e4f1a3b
+Revises: 46aeaa081be0
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2d9e4f1a3b'
+down_revision: Union[str, Sequence[str], None] = '46aeaa081be0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases bootstrapped with init_db.py already have these tables
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('chat_sessions'):
+        op.create_table('chat_sessions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('session_id', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_chat_sessions_id'), 'chat_sessions', ['id'], unique=False)
+        op.create_index(op.f('ix_chat_sessions_session_id'), 'chat_sessions', ['session_id'], unique=False)
+
+    if not inspector.has_table('chat_messages'):
+        op.create_table('chat_messages',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('session_id', sa.Integer(), nullable=False),
+        sa.Column('role', sa.String(), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['session_id'], ['chat_sessions.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_chat_messages_id'), 'chat_messages', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('chat_messages')
+    op.drop_table('chat_sessions')
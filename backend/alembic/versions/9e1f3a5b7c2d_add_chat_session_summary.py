@@ -0,0 +1,35 @@
+"""add chat session summary
+
+Revision ID: 9e1f3a5b7c2d
+Revises: 7c2d9e4f1a3b
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e1f3a5b7c2d'
+down_revision: Union[str, Sequence[str], None] = '7c2d9e4f1a3b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases bootstrapped with init_db.py may already have the columns
+    columns = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('chat_sessions')}
+
+    if 'summary' not in columns:
+        op.add_column('chat_sessions', sa.Column('summary', sa.Text(), nullable=True))
+    if 'summarized_through' not in columns:
+        op.add_column('chat_sessions', sa.Column('summarized_through', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('chat_sessions', 'summarized_through')
+    op.drop_column('chat_sessions', 'summary')
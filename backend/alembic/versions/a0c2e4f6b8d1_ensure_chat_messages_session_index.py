@@ -0,0 +1,33 @@
+"""add chat messages session index
+
+Revision ID: a0c2e4f6b8d1
+Revises: f8a0b2c4d6e9
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a0c2e4f6b8d1'
+down_revision: Union[str, Sequence[str], None] = 'f8a0b2c4d6e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases bootstrapped with init_db.py may already have it
+    inspector = sa.inspect(op.get_bind())
+    if 'ix_chat_messages_session_id_id' in {ix['name'] for ix in inspector.get_indexes('chat_messages')}:
+        return
+
+    op.create_index('ix_chat_messages_session_id_id', 'chat_messages', ['session_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_chat_messages_session_id_id', table_name='chat_messages')
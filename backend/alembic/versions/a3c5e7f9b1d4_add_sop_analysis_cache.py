@@ -0,0 +1,43 @@
+"""add sop analysis cache
+
+Revision ID: a3c5e7f9b1d4
+Revises: 9e1f3a5b7c2d
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c5e7f9b1d4'
+down_revision: Union[str, Sequence[str], None] = '9e1f3a5b7c2d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases bootstrapped with init_db.py already have this table
+    if sa.inspect(op.get_bind()).has_table('sop_analysis_cache'):
+        return
+
+    op.create_table('sop_analysis_cache',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('text_hash', sa.String(length=64), nullable=False),
+    sa.Column('prompt_version', sa.String(), nullable=False),
+    sa.Column('model', sa.String(), nullable=False),
+    sa.Column('analysis', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('text_hash', 'prompt_version', 'model', name='uq_sop_analysis_cache_key')
+    )
+    op.create_index(op.f('ix_sop_analysis_cache_id'), 'sop_analysis_cache', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_sop_analysis_cache_id'), table_name='sop_analysis_cache')
+    op.drop_table('sop_analysis_cache')
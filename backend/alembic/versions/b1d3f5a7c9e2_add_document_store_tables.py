@@ -0,0 +1,45 @@
+"""add document store tables
+
+Revision ID: b1d3f5a7c9e2
+Revises: a0c2e4f6b8d1
+Create Date: 2026-10-20 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b1d3f5a7c9e2'
+down_revision: Union[str, Sequence[str], None] = 'a0c2e4f6b8d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases bootstrapped with init_db.py already have these tables
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('documents'):
+        op.create_table('documents',
+        sa.Column('collection', sa.String(), nullable=False),
+        sa.Column('doc_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('text', sa.LargeBinary(), nullable=False),
+        sa.PrimaryKeyConstraint('collection', 'doc_id')
+        )
+
+    if not inspector.has_table('collection_versions'):
+        op.create_table('collection_versions',
+        sa.Column('collection', sa.String(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('collection')
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('collection_versions')
+    op.drop_table('documents')
@@ -0,0 +1,44 @@
+"""make sops created_at not null
+
+Revision ID: c2e4a6b8d0f3
+Revises: b1d3f5a7c9e2
+Create Date: 2026-10-20 15:00:00.000000
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2e4a6b8d0f3'
+down_revision: Union[str, Sequence[str], None] = 'b1d3f5a7c9e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The SOP listing pages on (created_at, id); a NULL breaks the cursor
+    # comparison. Undated rows take their last edit time, else sort last.
+    table = sa.table(
+        'sops',
+        sa.column('created_at', sa.DateTime),
+        sa.column('updated_at', sa.DateTime),
+    )
+    op.get_bind().execute(
+        table.update().where(table.c.created_at.is_(None)).values(
+            created_at=sa.func.coalesce(table.c.updated_at, sa.literal(datetime(1970, 1, 1), sa.DateTime))
+        )
+    )
+
+    with op.batch_alter_table('sops') as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('sops') as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=True)
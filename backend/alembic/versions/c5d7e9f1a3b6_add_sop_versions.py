@@ -0,0 +1,45 @@
+"""add sop versions
+
+Revision ID: c5d7e9f1a3b6
+Revises: a3c5e7f9b1d4
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d7e9f1a3b6'
+down_revision: Union[str, Sequence[str], None] = 'a3c5e7f9b1d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases bootstrapped with init_db.py already have this table
+    if sa.inspect(op.get_bind()).has_table('sop_versions'):
+        return
+
+    op.create_table('sop_versions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('sop_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('content', sa.Text(), nullable=True),
+    sa.Column('delta', sa.JSON(), nullable=True),
+    sa.Column('word_count', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['sop_id'], ['sops.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('sop_id', 'version', name='uq_sop_versions_sop_id_version')
+    )
+    op.create_index(op.f('ix_sop_versions_id'), 'sop_versions', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_sop_versions_id'), table_name='sop_versions')
+    op.drop_table('sop_versions')
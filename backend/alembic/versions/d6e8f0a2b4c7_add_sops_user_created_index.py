@@ -0,0 +1,31 @@
+"""add sops user/created_at index
+
+Revision ID: d6e8f0a2b4c7
+Revises: c5d7e9f1a3b6
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd6e8f0a2b4c7'
+down_revision: Union[str, Sequence[str], None] = 'c5d7e9f1a3b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases bootstrapped with init_db.py may already have the index
+    indexes = {i['name'] for i in sa.inspect(op.get_bind()).get_indexes('sops')}
+    if 'ix_sops_user_id_created_at_id' not in indexes:
+        op.create_index('ix_sops_user_id_created_at_id', 'sops', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_sops_user_id_created_at_id', table_name='sops')
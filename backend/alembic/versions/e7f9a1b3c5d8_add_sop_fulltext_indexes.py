@@ -0,0 +1,42 @@
+"""add sop full-text indexes
+
+Revision ID: e7f9a1b3c5d8
+Revises: d6e8f0a2b4c7
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7f9a1b3c5d8'
+down_revision: Union[str, Sequence[str], None] = 'd6e8f0a2b4c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Full-text search falls back to an in-process index on other databases
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_sops_content_fts "
+        "ON sops USING gin (to_tsvector('english', content))"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_sop_templates_template_text_fts "
+        "ON sop_templates USING gin (to_tsvector('english', template_text))"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute("DROP INDEX IF EXISTS ix_sop_templates_template_text_fts")
+    op.execute("DROP INDEX IF EXISTS ix_sops_content_fts")
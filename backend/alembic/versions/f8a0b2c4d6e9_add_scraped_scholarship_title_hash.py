@@ -0,0 +1,79 @@
+"""add scraped scholarship title hash
+
+Revision ID: f8a0b2c4d6e9
+Revises: e7f9a1b3c5d8
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f8a0b2c4d6e9'
+down_revision: Union[str, Sequence[str], None] = 'e7f9a1b3c5d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _title_hash(title: str) -> str:
+    # Same normalization as scraper_service.title_hash
+    normalized = " ".join(title.split()).casefold()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    # The table is created by init_db.py, which already includes the column
+    if not inspector.has_table('scraped_scholarships'):
+        return
+    if 'title_hash' in {c['name'] for c in inspector.get_columns('scraped_scholarships')}:
+        return
+
+    op.add_column('scraped_scholarships', sa.Column('title_hash', sa.String(length=64), nullable=True))
+
+    bind = op.get_bind()
+    table = sa.table(
+        'scraped_scholarships',
+        sa.column('id', sa.Integer),
+        sa.column('source_url', sa.String),
+        sa.column('title', sa.String),
+        sa.column('title_hash', sa.String),
+    )
+    seen = set()
+    hashes = []
+    duplicates = []
+    for row in bind.execute(sa.select(table.c.id, table.c.source_url, table.c.title).order_by(table.c.id)):
+        key = _title_hash(row.title)
+        if (row.source_url, key) in seen:
+            duplicates.append(row.id)
+            continue
+        seen.add((row.source_url, key))
+        hashes.append({'row_id': row.id, 'hash': key})
+
+    if hashes:
+        bind.execute(
+            table.update().where(table.c.id == sa.bindparam('row_id')).values(title_hash=sa.bindparam('hash')),
+            hashes
+        )
+
+    # Keep the first copy of listings that only differed by case or spacing
+    if duplicates:
+        bind.execute(table.delete().where(table.c.id.in_(duplicates)))
+
+    with op.batch_alter_table('scraped_scholarships') as batch_op:
+        batch_op.alter_column('title_hash', existing_type=sa.String(length=64), nullable=False)
+        batch_op.create_unique_constraint(
+            'uq_scraped_scholarships_source_url_title_hash', ['source_url', 'title_hash']
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('scraped_scholarships') as batch_op:
+        batch_op.drop_constraint('uq_scraped_scholarships_source_url_title_hash', type_='unique')
+        batch_op.drop_column('title_hash')
@@ -1,21 +1,24 @@
+import json
+from typing import List
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.api.deps import get_db, get_current_active_user
 from app.models.user import User
-from app.schemas.chat import ChatMessageCreate, ChatMessageResponse
+from app.schemas.chat import ChatMessageCreate, ChatMessageResponse, ChatHistoryResponse
 from app.services.chat_service import chat_service
 
 router = APIRouter()
 
 
 @router.post("/", response_model=ChatMessageResponse)
-def send_message(
+async def send_message(
     message: ChatMessageCreate,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Send a chat message and get AI response."""
-    result = chat_service.chat(
+    result = await chat_service.chat(
         user_id=current_user.id,
         message=message.message,
         session_id=message.session_id
@@ -24,10 +27,56 @@ def send_message(
     return {
         "response": result["response"],
         "sources_count": result["sources_count"],
-        "session_id": message.session_id
+        "session_id": message.session_id,
+        "prompt_tokens": result.get("prompt_tokens")
     }
 
 
+@router.post("/stream")
+async def stream_message(
+    message: ChatMessageCreate,
+    current_user: User = Depends(get_current_active_user),
+):
+    """Send a chat message and stream the AI response as Server-Sent Events.
+    
+    Emits `data: {"delta": ...}` events as tokens arrive, then an
+    `event: done` with sources_count, prompt_tokens and session_id
+    (or `event: error`).
+    """
+    async def event_stream():
+        async for event in chat_service.chat_stream(
+            user_id=current_user.id,
+            message=message.message,
+            session_id=message.session_id
+        ):
+            if "delta" in event:
+                yield f"data: {json.dumps({'delta': event['delta']})}\n\n"
+            elif "error" in event:
+                yield f"event: error\ndata: {json.dumps({'detail': event['error']})}\n\n"
+            else:
+                payload = {
+                    "sources_count": event["sources_count"],
+                    "prompt_tokens": event["prompt_tokens"],
+                    "session_id": message.session_id
+                }
+                yield f"event: done\ndata: {json.dumps(payload)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/history", response_model=List[ChatHistoryResponse])
+def get_history(
+    session_id: str = "default",
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get stored messages of a chat session."""
+    return chat_service.get_history(current_user.id, session_id)
+
+
 @router.delete("/session")
 def clear_session(
     session_id: str = "default",
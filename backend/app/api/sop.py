@@ -1,6 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import base64
+import json
+import logging
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Dict, Any, Optional
 
 from app.api.deps import get_db, get_current_active_user
 from app.models.user import User
@@ -8,31 +16,66 @@ from app.models.sop import SOP
 from app.models.program import Program
 from app.schemas.sop import (
     SOPGenerate, SOPAnalyze, SOPImprove,
-    SOPResponse, SOPAnalysisResponse, SOPCreateUpdate
+    SOPResponse, SOPAnalysisResponse, SOPCreateUpdate, SOPJobResponse, SOPBatchAnalyze,
+    SOPVersionInfo, SOPVersionContent, SOPDiffResponse, SOPListResponse,
+    SOPSearchResult, SOPSimilarRequest
 )
+from app.core.config import settings
+from app.database.session import SessionLocal
+from app.services.llm_client import LLMOverloadedError
 from app.services.sop_service import sop_service
+from app.services.sop_batch_service import sop_batch_service
+from app.services.sop_version_service import sop_version_service
+from app.services.sop_search_service import sop_search_service, SEARCH_KINDS
+from app.services.job_queue import job_queue, TERMINAL_STATUSES
+from app.services.sop_jobs import (
+    SOP_GENERATE_JOB, SOP_IMPROVE_JOB, run_generate_job, run_improve_job
+)
 from app.services import profile_service
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
+job_queue.register(SOP_GENERATE_JOB, run_generate_job)
+job_queue.register(SOP_IMPROVE_JOB, run_improve_job)
 
-@router.post("/generate")
-def generate_sop(
-    data: SOPGenerate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-):
-    """Generate AI-powered SOP based on user profile."""
+JOB_EVENTS_POLL_SECONDS = 0.5
+
+
+def _job_response(job: Dict[str, Any]) -> SOPJobResponse:
+    return SOPJobResponse(
+        job_id=job["id"],
+        type=job["type"],
+        status=job["status"],
+        result=job["result"],
+        error=job["error"],
+        enqueued_at=job["enqueued_at"],
+        started_at=job["started_at"],
+        finished_at=job["finished_at"],
+    )
+
+
+async def _get_user_job(job_id: str, user_id: int) -> Dict[str, Any]:
+    job = await job_queue.get(job_id)
+    if not job or job["user_id"] != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+def _generation_inputs(db: Session, user: User, program_id: Optional[int]):
+    """Profile and program details for a generate job, read in one go so the
+    async handler can run it off the event loop."""
     
     # Get user profile
-    profile = profile_service.get_profile_by_user_id(db, current_user.id)
+    profile = profile_service.get_profile_by_user_id(db, user.id)
     if not profile:
         raise HTTPException(status_code=404, detail="Please create your profile first")
     
     # Get program details if specified
     program_details = None
-    if data.program_id:
-        program = db.query(Program).filter(Program.id == data.program_id).first()
+    if program_id:
+        program = db.query(Program).filter(Program.id == program_id).first()
         if program:
             program_details = {
                 'university_name': program.university_name,
@@ -43,7 +86,7 @@ def generate_sop(
     
     # Prepare user profile data
     user_profile = {
-        'full_name': current_user.full_name,
+        'full_name': user.full_name,
         'field_of_study': profile.field_of_study,
         'highest_degree': profile.highest_degree,
         'gpa': profile.gpa,
@@ -51,49 +94,84 @@ def generate_sop(
         'research_experience': profile.research_experience,
         'extracurriculars': profile.extracurriculars,
     }
+    return user_profile, program_details
+
+
+@router.post("/generate", response_model=SOPJobResponse, status_code=202)
+async def generate_sop(
+    data: SOPGenerate,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Queue generation of an AI-powered SOP based on user profile.
     
-    # Generate SOP
-    sop_text = sop_service.generate_sop(user_profile, program_details)
-    
-    # Save to database
-    sop = SOP(
-        user_id=current_user.id,
-        title=f"SOP for {program_details['program_name'] if program_details else 'Graduate Program'}",
-        content=sop_text,
-        program_id=data.program_id,
-        is_generated=True,
-        word_count=len(sop_text.split())
+    Returns a job; poll /sop/jobs/{job_id} (or stream its events) for the
+    id of the saved SOP.
+    """
+    # Database reads are blocking; keep them off the event loop
+    user_profile, program_details = await asyncio.to_thread(
+        _generation_inputs, db, current_user, data.program_id
     )
-    db.add(sop)
-    db.commit()
-    db.refresh(sop)
     
-    return {
-        "sop_id": sop.id,
-        "content": sop_text,
-        "word_count": len(sop_text.split())
-    }
+    job = await job_queue.submit(SOP_GENERATE_JOB, current_user.id, {
+        "user_profile": user_profile,
+        "program_details": program_details,
+        "program_id": data.program_id,
+    })
+    return _job_response(job)
 
 
-@router.post("/analyze", response_model=SOPAnalysisResponse)
-def analyze_sop(
+@router.post("/analyze/quick")
+def quick_analyze_sop(
     data: SOPAnalyze,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
-    """Analyze SOP and provide detailed feedback."""
+    """Instant local metrics (readability, sentences, paragraphs, clichés, repetition)."""
+    return sop_service.quick_analyze_sop(data.sop_text)
+
+
+@router.post("/analyze/batch")
+async def batch_analyze_sops(
+    data: SOPBatchAnalyze,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Analyze many SOPs at once, streaming results as NDJSON.
     
-    # Analyze SOP
-    analysis = sop_service.analyze_sop(data.sop_text)
+    Each line is {"index", "title", "analysis"} or {"index", "title",
+    "error"} in completion order; the last line is {"done": true,
+    "analyzed", "failed", "saved": [{"index", "sop_id"}]}.
+    """
+    if not data.items:
+        raise HTTPException(status_code=400, detail="No SOPs provided")
+    if len(data.items) > settings.SOP_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.SOP_BATCH_MAX_ITEMS} SOPs per batch"
+        )
     
-    if "error" in analysis:
-        raise HTTPException(status_code=500, detail=analysis["error"])
+    items = [item.model_dump() for item in data.items]
+    
+    async def result_stream():
+        async for result in sop_batch_service.analyze_batch(current_user.id, items):
+            yield json.dumps(result) + "\n"
+    
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
+
+
+def _save_analysis(db: Session, user_id: int, sop_text: str, analysis: Dict[str, Any]):
+    # Resubmitting the same text shouldn't pile up identical rows
+    already_saved = db.query(SOP.id).filter(
+        SOP.user_id == user_id,
+        SOP.content == sop_text,
+        SOP.overall_score.isnot(None)
+    ).first()
+    if already_saved:
+        return
     
-    # Save analysis to database
     sop = SOP(
-        user_id=current_user.id,
+        user_id=user_id,
         title="Analyzed SOP",
-        content=data.sop_text,
+        content=sop_text,
         overall_score=analysis['overall_score'],
         clarity_score=analysis['clarity_score'],
         motivation_score=analysis['motivation_score'],
@@ -109,66 +187,216 @@ def analyze_sop(
     )
     db.add(sop)
     db.commit()
+
+
+def _save_analysis_in_session(user_id: int, sop_text: str, analysis: Dict[str, Any]):
+    db = SessionLocal()
+    try:
+        _save_analysis(db, user_id, sop_text, analysis)
+    finally:
+        db.close()
+
+
+@router.post("/analyze/stream")
+async def stream_analyze_sop(
+    data: SOPAnalyze,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Analyze SOP and stream the feedback as Server-Sent Events.
+    
+    Emits `event: metrics` with the local text metrics immediately,
+    `event: field` ({"name", "value"}) for each score or feedback list as
+    the LLM produces it, then `event: done` with the full analysis (or
+    `event: error`). The analysis is saved like /sop/analyze.
+    """
+    async def event_stream():
+        try:
+            async for event in sop_service.analyze_sop_stream(data.sop_text):
+                if "metrics" in event:
+                    yield f"event: metrics\ndata: {json.dumps(event['metrics'])}\n\n"
+                elif "field" in event:
+                    payload = {"name": event["field"], "value": event["value"]}
+                    yield f"event: field\ndata: {json.dumps(payload)}\n\n"
+                elif "error" in event:
+                    yield f"event: error\ndata: {json.dumps({'detail': event['error']})}\n\n"
+                else:
+                    analysis = event["analysis"]
+                    await asyncio.to_thread(
+                        _save_analysis_in_session, current_user.id, data.sop_text, analysis
+                    )
+                    yield f"event: done\ndata: {json.dumps(analysis)}\n\n"
+        except LLMOverloadedError:
+            # Headers are already sent, so report it in-stream rather than as a 503
+            yield f"event: error\ndata: {json.dumps({'detail': 'AI service is busy, please retry shortly'})}\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@router.post("/analyze", response_model=SOPAnalysisResponse)
+async def analyze_sop(
+    data: SOPAnalyze,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Analyze SOP and provide detailed feedback."""
+    
+    # Analyze SOP
+    analysis = await sop_service.analyze_sop(data.sop_text)
+    
+    if "error" in analysis:
+        raise HTTPException(status_code=500, detail=analysis["error"])
+    
+    # Save analysis to database
+    await asyncio.to_thread(_save_analysis, db, current_user.id, data.sop_text, analysis)
     
     return analysis
 
 
-@router.post("/improve/{sop_id}")
-def improve_sop(
+@router.post("/improve/{sop_id}", response_model=SOPJobResponse, status_code=202)
+async def improve_sop(
     sop_id: int,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Generate improved version of SOP."""
+    """Queue generation of an improved version of SOP."""
     
-    # Get SOP
-    sop = db.query(SOP).filter(
-        SOP.id == sop_id,
-        SOP.user_id == current_user.id
-    ).first()
+    # Raises 404 if the SOP isn't the user's; blocking, so off the event loop
+    await asyncio.to_thread(_get_user_sop, db, sop_id, current_user.id)
     
-    if not sop:
-        raise HTTPException(status_code=404, detail="SOP not found")
+    job = await job_queue.submit(SOP_IMPROVE_JOB, current_user.id, {"sop_id": sop_id})
+    return _job_response(job)
+
+
+@router.get("/jobs/{job_id}", response_model=SOPJobResponse)
+async def get_sop_job(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the status of a generate/improve job."""
+    return _job_response(await _get_user_job(job_id, current_user.id))
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_sop_job(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream job status changes as Server-Sent Events until it finishes."""
+    job = await _get_user_job(job_id, current_user.id)
     
-    # Prepare analysis for improvement
-    analysis = {
-        'weaknesses': sop.weaknesses or [],
-        'suggestions': sop.suggestions or [],
-    }
+    async def event_stream():
+        current = job
+        last_status = None
+        while True:
+            if current is None:
+                yield f"event: error\ndata: {json.dumps({'detail': 'Job expired'})}\n\n"
+                return
+            if current["status"] != last_status:
+                last_status = current["status"]
+                yield f"event: status\ndata: {_job_response(current).model_dump_json()}\n\n"
+            if current["status"] in TERMINAL_STATUSES:
+                return
+            await asyncio.sleep(JOB_EVENTS_POLL_SECONDS)
+            current = await job_queue.get(job_id)
     
-    # Generate improved version
-    improved_text = sop_service.improve_sop(sop.content, analysis)
-    
-    # Save as new version
-    new_sop = SOP(
-        user_id=current_user.id,
-        title=f"{sop.title} (Improved v{sop.version + 1})",
-        content=improved_text,
-        program_id=sop.program_id,
-        is_generated=True,
-        version=sop.version + 1,
-        word_count=len(improved_text.split())
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
-    db.add(new_sop)
-    db.commit()
-    db.refresh(new_sop)
-    
-    return {
-        "sop_id": new_sop.id,
-        "content": improved_text,
-        "word_count": len(improved_text.split())
-    }
 
 
-@router.get("/", response_model=List[SOPResponse])
+# Columns returned by the listing; content and feedback lists come from GET /sop/{id}
+SOP_SUMMARY_COLUMNS = (
+    SOP.id, SOP.title, SOP.program_id,
+    SOP.overall_score, SOP.clarity_score, SOP.motivation_score,
+    SOP.coherence_score, SOP.relevance_score, SOP.grammar_score,
+    SOP.word_count, SOP.reading_level, SOP.is_generated, SOP.version, SOP.created_at,
+)
+
+
+def _encode_cursor(created_at: datetime, sop_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), sop_id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, sop_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(created_at), int(sop_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/", response_model=SOPListResponse)
 def get_user_sops(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Get all SOPs for current user."""
+    """Get the current user's SOPs, newest first, one page at a time.
+    
+    Returns summaries only; fetch GET /sop/{id} for the full text. Pass
+    next_cursor back as cursor to get the following page.
+    """
+    
+    query = db.query(*SOP_SUMMARY_COLUMNS).filter(SOP.user_id == current_user.id)
+    if cursor:
+        created_at, sop_id = _decode_cursor(cursor)
+        query = query.filter(or_(
+            SOP.created_at < created_at,
+            and_(SOP.created_at == created_at, SOP.id < sop_id)
+        ))
+    
+    rows = query.order_by(SOP.created_at.desc(), SOP.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].created_at, rows[-1].id)
     
-    sops = db.query(SOP).filter(SOP.user_id == current_user.id).order_by(SOP.created_at.desc()).all()
-    return sops
+    return {"items": rows, "next_cursor": next_cursor}
+
+
+@router.get("/search", response_model=List[SOPSearchResult])
+def search_sops(
+    q: str = Query(..., min_length=1),
+    kind: str = Query("all", pattern="^(all|sop|template)$"),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Keyword search over your SOPs and/or the SOP templates, best match first."""
+    return sop_search_service.search(db, current_user.id, q, kind=kind, limit=limit)
+
+
+@router.post("/search/similar", response_model=List[SOPSearchResult])
+def find_similar_sops(
+    data: SOPSimilarRequest,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Find SOPs and/or templates similar in meaning to one of your SOPs or to given text."""
+    
+    if data.kind not in SEARCH_KINDS:
+        raise HTTPException(status_code=400, detail="kind must be all, sop or template")
+    
+    if data.sop_id is not None:
+        sop = db.query(SOP.content).filter(
+            SOP.id == data.sop_id,
+            SOP.user_id == current_user.id
+        ).first()
+        if not sop:
+            raise HTTPException(status_code=404, detail="SOP not found")
+        text = sop.content
+    elif data.text:
+        text = data.text
+    else:
+        raise HTTPException(status_code=400, detail="Provide sop_id or text")
+    
+    return sop_search_service.similar(
+        db, current_user.id, text, kind=data.kind, limit=data.limit, exclude_sop_id=data.sop_id
+    )
 
 
 @router.get("/{sop_id}", response_model=SOPResponse)
@@ -190,6 +418,67 @@ def get_sop(
     return sop
 
 
+def _get_user_sop(db: Session, sop_id: int, user_id: int) -> SOP:
+    sop = db.query(SOP).filter(
+        SOP.id == sop_id,
+        SOP.user_id == user_id
+    ).first()
+    if not sop:
+        raise HTTPException(status_code=404, detail="SOP not found")
+    return sop
+
+
+@router.get("/{sop_id}/versions", response_model=List[SOPVersionInfo])
+def get_sop_versions(
+    sop_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """List the versions of an SOP, oldest first."""
+    sop = _get_user_sop(db, sop_id, current_user.id)
+    return sop_version_service.list_versions(db, sop)
+
+
+@router.get("/{sop_id}/versions/{version}", response_model=SOPVersionContent)
+def get_sop_version(
+    sop_id: int,
+    version: int,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get the full text of one version of an SOP."""
+    sop = _get_user_sop(db, sop_id, current_user.id)
+    content = sop_version_service.get_content(db, sop, version)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Version not found")
+    return {"version": version, "content": content}
+
+
+@router.get("/{sop_id}/diff", response_model=SOPDiffResponse)
+def diff_sop_versions(
+    sop_id: int,
+    from_version: int,
+    to_version: Optional[int] = None,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get only the regions that changed between two versions (default: to latest)."""
+    sop = _get_user_sop(db, sop_id, current_user.id)
+    if to_version is None:
+        to_version = sop.version
+    
+    old = sop_version_service.get_content(db, sop, from_version)
+    new = sop_version_service.get_content(db, sop, to_version)
+    if old is None or new is None:
+        raise HTTPException(status_code=404, detail="Version not found")
+    
+    return {
+        "from_version": from_version,
+        "to_version": to_version,
+        "changes": sop_version_service.diff(old, new),
+    }
+
+
 @router.put("/{sop_id}")
 def update_sop(
     sop_id: int,
@@ -199,20 +488,25 @@ def update_sop(
 ):
     """Update SOP."""
     
+    # Lock the row so concurrent edits take version numbers one after another
     sop = db.query(SOP).filter(
         SOP.id == sop_id,
         SOP.user_id == current_user.id
-    ).first()
+    ).with_for_update().first()
     
     if not sop:
         raise HTTPException(status_code=404, detail="SOP not found")
     
     sop.title = data.title
-    sop.content = data.content
     sop.program_id = data.program_id
-    sop.word_count = len(data.content.split())
+    sop_version_service.record_version(db, sop, data.content)
     
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Databases without row locks (SQLite) can still race on the version number
+        db.rollback()
+        raise HTTPException(status_code=409, detail="SOP was modified concurrently, please retry")
     return {"message": "SOP updated successfully"}
 
 
@@ -234,5 +528,10 @@ def delete_sop(
     
     db.delete(sop)
     db.commit()
+    try:
+        sop_search_service.remove_sops([sop_id])
+    except Exception as e:
+        # The delete is committed; similar() also drops vectors of missing SOPs
+        logger.warning(f"Could not remove SOP {sop_id} from the similarity index: {e}")
     
     return {"message": "SOP deleted successfully"}
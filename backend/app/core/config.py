@@ -31,6 +31,45 @@ class Settings(BaseSettings):
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
     
+    # SOP analysis cache (persisted; per-worker LRU in front)
+    SOP_ANALYSIS_CACHE_SIZE: int = 512
+    SOP_ANALYSIS_REPAIR_ATTEMPTS: int = 1  # re-asks for fields that fail validation
+    
+    # SOP version history (deltas between periodic full snapshots)
+    SOP_SNAPSHOT_INTERVAL: int = 10
+    
+    # Scholarship scraping
+    # Off: canned listings. On: fetch the real sites; review their terms of
+    # service and check the parsers' selectors against live pages first
+    SCRAPER_LIVE_SOURCES: bool = False
+    SCRAPER_RESPECT_ROBOTS: bool = True
+    SCRAPER_TIMEOUT_SECONDS: float = 15.0
+    SCRAPER_MAX_CONNECTIONS: int = 20
+    SCRAPER_PER_HOST_CONCURRENCY: int = 2
+    SCRAPER_MAX_RETRIES: int = 2
+    SCRAPER_RETRY_BASE_SECONDS: float = 1.0
+    SCRAPER_PARSE_PROCESSES: int = 2
+    SCRAPER_USER_AGENT: str = "MastersAbroadBot/1.0"
+    SCRAPER_AI_MAX_CHARS: int = 6000  # page text sent to the LLM by scrape_with_ai
+    # Conditional-request cache: validators in SQLite, gzipped bodies under pages/
+    SCRAPER_CACHE_ENABLED: bool = True
+    SCRAPER_CACHE_DIR: str = "scrape_cache"
+    
+    # SOP/template search
+    SOP_SEARCH_COLLECTION: str = "sop_search"  # vector collection for similarity search
+    SOP_SEARCH_INDEX_USERS: int = 256  # per-user keyword indexes kept when not on Postgres
+    
+    # Batch SOP analysis
+    SOP_BATCH_MAX_ITEMS: int = 100
+    SOP_BATCH_PROCESSES: int = 4  # worker processes for the local metrics pass
+    SOP_BATCH_LLM_CONCURRENCY: int = 8  # LLM analyses in flight per batch
+    
+    # Background jobs (SOP generation/improvement)
+    JOB_QUEUE_BACKEND: str = "redis"  # "redis" or "local" (in-process)
+    JOB_QUEUE_LOCAL_FALLBACK: bool = False  # dev only: use "local" if Redis is down (breaks multi-replica)
+    JOB_QUEUE_WORKERS: int = 8  # workers per API process
+    JOB_TTL_SECONDS: int = 86400  # how long finished job status is kept
+    
     # JWT
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
@@ -40,11 +79,72 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: Optional[str] = None
     GROQ_API_KEY: Optional[str] = None
     
+    # LLM client
+    LLM_PROVIDER: str = "groq"  # "groq" or "stub" (offline, for load tests)
+    LLM_MODEL: str = "llama-3.3-70b-versatile"
+    LLM_MAX_CONCURRENCY: int = 256  # concurrent upstream calls per worker
+    LLM_MAX_QUEUE: int = 1024  # callers allowed to wait for a slot before rejecting
+    LLM_TIMEOUT_SECONDS: float = 60.0
+    LLM_RATE_LIMIT_RPM: int = 30  # provider requests/minute for the key's tier; 0 disables
+    LLM_RATE_LIMIT_TPM: int = 12000  # provider tokens/minute for the key's tier; 0 disables
+    LLM_RATE_LIMIT_PROCESSES: int = 1  # processes sharing the key (workers x replicas); each gets an even split
+    LLM_MAX_WAIT_SECONDS: float = 20.0  # longest chat/analysis calls queue before a 503
+    LLM_BATCH_MAX_WAIT_SECONDS: float = 300.0  # same for SOP generation and background lanes
+    LLM_PRIORITY_AGING_SECONDS: float = 30.0  # queued time worth one priority lane
+    LLM_MAX_RETRIES: int = 3
+    LLM_RETRY_BASE_SECONDS: float = 0.5
+    LLM_RETRY_MAX_SECONDS: float = 8.0
+    
+    # Stub LLM provider (log-normal timing around these medians)
+    LLM_STUB_TTFT_MS: float = 300.0
+    LLM_STUB_TOKENS_PER_SEC: float = 250.0
+    LLM_STUB_LATENCY_SIGMA: float = 0.3
+    LLM_STUB_OUTPUT_TOKENS: int = 300
+    LLM_STUB_SEED: int = 42
+    
+    # Chat history (persisted; small per-worker LRU of recent windows)
+    CHAT_HISTORY_WINDOW: int = 20  # cap on unsummarised messages sent back to the LLM
+    CHAT_HISTORY_CACHE_SIZE: int = 1000  # sessions cached per worker
+    CHAT_SESSION_TTL_SECONDS: int = 1800  # idle time before a cached session is dropped
+    CHAT_SUMMARY_TRIGGER: int = 12  # unsummarised messages that trigger compaction
+    CHAT_SUMMARY_KEEP: int = 4  # newest messages kept verbatim after compaction
+    CHAT_SUMMARY_MAX_TOKENS: int = 300
+    
+    # Chat prompt assembly
+    CHAT_RETRIEVAL_LIMIT: int = 5  # candidate passages; the token budget decides how many are sent
+    CHAT_PROMPT_TOKEN_BUDGET: int = 3000
+    CHAT_HISTORY_TOKEN_SHARE: float = 0.4  # share of the free budget reserved for history
+    
+    # Semantic answer cache for first-turn chat questions
+    CHAT_CACHE_ENABLED: bool = True
+    CHAT_CACHE_MAX_ENTRIES: int = 1000
+    CHAT_CACHE_SIMILARITY: float = 0.92  # cosine similarity needed to reuse an answer
+    
     # Qdrant
     QDRANT_HOST: str = "localhost"
     QDRANT_PORT: int = 6333
     QDRANT_COLLECTION_NAME: str = "masters_abroad_kb"
 
+    # Vector store backend: "qdrant" or "numpy" (in-process, no server needed)
+    VECTOR_BACKEND: str = "qdrant"
+    VECTOR_INDEX_PATH: str = "vector_index"
+    # Full document text lives here, not in vector payloads. Every replica
+    # searching the same vector index must share it: set DOC_STORE_URL to the
+    # app database for multi-replica deployments. Unset, a SQLite file at
+    # DOC_STORE_PATH is used, which only suits a single replica.
+    DOC_STORE_URL: Optional[str] = None
+    DOC_STORE_PATH: str = "vector_index/documents.db"
+    # "none", "scalar" (int8) or "binary"; quantized candidates are rescored
+    # with full-precision vectors, fetching limit * oversampling of them
+    VECTOR_QUANTIZATION: str = "none"
+    VECTOR_RESCORE_OVERSAMPLING: float = 3.0
+
+    # Hybrid retrieval: BM25 + dense search fused with reciprocal-rank fusion
+    HYBRID_SEARCH_ENABLED: bool = True
+    HYBRID_RRF_K: int = 60
+    LEXICAL_INDEX_REFRESH_SECONDS: int = 300
+    HYBRID_SEARCH_THREADS: int = 4  # BM25 searches run beside the dense search
+
     # EMAIL (SMTP)
     SMTP_USER: Optional[str] = None
     SMTP_PASSWORD: Optional[str] = None
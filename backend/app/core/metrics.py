@@ -0,0 +1,62 @@
+import threading
+from collections import defaultdict, deque
+from typing import Dict, Any
+
+import numpy as np
+
+
+class Metrics:
+    """
+    Minimal in-process metrics registry exposed to admins at GET /metrics.
+
+    Counters only go up, gauges hold the last value set, and timings keep
+    a sliding window of recent observations summarised on read.
+    """
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._window = window
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._gauges: Dict[str, float] = {}
+        self._observations: Dict[str, deque] = {}
+
+    def increment(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] += value
+
+    def set_gauge(self, name: str, value: float):
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            if name not in self._observations:
+                self._observations[name] = deque(maxlen=self._window)
+            self._observations[name].append(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            observations = {name: list(values) for name, values in self._observations.items()}
+            result = {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+            }
+
+        summaries = {}
+        for name, values in observations.items():
+            if not values:
+                continue
+            data = np.asarray(values, dtype=np.float64)
+            summaries[name] = {
+                "count": len(data),
+                "avg": round(float(data.mean()), 3),
+                "p50": round(float(np.percentile(data, 50)), 3),
+                "p95": round(float(np.percentile(data, 95)), 3),
+                "max": round(float(data.max()), 3),
+            }
+        result["timings"] = summaries
+        return result
+
+
+# Singleton instance
+metrics = Metrics()
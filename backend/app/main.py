@@ -1,9 +1,18 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.api.deps import get_current_admin_user
 from app.api import auth, users, programs, scholarships, applications, chat, recommendations, scraper, sop, admission
 from app.scheduler import start_scheduler
+from app.services.llm_client import LLMOverloadedError
+from app.services.job_queue import job_queue
+from app.services.sop_batch_service import sop_batch_service
+from app.services.scraper_service import scraper_service
+from app.services.sop_search_service import sop_search_service
+from app.services.vector_service import vector_service
 from datetime import datetime
 
 
@@ -11,8 +20,14 @@ from datetime import datetime
 async def lifespan(app: FastAPI):
     # Startup
     scheduler = start_scheduler()
+    await job_queue.start()
     yield
     # Shutdown
+    await job_queue.stop()
+    sop_batch_service.shutdown()
+    scraper_service.shutdown()
+    sop_search_service.shutdown()
+    vector_service.close()
     scheduler.shutdown()
 
 
@@ -37,6 +52,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(LLMOverloadedError)
+async def llm_overloaded_handler(request: Request, exc: LLMOverloadedError):
+    """Shed load when the LLM wait queue is full instead of queueing forever."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "AI service is busy, please retry shortly"},
+        headers={"Retry-After": "5"}
+    )
+
 # Include routers
 app.include_router(auth.router, prefix=f"{settings.API_V1_PREFIX}/auth", tags=["Authentication"])
 app.include_router(users.router, prefix=f"{settings.API_V1_PREFIX}/users", tags=["Users"])
@@ -68,3 +92,8 @@ def health_check():
         "version": "1.0.0"
     }
 
+
+@app.get("/metrics", dependencies=[Depends(get_current_admin_user)])
+def get_metrics():
+    """In-process performance metrics (counters, gauges, latency summaries); admins only."""
+    return metrics.snapshot()
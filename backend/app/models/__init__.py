@@ -6,6 +6,7 @@ from .profile import UserProfile
 from .program import Program
 from .scholarship import Scholarship
 from .application import Application, ApplicationStatus
+from .chat import ChatSession, ChatMessage
 
 __all__ = [
     "Base",
@@ -15,5 +16,7 @@ __all__ = [
     "Program",
     "Scholarship",
     "Application",
-    "ApplicationStatus"
+    "ApplicationStatus",
+    "ChatSession",
+    "ChatMessage"
 ]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database.session import Base
@@ -10,6 +10,8 @@ class ChatSession(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     session_id = Column(String, nullable=False, index=True)
+    summary = Column(Text)  # rolling summary of turns older than the recent window
+    summarized_through = Column(Integer)  # last ChatMessage.id folded into summary
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -26,3 +28,8 @@ class ChatMessage(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     
     session = relationship("ChatSession", back_populates="messages")
+    
+    # Recent-window lookups read the newest messages of one session
+    __table_args__ = (
+        Index("ix_chat_messages_session_id_id", "session_id", "id"),
+    )
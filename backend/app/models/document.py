@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, LargeBinary, String
+from app.database.session import Base
+
+
+class StoredDocument(Base):
+    """Full text of an indexed document, kept out of the vector store."""
+    __tablename__ = "documents"
+
+    collection = Column(String, primary_key=True)
+    doc_id = Column(Integer, primary_key=True, autoincrement=False)
+    text = Column(LargeBinary, nullable=False)  # zlib-compressed UTF-8
+
+
+class CollectionVersion(Base):
+    """Counter bumped whenever a vector collection's contents change."""
+    __tablename__ = "collection_versions"
+
+    collection = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False)
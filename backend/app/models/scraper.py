@@ -1,15 +1,20 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, UniqueConstraint
 from datetime import datetime
 from app.database.session import Base
 
 
 class ScrapedScholarship(Base):
     __tablename__ = "scraped_scholarships"
+    __table_args__ = (
+        # One row per listing per source; scraper inserts rely on it
+        UniqueConstraint("source_url", "title_hash", name="uq_scraped_scholarships_source_url_title_hash"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     source_url = Column(String, nullable=False)
     source_name = Column(String, nullable=False)
     title = Column(String, nullable=False)
+    title_hash = Column(String(64), nullable=False)  # sha256 of the normalized title
     description = Column(Text)
     amount = Column(String)
     deadline = Column(String)
@@ -1,8 +1,18 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, JSON, ForeignKey, Boolean
+from sqlalchemy import (
+    Column, Integer, String, Text, DateTime, Float, JSON, ForeignKey, Boolean,
+    UniqueConstraint, Index, func, literal_column
+)
+from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database.session import Base
 
 
+def english_tsvector(column):
+    """Full-text document for a text column; queries must use the same
+    expression for Postgres to use the GIN indexes below."""
+    return func.to_tsvector(literal_column("'english'"), column)
+
+
 class SOP(Base):
     __tablename__ = "sops"
     
@@ -31,8 +41,37 @@ class SOP(Base):
     is_generated = Column(Boolean, default=False)  # True if AI-generated
     version = Column(Integer, default=1)  # Version tracking
     
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # listing cursor key
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    versions = relationship("SOPVersion", back_populates="sop", cascade="all, delete-orphan")
+    
+    # Newest-first listing of one user's SOPs, paginated by (created_at, id)
+    __table_args__ = (
+        Index("ix_sops_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index(
+            "ix_sops_content_fts", english_tsvector(content), postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+    )
+
+
+class SOPVersion(Base):
+    """One entry in an SOP's history: a full snapshot or a delta on the previous version."""
+    __tablename__ = "sop_versions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    sop_id = Column(Integer, ForeignKey("sops.id"), nullable=False)
+    version = Column(Integer, nullable=False)
+    content = Column(Text)  # full text, snapshots only
+    delta = Column(JSON)  # [[start, end, text], ...] edits to the previous version
+    word_count = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    sop = relationship("SOP", back_populates="versions")
+    
+    __table_args__ = (
+        UniqueConstraint("sop_id", "version", name="uq_sop_versions_sop_id_version"),
+    )
 
 
 class SOPTemplate(Base):
@@ -45,3 +84,24 @@ class SOPTemplate(Base):
     field_of_study = Column(String)
     country = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index(
+            "ix_sop_templates_template_text_fts", english_tsvector(template_text), postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+    )
+
+
+class SOPAnalysisCache(Base):
+    __tablename__ = "sop_analysis_cache"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    text_hash = Column(String(64), nullable=False)  # sha256 of whitespace-normalised SOP text
+    prompt_version = Column(String, nullable=False)
+    model = Column(String, nullable=False)
+    analysis = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint("text_hash", "prompt_version", "model", name="uq_sop_analysis_cache_key"),
+    )
@@ -12,6 +12,7 @@ class ChatMessageResponse(BaseModel):
     response: str
     sources_count: int
     session_id: str
+    prompt_tokens: Optional[int] = None
 
 
 class ChatHistoryResponse(BaseModel):
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
@@ -12,6 +12,15 @@ class SOPAnalyze(BaseModel):
     sop_text: str
 
 
+class SOPBatchItem(BaseModel):
+    sop_text: str
+    title: Optional[str] = None  # e.g. the student's name, echoed back in results
+
+
+class SOPBatchAnalyze(BaseModel):
+    items: List[SOPBatchItem]
+
+
 class SOPImprove(BaseModel):
     sop_id: int
 
@@ -29,6 +38,18 @@ class SOPAnalysisResponse(BaseModel):
     word_count: int
     reading_level: str
     summary: Optional[str] = None
+    metrics: Optional[Dict[str, Any]] = None  # local readability/structure metrics
+
+
+class SOPJobResponse(BaseModel):
+    job_id: str
+    type: str
+    status: str  # queued, running, completed or failed
+    result: Optional[Dict[str, Any]] = None  # {"sop_id", "word_count"} (+ "version" for improve) once completed
+    error: Optional[str] = None
+    enqueued_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
 
 
 class SOPResponse(BaseModel):
@@ -39,12 +60,78 @@ class SOPResponse(BaseModel):
     overall_score: Optional[float]
     word_count: Optional[int]
     is_generated: bool
+    version: Optional[int] = None
     created_at: datetime
     
     class Config:
         from_attributes = True
 
 
+class SOPSummary(BaseModel):
+    id: int
+    title: str
+    program_id: Optional[int]
+    overall_score: Optional[float]
+    clarity_score: Optional[float]
+    motivation_score: Optional[float]
+    coherence_score: Optional[float]
+    relevance_score: Optional[float]
+    grammar_score: Optional[float]
+    word_count: Optional[int]
+    reading_level: Optional[str]
+    is_generated: Optional[bool]
+    version: Optional[int]
+    created_at: Optional[datetime]
+    
+    class Config:
+        from_attributes = True
+
+
+class SOPListResponse(BaseModel):
+    items: List[SOPSummary]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page
+
+
+class SOPSearchResult(BaseModel):
+    kind: str  # sop or template
+    id: int
+    title: str
+    score: float
+    snippet: str
+
+
+class SOPSimilarRequest(BaseModel):
+    sop_id: Optional[int] = None  # one of sop_id or text
+    text: Optional[str] = None
+    kind: str = "all"  # all, sop or template
+    limit: int = Field(5, ge=1, le=50)
+
+
+class SOPVersionInfo(BaseModel):
+    version: int
+    word_count: Optional[int]
+    created_at: Optional[datetime]
+
+
+class SOPVersionContent(BaseModel):
+    version: int
+    content: str
+
+
+class SOPDiffChange(BaseModel):
+    op: str  # insert, delete or replace
+    old_start: int  # character offsets in the from_version text
+    old_end: int
+    old_text: str
+    new_text: str
+
+
+class SOPDiffResponse(BaseModel):
+    from_version: int
+    to_version: int
+    changes: List[SOPDiffChange]
+
+
 class SOPCreateUpdate(BaseModel):
     title: str
     content: str
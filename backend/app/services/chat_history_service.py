@@ -0,0 +1,275 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Dict, Tuple, Optional
+
+from sqlalchemy import func
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.database.session import SessionLocal
+from app.models.chat import ChatSession, ChatMessage
+
+logger = logging.getLogger(__name__)
+
+
+class ChatHistoryStore:
+    """
+    Chat history persisted in ChatSession/ChatMessage.
+
+    Older turns of a session are folded into ChatSession.summary (see
+    ChatService); the context of a session is that summary plus the
+    messages after summarized_through, capped at CHAT_HISTORY_WINDOW.
+    Between compactions that message list only grows at the end, so the
+    prompt prefix built from it stays the same from turn to turn.
+
+    Each worker keeps a small LRU of recent session contexts so an active
+    conversation doesn't reload its messages on every turn. Other workers
+    and replicas write to the same sessions, so a cached context is only
+    used after one indexed query confirms the session's newest message id
+    and summary position still match it. The LRU is capped at
+    CHAT_HISTORY_CACHE_SIZE sessions and entries idle for longer than
+    CHAT_SESSION_TTL_SECONDS are dropped, so memory stays flat no matter
+    how many users chat.
+    """
+
+    def __init__(self):
+        self.window = settings.CHAT_HISTORY_WINDOW
+        self.max_sessions = settings.CHAT_HISTORY_CACHE_SIZE
+        self.ttl = settings.CHAT_SESSION_TTL_SECONDS
+        self._lock = threading.Lock()
+        # (user_id, session_id) -> (last_access, (summary, messages, marker)), where
+        # marker is (summarized_through, newest message id) when the entry was built
+        self._cache: "OrderedDict[Tuple[int, str], Tuple[float, Tuple[Optional[str], List[Dict[str, str]], Tuple]]]" = OrderedDict()
+
+    def _cache_get(self, key: Tuple[int, str]):
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            self._cache[key] = (now, entry[1])
+            self._cache.move_to_end(key)
+            summary, messages, marker = entry[1]
+            return summary, list(messages), marker
+
+    def _cache_put(
+        self,
+        key: Tuple[int, str],
+        summary: Optional[str],
+        messages: List[Dict[str, str]],
+        marker: Tuple
+    ):
+        now = time.monotonic()
+        with self._lock:
+            self._cache[key] = (now, (summary, messages[-self.window:], marker))
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_sessions:
+                self._cache.popitem(last=False)
+            metrics.set_gauge("chat.history.cached_sessions", len(self._cache))
+
+    def _evict_idle(self, now: float):
+        """Drop sessions idle past the TTL; the LRU keeps them in access order."""
+        while self._cache:
+            key, (last_access, _) = next(iter(self._cache.items()))
+            if now - last_access < self.ttl:
+                break
+            self._cache.popitem(last=False)
+
+    def _cache_drop(self, key: Tuple[int, str]):
+        with self._lock:
+            self._cache.pop(key, None)
+
+    @staticmethod
+    def _session_state(db, user_id: int, session_id: str):
+        """(id, summary, summarized_through, newest message id) of a session, or None."""
+        return db.query(
+            ChatSession.id,
+            ChatSession.summary,
+            ChatSession.summarized_through,
+            func.max(ChatMessage.id)
+        ).outerjoin(
+            ChatMessage, ChatMessage.session_id == ChatSession.id
+        ).filter(
+            ChatSession.user_id == user_id,
+            ChatSession.session_id == session_id
+        ).group_by(ChatSession.id).first()
+
+    def get_context(self, user_id: int, session_id: str) -> Tuple[Optional[str], List[Dict[str, str]]]:
+        """Return (summary, messages not yet summarised, oldest first)."""
+        key = (user_id, session_id)
+        cached = self._cache_get(key)
+        db = SessionLocal()
+        try:
+            state = self._session_state(db, user_id, session_id)
+            marker = (state[2], state[3]) if state else (None, None)
+            if cached is not None:
+                summary, messages, cached_marker = cached
+                if cached_marker == marker:
+                    metrics.increment("chat.history.cache_hits")
+                    return summary, messages
+                metrics.increment("chat.history.cache_stale")
+            else:
+                metrics.increment("chat.history.cache_misses")
+
+            rows = []
+            if state and state[3] is not None:
+                # Stop at the id the marker saw so the cached window matches it exactly
+                rows = (
+                    db.query(ChatMessage.role, ChatMessage.content)
+                    .filter(
+                        ChatMessage.session_id == state[0],
+                        ChatMessage.id > (state[2] or 0),
+                        ChatMessage.id <= state[3]
+                    )
+                    .order_by(ChatMessage.id.desc())
+                    .limit(self.window)
+                    .all()
+                )
+        finally:
+            db.close()
+
+        summary = state[1] if state else None
+        messages = [{"role": role, "content": content} for role, content in reversed(rows)]
+        self._cache_put(key, summary, messages, marker)
+        return summary, messages
+
+    def append_turn(self, user_id: int, session_id: str, user_message: str, reply: str):
+        """Persist a user/assistant exchange in one transaction."""
+        key = (user_id, session_id)
+        cached = self._cache_get(key)
+        db = SessionLocal()
+        try:
+            session = db.query(ChatSession).filter(
+                ChatSession.user_id == user_id,
+                ChatSession.session_id == session_id
+            ).first()
+            if not session:
+                session = ChatSession(user_id=user_id, session_id=session_id)
+                db.add(session)
+                db.flush()
+
+            now = datetime.utcnow()
+            question = ChatMessage(session_id=session.id, role="user", content=user_message, created_at=now)
+            answer = ChatMessage(session_id=session.id, role="assistant", content=reply, created_at=now)
+            db.add_all([question, answer])
+            session.updated_at = now
+            db.commit()
+
+            if cached is not None:
+                summary, messages, (summarized_through, last_id) = cached
+                # Extend the cached window only if this turn is all that was added since
+                added = db.query(func.count(ChatMessage.id)).filter(
+                    ChatMessage.session_id == session.id,
+                    ChatMessage.id > (last_id or 0)
+                ).scalar()
+                if added == 2:
+                    messages.extend([
+                        {"role": "user", "content": user_message},
+                        {"role": "assistant", "content": reply},
+                    ])
+                    self._cache_put(key, summary, messages, (summarized_through, answer.id))
+                else:
+                    self._cache_drop(key)
+        finally:
+            db.close()
+
+    def get_unsummarized(
+        self, user_id: int, session_id: str, keep: int
+    ) -> Optional[Tuple[Optional[str], Optional[int], List[ChatMessage]]]:
+        """Summary state and the messages to fold into it, leaving the newest keep.
+
+        Returns (summary, summarized_through, messages) or None when there
+        is nothing to fold.
+        """
+        db = SessionLocal()
+        try:
+            session = db.query(ChatSession).filter(
+                ChatSession.user_id == user_id,
+                ChatSession.session_id == session_id
+            ).first()
+            if not session:
+                return None
+            messages = (
+                db.query(ChatMessage)
+                .filter(
+                    ChatMessage.session_id == session.id,
+                    ChatMessage.id > (session.summarized_through or 0)
+                )
+                .order_by(ChatMessage.id)
+                .all()
+            )
+            summary, summarized_through = session.summary, session.summarized_through
+        finally:
+            db.close()
+
+        to_fold = messages[:-keep] if keep else messages
+        if not to_fold:
+            return None
+        return summary, summarized_through, to_fold
+
+    def save_summary(
+        self,
+        user_id: int,
+        session_id: str,
+        summary: str,
+        expected_through: Optional[int],
+        summarized_through: int
+    ) -> bool:
+        """Store a new summary unless another worker already moved it on."""
+        db = SessionLocal()
+        try:
+            query = db.query(ChatSession).filter(
+                ChatSession.user_id == user_id,
+                ChatSession.session_id == session_id,
+                ChatSession.summarized_through == expected_through
+                if expected_through is not None
+                else ChatSession.summarized_through.is_(None)
+            )
+            updated = query.update(
+                {"summary": summary, "summarized_through": summarized_through},
+                synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+        self._cache_drop((user_id, session_id))
+        return bool(updated)
+
+    def get_messages(self, user_id: int, session_id: str) -> List[ChatMessage]:
+        """Full stored history of a session."""
+        db = SessionLocal()
+        try:
+            return (
+                db.query(ChatMessage)
+                .join(ChatSession, ChatMessage.session_id == ChatSession.id)
+                .filter(ChatSession.user_id == user_id, ChatSession.session_id == session_id)
+                .order_by(ChatMessage.id)
+                .all()
+            )
+        finally:
+            db.close()
+
+    def clear(self, user_id: int, session_id: str):
+        """Delete a session and its messages."""
+        db = SessionLocal()
+        try:
+            session = db.query(ChatSession).filter(
+                ChatSession.user_id == user_id,
+                ChatSession.session_id == session_id
+            ).first()
+            if session:
+                db.delete(session)
+                db.commit()
+        finally:
+            db.close()
+
+        self._cache_drop((user_id, session_id))
+
+
+# Singleton instance
+chat_history = ChatHistoryStore()
@@ -1,21 +1,64 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
+import asyncio
 import logging
-from groq import Groq
+import re
+import time
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.chat_history_service import chat_history
+from app.services.llm_client import llm_client, LLMOverloadedError
+from app.services.prompt_builder import context_builder
+from app.services.semantic_cache import semantic_cache
 from app.services.vector_service import vector_service
 
 logger = logging.getLogger(__name__)
 
+# Phrases in a user message mapped to the payload values stored by
+# index_knowledge_base.py, used to narrow retrieval with payload filters.
+COUNTRY_ALIASES = {
+    "usa": "USA", "united states": "USA", "america": "USA", "u.s.": "USA",
+    "uk": "UK", "united kingdom": "UK", "britain": "UK", "england": "UK", "scotland": "UK",
+    "canada": "Canada",
+    "australia": "Australia",
+    "germany": "Germany",
+    "france": "France",
+    "netherlands": "Netherlands",
+    "ireland": "Ireland",
+    "new zealand": "New Zealand",
+    "singapore": "Singapore",
+    "sweden": "Sweden",
+}
+
+FIELD_ALIASES = {
+    "computer science": "Computer Science",
+    "data science": "Data Science",
+    "artificial intelligence": "Artificial Intelligence",
+    "machine learning": "Machine Learning",
+    "information systems": "Information Systems",
+    "information technology": "Information Technology",
+    "computing": "Computing",
+}
+
+
+SUMMARY_PROMPT = """Update the running summary of a conversation between a student and a study-abroad assistant.
+
+Existing summary:
+{summary}
+
+New messages:
+{transcript}
+
+Write the updated summary in at most 200 words. Keep the student's profile, goals, preferences, the programs, universities, countries and scholarships discussed, and any open questions. Leave out greetings and filler."""
+
 
 class ChatService:
     def __init__(self):
-        self.groq_client = Groq(api_key=settings.GROQ_API_KEY)
-        self.model = "llama-3.3-70b-versatile"
-        self.conversation_history = {}
+        # Background summarisations in progress, one per session
+        self._summary_tasks: Dict[Tuple[int, str], asyncio.Task] = {}
     
-    def _get_system_prompt(self) -> str:
-        """Get system prompt for the chatbot."""
-        return """You are an intelligent assistant for a Masters Abroad Platform. 
+    def _get_system_prompt(self, summary: Optional[str] = None) -> str:
+        """Get system prompt for the chatbot, with the session summary if any."""
+        prompt = """You are an intelligent assistant for a Masters Abroad Platform. 
 Your role is to help students find information about graduate programs, scholarships, 
 and study abroad opportunities.
 
@@ -27,35 +70,158 @@ Guidelines:
 - Help students make informed decisions about their education
 
 Always format your responses clearly and concisely."""
+        # Kept byte-identical until the next compaction so providers can
+        # reuse the cached prompt prefix
+        if summary:
+            prompt += f"\n\nSummary of the earlier conversation:\n{summary}"
+        return prompt
     
-    def _retrieve_context(self, query: str, limit: int = 3) -> str:
-        """Retrieve relevant context from vector database."""
-        try:
-            results = vector_service.search(query, limit=limit)
-            
-            if not results:
-                return "No relevant information found in the database."
-            
-            context_parts = []
-            for i, result in enumerate(results, 1):
-                payload = result['payload']
-                
-                if payload['type'] == 'program':
-                    context_parts.append(
-                        f"\n{i}. PROGRAM:\n{payload['text']}"
-                    )
-                elif payload['type'] == 'scholarship':
-                    context_parts.append(
-                        f"\n{i}. SCHOLARSHIP:\n{payload['text']}"
-                    )
-            
-            return "\n".join(context_parts)
+    @staticmethod
+    def _find_aliases(text: str, aliases: Dict[str, str]) -> List[str]:
+        found = []
+        for alias, value in aliases.items():
+            if re.search(rf"(?<![\w.]){re.escape(alias)}(?!\w)", text) and value not in found:
+                found.append(value)
+        return found
+    
+    def _derive_filters(self, message: str) -> Dict[str, Any]:
+        """Derive payload filters (type, country, field) from the message."""
+        text = message.lower()
+        filters: Dict[str, Any] = {}
+        
+        wants_scholarships = re.search(r"\b(scholarships?|funding|fellowships?|grants?)\b", text)
+        # Nearly every question here mentions a masters, degree or university,
+        # so only an explicit ask for programs/courses narrows to programs
+        wants_programs = re.search(r"\b(programs?|programmes?|courses?)\b", text)
+        if wants_scholarships and not wants_programs:
+            filters["type"] = "scholarship"
+        elif wants_programs and not wants_scholarships:
+            filters["type"] = "program"
+        
+        countries = self._find_aliases(text, COUNTRY_ALIASES)
+        if countries:
+            filters["country"] = countries
         
+        # Only programs carry a field of study in their payload
+        fields = self._find_aliases(text, FIELD_ALIASES)
+        if fields and filters.get("type") == "program":
+            filters["field"] = fields
+        
+        return filters
+    
+    def _search(self, query: str, limit: int, filters: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if settings.HYBRID_SEARCH_ENABLED:
+            return vector_service.hybrid_search(query, limit=limit, filters=filters)
+        return vector_service.search(query, limit=limit, filters=filters)
+    
+    def _retrieve(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        """Retrieve relevant documents from the vector database, best first."""
+        try:
+            filters = self._derive_filters(query)
+            results = self._search(query, limit, filters)
+            if not results and filters:
+                # Filters were too narrow for what is indexed; search everything
+                results = self._search(query, limit, None)
         except Exception as e:
             logger.error(f"Error retrieving context: {e}")
-            return "Unable to retrieve information from database."
+            return []
+        return results
+    
+    @staticmethod
+    def _render_question(message: str):
+        def render(context: str) -> str:
+            return f"""Context from database:
+{context}
+
+User Question: {message}
+
+Please answer the question based on the context provided. If the context doesn't contain 
+relevant information, you can provide general guidance about studying abroad."""
+        return render
+    
+    async def _prepare_prompt(self, user_id: int, message: str, session_id: str) -> Dict[str, Any]:
+        """Retrieve context and history and pack them into the token budget."""
+        started = time.perf_counter()
+        # Embedding, search and DB reads are blocking; keep them off the event loop
+        results, (summary, history) = await asyncio.gather(
+            asyncio.to_thread(self._retrieve, message, settings.CHAT_RETRIEVAL_LIMIT),
+            asyncio.to_thread(chat_history.get_context, user_id, session_id),
+        )
+        # A hit whose text isn't in the document store is skipped, not fatal
+        passages = [
+            f"{r['payload'].get('type', 'document').upper()}:\n{r['payload']['text']}"
+            for r in results
+            if r["payload"].get("text")
+        ]
+        prompt = context_builder.build(
+            self._get_system_prompt(summary),
+            history,
+            passages,
+            self._render_question(message),
+        )
+        prompt["doc_ids"] = [r["id"] for r in results]
+        # Only answers that didn't depend on earlier turns are reusable
+        prompt["cacheable"] = settings.CHAT_CACHE_ENABLED and not history and not summary
+        prompt["unsummarized"] = len(history)
+        metrics.observe("chat.prompt_tokens", prompt["prompt_tokens"])
+        metrics.observe("chat.prepare_ms", (time.perf_counter() - started) * 1000)
+        return prompt
+    
+    def _maybe_summarize(self, user_id: int, session_id: str, prompt: Dict[str, Any]):
+        """Compact older turns in the background once the session grows past the trigger."""
+        key = (user_id, session_id)
+        if prompt["unsummarized"] + 2 <= settings.CHAT_SUMMARY_TRIGGER or key in self._summary_tasks:
+            return
+        task = asyncio.create_task(self._summarize(user_id, session_id))
+        self._summary_tasks[key] = task
+        task.add_done_callback(lambda _: self._summary_tasks.pop(key, None))
+    
+    async def _summarize(self, user_id: int, session_id: str):
+        try:
+            state = await asyncio.to_thread(
+                chat_history.get_unsummarized, user_id, session_id, settings.CHAT_SUMMARY_KEEP
+            )
+            if state is None:
+                return
+            summary, summarized_through, to_fold = state
+            
+            transcript = "\n".join(f"{m.role}: {m.content}" for m in to_fold)
+            new_summary = await llm_client.complete(
+                [{"role": "user", "content": SUMMARY_PROMPT.format(
+                    summary=summary or "(none)", transcript=transcript
+                )}],
+                temperature=0.2,
+                max_tokens=settings.CHAT_SUMMARY_MAX_TOKENS,
+                lane="background",
+            )
+            saved = await asyncio.to_thread(
+                chat_history.save_summary,
+                user_id, session_id, new_summary.strip(), summarized_through, to_fold[-1].id
+            )
+            metrics.increment("chat.summary.completed" if saved else "chat.summary.superseded")
+        except Exception as e:
+            logger.error(f"Error summarizing chat session: {e}")
+            metrics.increment("chat.summary.failed")
+    
+    def _cached_answer(self, message: str, prompt: Dict[str, Any]) -> Optional[str]:
+        if not prompt["cacheable"]:
+            return None
+        return semantic_cache.get(
+            vector_service.embed_query(message),
+            prompt["doc_ids"],
+            vector_service.index_version()
+        )
     
-    def chat(
+    def _cache_answer(self, message: str, prompt: Dict[str, Any], answer: str):
+        if prompt["cacheable"]:
+            semantic_cache.put(
+                vector_service.embed_query(message),
+                prompt["doc_ids"],
+                vector_service.index_version(),
+                answer
+            )
+    
+    async def chat(
         self, 
         user_id: int, 
         message: str, 
@@ -63,71 +229,117 @@ Always format your responses clearly and concisely."""
     ) -> Dict[str, Any]:
         """Process chat message and return response."""
         try:
-            # Retrieve relevant context
-            context = self._retrieve_context(message)
-            
-            # Get or create conversation history
-            history_key = f"{user_id}_{session_id}"
-            if history_key not in self.conversation_history:
-                self.conversation_history[history_key] = []
+            prompt = await self._prepare_prompt(user_id, message, session_id)
             
-            history = self.conversation_history[history_key]
+            assistant_message = await asyncio.to_thread(self._cached_answer, message, prompt)
+            if assistant_message is None:
+                # Get response from LLM
+                assistant_message = await llm_client.complete(
+                    prompt["messages"],
+                    temperature=0.7,
+                    max_tokens=1000,
+                    lane="chat",
+                )
+                await asyncio.to_thread(self._cache_answer, message, prompt, assistant_message)
+            await asyncio.to_thread(
+                chat_history.append_turn, user_id, session_id, message, assistant_message
+            )
+            self._maybe_summarize(user_id, session_id, prompt)
             
-            # Build messages for LLM
-            messages = [
-                {"role": "system", "content": self._get_system_prompt()},
-            ]
+            return {
+                "response": assistant_message,
+                "sources_count": prompt["passages_used"],
+                "prompt_tokens": prompt["prompt_tokens"]
+            }
+        
+        except LLMOverloadedError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in chat: {e}")
+            return {
+                "response": "I apologize, but I'm having trouble processing your request. Please try again.",
+                "sources_count": 0
+            }
+    
+    async def chat_stream(
+        self,
+        user_id: int,
+        message: str,
+        session_id: str = "default"
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a chat reply as it is generated.
+        
+        Yields {"delta": text} events as tokens arrive, then a final
+        {"done": True, ...} event. History is updated only once the stream
+        completes, so an aborted stream leaves the session unchanged.
+        """
+        try:
+            prompt = await self._prepare_prompt(user_id, message, session_id)
             
-            # Add conversation history (last 5 messages)
-            messages.extend(history[-10:])
+            cached = await asyncio.to_thread(self._cached_answer, message, prompt)
+            if cached is not None:
+                yield {"delta": cached}
+                await asyncio.to_thread(
+                    chat_history.append_turn, user_id, session_id, message, cached
+                )
+                yield {
+                    "done": True,
+                    "sources_count": prompt["passages_used"],
+                    "prompt_tokens": prompt["prompt_tokens"]
+                }
+                return
             
-            # Add current message with context
-            messages.append({
-                "role": "user",
-                "content": f"""Context from database:
-{context}
-
-User Question: {message}
-
-Please answer the question based on the context provided. If the context doesn't contain 
-relevant information, you can provide general guidance about studying abroad."""
-            })
+            started = time.perf_counter()
+            first_token_at = None
+            parts = []
             
-            # Get response from LLM
-            response = self.groq_client.chat.completions.create(
-                model=self.model,
-                messages=messages,
+            async for delta in llm_client.stream(
+                prompt["messages"],
                 temperature=0.7,
                 max_tokens=1000,
-            )
-            
-            assistant_message = response.choices[0].message.content
+                lane="chat",
+            ):
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    metrics.observe("chat.stream.ttft_ms", (first_token_at - started) * 1000)
+                parts.append(delta)
+                yield {"delta": delta}
             
-            # Update conversation history
-            history.append({"role": "user", "content": message})
-            history.append({"role": "assistant", "content": assistant_message})
+            assistant_message = "".join(parts)
+            await asyncio.to_thread(self._cache_answer, message, prompt, assistant_message)
+            await asyncio.to_thread(
+                chat_history.append_turn, user_id, session_id, message, assistant_message
+            )
+            self._maybe_summarize(user_id, session_id, prompt)
             
-            # Keep only last 10 messages in history
-            if len(history) > 10:
-                self.conversation_history[history_key] = history[-10:]
+            if first_token_at is not None:
+                generation_seconds = time.perf_counter() - first_token_at
+                if generation_seconds > 0:
+                    # Chunks can carry several tokens, so count the reply itself
+                    completion_tokens = context_builder.counter.count(assistant_message)
+                    metrics.observe("chat.stream.tokens_per_sec", completion_tokens / generation_seconds)
+            metrics.increment("chat.stream.completed")
             
-            return {
-                "response": assistant_message,
-                "sources_count": len(vector_service.search(message, limit=3))
+            yield {
+                "done": True,
+                "sources_count": prompt["passages_used"],
+                "prompt_tokens": prompt["prompt_tokens"]
             }
         
         except Exception as e:
-            logger.error(f"Error in chat: {e}")
-            return {
-                "response": "I apologize, but I'm having trouble processing your request. Please try again.",
-                "sources_count": 0
+            logger.error(f"Error in chat stream: {e}")
+            metrics.increment("chat.stream.failed")
+            yield {
+                "error": "I apologize, but I'm having trouble processing your request. Please try again."
             }
     
+    def get_history(self, user_id: int, session_id: str = "default"):
+        """Get the stored messages of a user session."""
+        return chat_history.get_messages(user_id, session_id)
+    
     def clear_history(self, user_id: int, session_id: str = "default"):
         """Clear conversation history for a user session."""
-        history_key = f"{user_id}_{session_id}"
-        if history_key in self.conversation_history:
-            del self.conversation_history[history_key]
+        chat_history.clear(user_id, session_id)
 
 
 # Singleton instance
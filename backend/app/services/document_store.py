@@ -0,0 +1,146 @@
+import logging
+import threading
+import zlib
+from pathlib import Path
+from typing import List, Dict, Tuple, Iterator
+
+from sqlalchemy import Table, create_engine, delete, event, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.core.config import settings
+from app.database.session import Base
+from app.models.document import StoredDocument, CollectionVersion
+
+logger = logging.getLogger(__name__)
+
+documents_table = StoredDocument.__table__
+collection_versions_table = CollectionVersion.__table__
+
+
+class DocumentStore:
+    """
+    Side-store for full document text, keyed by (collection, doc id).
+
+    The vector store only keeps ids and small filterable fields; text is
+    stored zlib-compressed here and fetched for a whole result page in one
+    query. Every API replica reading one vector index must also share this
+    store, so set DOC_STORE_URL to the app database when running more than
+    one; the default SQLite file at DOC_STORE_PATH is per process host.
+    In the app database the tables come from the Alembic migrations; a
+    separate store creates them on first use.
+    """
+
+    def __init__(self, url: str = None):
+        if url is None:
+            url = settings.DOC_STORE_URL
+        if url is None:
+            path = Path(settings.DOC_STORE_PATH)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            url = f"sqlite:///{path}"
+        self.engine = create_engine(url, pool_pre_ping=True)
+        if self.engine.dialect.name == "sqlite":
+            event.listen(self.engine, "connect", self._sqlite_wal)
+        # Migrations own the tables in the app database; a separate store
+        # creates them on first use so importing this module never needs it
+        self._ready = url == settings.DATABASE_URL
+        self._ready_lock = threading.Lock()
+
+    @staticmethod
+    def _sqlite_wal(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA journal_mode=WAL")
+
+    def _connect(self):
+        if not self._ready:
+            with self._ready_lock:
+                if not self._ready:
+                    Base.metadata.create_all(self.engine, tables=[documents_table, collection_versions_table])
+                    self._ready = True
+        return self.engine.begin()
+
+    def _insert(self, table: Table):
+        dialect = self.engine.dialect.name
+        if dialect == "postgresql":
+            return postgresql.insert(table)
+        if dialect == "sqlite":
+            return sqlite.insert(table)
+        raise ValueError(f"Unsupported DOC_STORE_URL dialect: {dialect}")
+
+    def put_many(self, collection: str, documents: List[Tuple[int, str]]):
+        """Insert or replace (doc_id, text) pairs."""
+        if not documents:
+            return
+        rows = [
+            {"collection": collection, "doc_id": doc_id, "text": zlib.compress(text.encode("utf-8"))}
+            for doc_id, text in documents
+        ]
+        stmt = self._insert(documents_table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["collection", "doc_id"],
+            set_={"text": stmt.excluded.text}
+        )
+        with self._connect() as conn:
+            conn.execute(stmt, rows)
+
+    def get_many(self, collection: str, doc_ids: List[int]) -> Dict[int, str]:
+        """Fetch texts for doc_ids in a single query."""
+        if not doc_ids:
+            return {}
+
+        with self._connect() as conn:
+            rows = conn.execute(
+                select(documents_table.c.doc_id, documents_table.c.text).where(
+                    documents_table.c.collection == collection,
+                    documents_table.c.doc_id.in_(doc_ids)
+                )
+            ).all()
+        return {doc_id: zlib.decompress(blob).decode("utf-8") for doc_id, blob in rows}
+
+    def delete_many(self, collection: str, doc_ids: List[int]):
+        if not doc_ids:
+            return
+        with self._connect() as conn:
+            conn.execute(
+                delete(documents_table).where(
+                    documents_table.c.collection == collection,
+                    documents_table.c.doc_id.in_(doc_ids)
+                )
+            )
+
+    def iter_texts(self, collection: str) -> Iterator[Tuple[int, str]]:
+        """Iterate over every (doc_id, text) in a collection."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                select(documents_table.c.doc_id, documents_table.c.text).where(
+                    documents_table.c.collection == collection
+                )
+            ).all()
+        for doc_id, blob in rows:
+            yield doc_id, zlib.decompress(blob).decode("utf-8")
+
+    def get_version(self, collection: str) -> int:
+        """Version counter bumped whenever a collection's contents change."""
+        with self._connect() as conn:
+            version = conn.execute(
+                select(collection_versions_table.c.version).where(
+                    collection_versions_table.c.collection == collection
+                )
+            ).scalar()
+        return version or 0
+
+    def bump_version(self, collection: str) -> int:
+        """Increment a collection's version and return the new value."""
+        stmt = self._insert(collection_versions_table).values(collection=collection, version=1)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["collection"],
+            set_={"version": collection_versions_table.c.version + 1}
+        ).returning(collection_versions_table.c.version)
+        with self._connect() as conn:
+            return conn.execute(stmt).scalar_one()
+
+    def clear(self, collection: str):
+        with self._connect() as conn:
+            conn.execute(delete(documents_table).where(documents_table.c.collection == collection))
+
+
+# Singleton instance
+document_store = DocumentStore()
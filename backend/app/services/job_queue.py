@@ -0,0 +1,283 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+TERMINAL_STATUSES = (JOB_COMPLETED, JOB_FAILED)
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class JobBackend:
+    """Storage for job records plus a FIFO of job ids waiting to run."""
+
+    async def enqueue(self, job: Dict[str, Any]):
+        raise NotImplementedError
+
+    async def dequeue(self, timeout: float) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def update(self, job_id: str, **fields):
+        raise NotImplementedError
+
+    async def depth(self) -> int:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class LocalJobBackend(JobBackend):
+    """In-process stand-in for development and tests; jobs die with the process."""
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._expiry: deque = deque()
+
+    def _expire(self):
+        cutoff = time.time() - settings.JOB_TTL_SECONDS
+        while self._expiry and self._expiry[0][0] < cutoff:
+            _, job_id = self._expiry.popleft()
+            job = self._jobs.get(job_id)
+            if job and job["status"] in TERMINAL_STATUSES:
+                self._jobs.pop(job_id, None)
+
+    async def enqueue(self, job):
+        self._expire()
+        self._jobs[job["id"]] = job
+        self._expiry.append((job["enqueued_at"], job["id"]))
+        await self._queue.put(job["id"])
+
+    async def dequeue(self, timeout):
+        try:
+            job_id = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return self._jobs.get(job_id)
+
+    async def get(self, job_id):
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def update(self, job_id, **fields):
+        if job_id in self._jobs:
+            self._jobs[job_id].update(fields)
+
+    async def depth(self):
+        return self._queue.qsize()
+
+
+class RedisJobBackend(JobBackend):
+    """
+    Jobs shared by every API process through Redis.
+
+    Each job is a JSON string under sop:job:<id> (expiring after
+    JOB_TTL_SECONDS) and waiting ids sit in the sop:jobs:queue list.
+    Delivery is at most once: a job taken by a worker that then dies is
+    not retried.
+    """
+
+    QUEUE_KEY = "sop:jobs:queue"
+
+    def __init__(self, url: Optional[str] = None):
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(url or settings.REDIS_URL, decode_responses=True)
+
+    @staticmethod
+    def _key(job_id: str) -> str:
+        return f"sop:job:{job_id}"
+
+    async def enqueue(self, job):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(self._key(job["id"]), json.dumps(job), ex=settings.JOB_TTL_SECONDS)
+            pipe.lpush(self.QUEUE_KEY, job["id"])
+            await pipe.execute()
+
+    async def dequeue(self, timeout):
+        item = await self.redis.brpop(self.QUEUE_KEY, timeout=max(int(timeout), 1))
+        if item is None:
+            return None
+        return await self.get(item[1])
+
+    async def get(self, job_id):
+        raw = await self.redis.get(self._key(job_id))
+        return json.loads(raw) if raw else None
+
+    async def update(self, job_id, **fields):
+        job = await self.get(job_id)
+        if job is None:
+            return
+        job.update(fields)
+        await self.redis.set(self._key(job_id), json.dumps(job), ex=settings.JOB_TTL_SECONDS)
+
+    async def depth(self):
+        return await self.redis.llen(self.QUEUE_KEY)
+
+    async def close(self):
+        await self.redis.aclose()
+
+
+class JobQueue:
+    """
+    Background jobs run by a pool of asyncio workers in each API process.
+
+    Endpoints submit a job and return its id straight away; a worker picks
+    it up, runs the handler registered for its type and stores the
+    handler's result (or error) on the job record for clients to poll.
+    The queue lives in Redis (JOB_QUEUE_BACKEND="redis") so any process
+    can run or report a job, with an in-process backend for local use.
+    If Redis can't be reached at startup the app fails to start: a
+    per-process queue behind several replicas would lose track of jobs
+    polled on another pod. JOB_QUEUE_LOCAL_FALLBACK allows it for dev.
+    """
+
+    def __init__(self):
+        self.backend: Optional[JobBackend] = None
+        self._handlers: Dict[str, JobHandler] = {}
+        self._workers: List[asyncio.Task] = []
+        self._active = 0
+        self._completed_at: deque = deque()
+
+    def register(self, job_type: str, handler: JobHandler):
+        self._handlers[job_type] = handler
+
+    async def _create_backend(self) -> JobBackend:
+        if settings.JOB_QUEUE_BACKEND == "redis":
+            try:
+                backend = RedisJobBackend()
+                await backend.redis.ping()
+                return backend
+            except Exception as e:
+                if not settings.JOB_QUEUE_LOCAL_FALLBACK:
+                    logger.error(f"Redis unavailable for the job queue: {e}")
+                    raise
+                logger.error(
+                    f"Redis unavailable ({e}), using an in-process job queue "
+                    f"(JOB_QUEUE_LOCAL_FALLBACK); jobs are only visible to this process"
+                )
+        elif settings.JOB_QUEUE_BACKEND != "local":
+            raise ValueError(f"Unknown JOB_QUEUE_BACKEND: {settings.JOB_QUEUE_BACKEND}")
+        return LocalJobBackend()
+
+    async def start(self, workers: Optional[int] = None):
+        self.backend = await self._create_backend()
+        for _ in range(workers or settings.JOB_QUEUE_WORKERS):
+            self._workers.append(asyncio.create_task(self._worker()))
+        logger.info(f"Started {len(self._workers)} job workers ({type(self.backend).__name__})")
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self.backend:
+            await self.backend.close()
+
+    async def submit(self, job_type: str, user_id: int, payload: Dict[str, Any]) -> Dict[str, Any]:
+        if job_type not in self._handlers:
+            raise ValueError(f"No handler registered for job type: {job_type}")
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "type": job_type,
+            "user_id": user_id,
+            "payload": payload,
+            "status": JOB_QUEUED,
+            "result": None,
+            "error": None,
+            "enqueued_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        await self.backend.enqueue(job)
+        metrics.increment("jobs.enqueued")
+        metrics.set_gauge("jobs.queue_depth", await self.backend.depth())
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.backend.get(job_id)
+
+    def _record_completion(self, now: float):
+        self._completed_at.append(now)
+        while self._completed_at and now - self._completed_at[0] > 60:
+            self._completed_at.popleft()
+        metrics.set_gauge("jobs.completed_per_min", len(self._completed_at))
+
+    async def _mark_failed(self, job: Dict[str, Any], error: str):
+        try:
+            await self.backend.update(job["id"], status=JOB_FAILED, error=error, finished_at=time.time())
+        except Exception as e:
+            logger.error(f"Could not mark job {job['id']} failed: {e}")
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await self.backend.dequeue(timeout=5)
+            except Exception as e:
+                logger.error(f"Error reading job queue: {e}")
+                await asyncio.sleep(1)
+                continue
+            if job is None:
+                continue
+
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # A job store error (e.g. a Redis blip) fails this job, not the worker
+                logger.error(f"Error running job {job['id']}: {e}")
+                metrics.increment("jobs.worker_errors")
+                await self._mark_failed(job, "Job failed. Please try again.")
+                await asyncio.sleep(1)
+
+    async def _run(self, job: Dict[str, Any]):
+        started = time.time()
+        metrics.observe("jobs.queue_latency_ms", (started - job["enqueued_at"]) * 1000)
+        metrics.set_gauge("jobs.queue_depth", await self.backend.depth())
+        await self.backend.update(job["id"], status=JOB_RUNNING, started_at=started)
+
+        self._active += 1
+        metrics.set_gauge("jobs.active", self._active)
+        try:
+            result = await self._handlers[job["type"]](job)
+            await self.backend.update(
+                job["id"], status=JOB_COMPLETED, result=result, finished_at=time.time()
+            )
+            metrics.increment(f"jobs.completed.{job['type']}")
+            self._record_completion(time.time())
+        except asyncio.CancelledError:
+            await self._mark_failed(job, "Server shutting down")
+            raise
+        except Exception as e:
+            logger.error(f"Job {job['id']} ({job['type']}) failed: {e}")
+            # Handlers raise ValueError for user-facing problems; anything
+            # else may carry internals that clients shouldn't see
+            error = str(e) if isinstance(e, ValueError) else "Job failed. Please try again."
+            await self._mark_failed(job, error)
+            metrics.increment(f"jobs.failed.{job['type']}")
+        finally:
+            self._active -= 1
+            metrics.set_gauge("jobs.active", self._active)
+            metrics.observe("jobs.run_ms", (time.time() - started) * 1000)
+
+
+# Singleton instance
+job_queue = JobQueue()
@@ -0,0 +1,124 @@
+import math
+import re
+from array import array
+from typing import List, Dict, Tuple, Iterable
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens; keeps decimals like "7.0" as one token."""
+    return TOKEN_PATTERN.findall((text or "").lower())
+
+
+class BM25Index:
+    """
+    Incremental BM25 inverted index held in compact typed arrays.
+
+    Each term owns a posting list of row numbers (uint32) and term
+    frequencies (uint16). Rows are appended in insertion order, so posting
+    lists stay sorted without any re-sorting. Re-adding an existing doc id
+    tombstones its old row; document frequencies then over-count slightly
+    until the index is rebuilt, which happens on every full reindex.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.clear()
+
+    def clear(self):
+        self._term_ids: Dict[str, int] = {}
+        self._postings: List[array] = []
+        self._frequencies: List[array] = []
+        self._doc_ids = array("q")
+        self._doc_lengths = array("I")
+        self._alive = bytearray()
+        self._row_by_id: Dict[int, int] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._row_by_id)
+
+    def add(self, doc_id: int, text: str):
+        """Add or replace a single document."""
+        old_row = self._row_by_id.get(doc_id)
+        if old_row is not None:
+            self._alive[old_row] = 0
+            self._total_length -= self._doc_lengths[old_row]
+
+        tokens = tokenize(text)
+        row = len(self._doc_ids)
+        self._doc_ids.append(doc_id)
+        self._doc_lengths.append(len(tokens))
+        self._alive.append(1)
+        self._row_by_id[doc_id] = row
+        self._total_length += len(tokens)
+
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+
+        for token, count in counts.items():
+            term_id = self._term_ids.get(token)
+            if term_id is None:
+                term_id = len(self._postings)
+                self._term_ids[token] = term_id
+                self._postings.append(array("I"))
+                self._frequencies.append(array("H"))
+            self._postings[term_id].append(row)
+            self._frequencies[term_id].append(min(count, 65535))
+
+    def remove(self, doc_id: int):
+        """Tombstone a document; its postings are dropped on the next rebuild."""
+        row = self._row_by_id.pop(doc_id, None)
+        if row is not None:
+            self._alive[row] = 0
+            self._total_length -= self._doc_lengths[row]
+
+    def add_many(self, documents: Iterable[Tuple[int, str]]):
+        for doc_id, text in documents:
+            self.add(doc_id, text)
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[int, float]]:
+        """Return up to `limit` (doc_id, bm25_score) pairs, best first."""
+        n_rows = len(self._doc_ids)
+        n_docs = len(self._row_by_id)
+        if n_docs == 0:
+            return []
+
+        term_ids = {self._term_ids[t] for t in tokenize(query) if t in self._term_ids}
+        if not term_ids:
+            return []
+
+        doc_lengths = np.frombuffer(self._doc_lengths, dtype=np.uint32).astype(np.float32)
+        avg_length = max(self._total_length / n_docs, 1.0)
+        length_norm = self.k1 * (1 - self.b + self.b * doc_lengths / avg_length)
+
+        scores = np.zeros(n_rows, dtype=np.float32)
+        for term_id in term_ids:
+            rows = np.frombuffer(self._postings[term_id], dtype=np.uint32)
+            tf = np.frombuffer(self._frequencies[term_id], dtype=np.uint16).astype(np.float32)
+            df = len(rows)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + length_norm[rows])
+
+        scores *= np.frombuffer(self._alive, dtype=np.uint8)
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > limit:
+            matched = matched[np.argpartition(-scores[matched], limit - 1)[:limit]]
+        matched = matched[np.argsort(-scores[matched])]
+
+        return [(self._doc_ids[row], float(scores[row])) for row in matched]
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """Fuse several ranked id lists: score(d) = sum(1 / (k + rank))."""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,186 @@
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import random
+import time
+from typing import List, Dict, AsyncIterator
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.llm_providers import LLMProvider, get_llm_provider
+from app.services.llm_scheduler import LLMScheduler, LLMOverloadedError
+
+logger = logging.getLogger(__name__)
+
+
+class LLMClient:
+    """
+    Shared async LLM client.
+
+    One provider (Groq unless LLM_PROVIDER says otherwise) and its pooled
+    HTTP connections serve every caller. Every upstream call goes through
+    LLMScheduler, which orders callers by lane ("chat", "sop_analysis",
+    "sop_generation", "background"), caps concurrency, keeps within the
+    provider's request/token rate limits and rejects callers with
+    LLMOverloadedError once LLM_MAX_QUEUE are waiting or a caller has
+    queued longer than its lane's max wait. Each call reserves its prompt
+    plus max_tokens and is settled to the reply's real size afterwards.
+    Rate-limit and transient server errors are retried up to
+    LLM_MAX_RETRIES times with jittered exponential backoff.
+
+    Identical concurrent completions (same model, lane, messages,
+    max_tokens and temperature rounded to TEMPERATURE_BUCKET) share one
+    upstream call; later callers wait on the first caller's result. The
+    lane is part of the key so an interactive call never queues behind a
+    batch-lane call it was coalesced with.
+    """
+
+    TEMPERATURE_BUCKET = 0.1
+
+    def __init__(self):
+        self.model = settings.LLM_MODEL
+        self._provider = None
+        self.scheduler = LLMScheduler()
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    @property
+    def provider(self) -> LLMProvider:
+        if self._provider is None:
+            self._provider = get_llm_provider()
+        return self._provider
+
+    @staticmethod
+    def _count_tokens(text: str) -> int:
+        """Rough token count (~4 characters per token)."""
+        return len(text) // 4
+
+    def _estimate_tokens(self, messages: List[Dict[str, str]], max_tokens: int) -> int:
+        """Prompt + largest possible completion, reserved against the token rate limit."""
+        return self._prompt_tokens(messages) + max_tokens
+
+    def _prompt_tokens(self, messages: List[Dict[str, str]]) -> int:
+        return sum(self._count_tokens(m["content"]) for m in messages)
+
+    async def _backoff(self, attempt: int, error: Exception):
+        """Sleep before retrying a failed call; rate limits pause every lane."""
+        delay = random.uniform(
+            0, min(settings.LLM_RETRY_MAX_SECONDS, settings.LLM_RETRY_BASE_SECONDS * 2 ** attempt)
+        )
+        retry_after = self.provider.retry_after(error)
+        if getattr(error, "status_code", None) == 429:
+            metrics.increment("llm.rate_limited")
+            self.scheduler.pause(retry_after or settings.LLM_RETRY_BASE_SECONDS * 2 ** attempt)
+        if retry_after:
+            delay = max(delay, retry_after)
+
+        metrics.increment("llm.retries")
+        logger.warning(f"LLM call failed ({error}), retry {attempt + 1} in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+    def _request_key(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        lane: str
+    ) -> str:
+        bucket = round(temperature / self.TEMPERATURE_BUCKET)
+        body = json.dumps([self.model, lane, bucket, max_tokens, messages], sort_keys=True)
+        return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+    def _request_done(self, key: str, future: asyncio.Future):
+        if self._pending.get(key) is future:
+            del self._pending[key]
+        # Retrieve the error here so it isn't reported as never retrieved
+        # when every caller waiting on the shared call has been cancelled
+        if not future.cancelled():
+            future.exception()
+
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        lane: str = "chat"
+    ) -> str:
+        """Return the full completion text for messages."""
+        key = self._request_key(messages, temperature, max_tokens, lane)
+        pending = self._pending.get(key)
+        if pending is not None:
+            metrics.increment("llm.coalesced")
+        else:
+            metrics.increment("llm.requests")
+            pending = asyncio.ensure_future(self._complete(messages, temperature, max_tokens, lane))
+            self._pending[key] = pending
+            pending.add_done_callback(functools.partial(self._request_done, key))
+        # Shielded so one caller disconnecting doesn't cancel the shared call
+        return await asyncio.shield(pending)
+
+    async def _complete(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        lane: str
+    ) -> str:
+        tokens = self._estimate_tokens(messages, max_tokens)
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            try:
+                async with self.scheduler.slot(lane, tokens):
+                    started = time.perf_counter()
+                    text = ""
+                    try:
+                        text = await self.provider.complete(self.model, messages, temperature, max_tokens)
+                    finally:
+                        self.scheduler.settle(tokens, self._prompt_tokens(messages) + self._count_tokens(text))
+                    metrics.observe("llm.latency_ms", (time.perf_counter() - started) * 1000)
+                    return text
+            except LLMOverloadedError:
+                raise
+            except Exception as e:
+                if attempt == settings.LLM_MAX_RETRIES or not self.provider.is_retryable(e):
+                    raise
+                await self._backoff(attempt, e)
+
+    async def stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        lane: str = "chat"
+    ) -> AsyncIterator[str]:
+        """Yield completion text deltas as they arrive.
+
+        Failures are only retried before the first delta; after that the
+        caller has already shown partial output.
+        """
+        tokens = self._estimate_tokens(messages, max_tokens)
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            started_output = False
+            try:
+                async with self.scheduler.slot(lane, tokens):
+                    output_chars = 0
+                    try:
+                        async for delta in self.provider.stream(self.model, messages, temperature, max_tokens):
+                            started_output = True
+                            output_chars += len(delta)
+                            yield delta
+                    finally:
+                        self.scheduler.settle(tokens, self._prompt_tokens(messages) + output_chars // 4)
+                return
+            except LLMOverloadedError:
+                raise
+            except Exception as e:
+                if (
+                    started_output
+                    or attempt == settings.LLM_MAX_RETRIES
+                    or not self.provider.is_retryable(e)
+                ):
+                    raise
+                await self._backoff(attempt, e)
+
+
+# Singleton instance
+llm_client = LLMClient()
@@ -0,0 +1,131 @@
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Trailing commas before a closing bracket, a common LLM slip
+TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+
+
+def loads_tolerant(raw: str) -> Any:
+    """json.loads that also accepts trailing commas and Python-style literals."""
+    try:
+        return json.loads(raw)
+    except ValueError:
+        pass
+    repaired = TRAILING_COMMA_RE.sub(r"\1", raw)
+    if raw in ("True", "False", "None"):
+        repaired = {"True": "true", "False": "false", "None": "null"}[raw]
+    return json.loads(repaired)
+
+
+class IncrementalJSONParser:
+    """
+    Pulls the first JSON object out of LLM output as it streams in.
+
+    Prose and ```json fences around the object are ignored, and an object
+    that yields no fields (e.g. "{analysis}" in a preamble) is skipped in
+    favour of the next one. Each top-level field is decoded as soon as its
+    value is complete, so callers can use early fields while the rest is
+    still generating. Fields whose value can't be decoded are listed in
+    malformed rather than failing the whole object.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._field_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+        self.fields: Dict[str, Any] = {}
+        self.malformed: List[str] = []
+        self.done = False
+
+    def _finish_field(self, end: int, completed: List[Tuple[str, Any]]):
+        key, start = self._key, self._value_start
+        self._key = None
+        self._value_start = None
+        self._field_start = end + 1
+        if key is None or start is None:
+            return
+        raw = self._text[start:end].strip()
+        try:
+            value = loads_tolerant(raw)
+        except ValueError:
+            self.malformed.append(key)
+            return
+        self.fields[key] = value
+        completed.append((key, value))
+
+    def _read_key(self, end: int) -> str:
+        raw = self._text[self._field_start:end].strip()
+        if raw.startswith('"'):
+            try:
+                return json.loads(raw)
+            except ValueError:
+                pass
+        return raw.strip("\"'")
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Add more output; returns the (key, value) fields completed by it."""
+        completed: List[Tuple[str, Any]] = []
+        if self.done:
+            return completed
+        self._text += chunk
+        text = self._text
+
+        for i in range(self._pos, len(text)):
+            char = text[i]
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                    self._field_start = i + 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._finish_field(i, completed)
+                    if self.fields or self.malformed:
+                        self.done = True
+                        self._pos = i + 1
+                        return completed
+            elif self._depth == 1:
+                if char == ":" and self._value_start is None:
+                    self._key = self._read_key(i)
+                    self._value_start = i + 1
+                elif char == ",":
+                    self._finish_field(i, completed)
+
+        self._pos = len(text)
+        return completed
+
+    def close(self) -> List[Tuple[str, Any]]:
+        """Call at end of output; salvages the last field of a truncated object."""
+        completed: List[Tuple[str, Any]] = []
+        if not self.done and self._depth == 1 and not self._in_string:
+            self._finish_field(len(self._text), completed)
+        self.done = True
+        return completed
+
+
+def parse_json_object(text: str) -> Tuple[Dict[str, Any], List[str]]:
+    """Parse complete LLM output; returns (fields, malformed field names)."""
+    parser = IncrementalJSONParser()
+    parser.feed(text)
+    parser.close()
+    return parser.fields, parser.malformed
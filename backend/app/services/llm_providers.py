@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import re
+from typing import List, Dict, AsyncIterator, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Upstream statuses worth retrying: timeouts, rate limits, transient server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMProvider:
+    """Interface for chat completion backends used by LLMClient."""
+
+    async def complete(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int
+    ) -> str:
+        raise NotImplementedError
+
+    def stream(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int
+    ) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    def is_retryable(self, error: Exception) -> bool:
+        """Whether a failed call may succeed if repeated."""
+        if getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES:
+            return True
+        return isinstance(error, (asyncio.TimeoutError, ConnectionError))
+
+    def retry_after(self, error: Exception) -> Optional[float]:
+        """Seconds the provider asked us to wait, from a Retry-After header."""
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            return float(headers.get("retry-after"))
+        except (TypeError, ValueError):
+            return None
+
+
+class GroqProvider(LLMProvider):
+    """Groq chat completions over one pooled AsyncGroq client."""
+
+    def __init__(self):
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import httpx
+            from groq import AsyncGroq
+
+            self._client = AsyncGroq(
+                api_key=settings.GROQ_API_KEY,
+                timeout=settings.LLM_TIMEOUT_SECONDS,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=settings.LLM_MAX_CONCURRENCY,
+                        max_keepalive_connections=settings.LLM_MAX_CONCURRENCY
+                    ),
+                    timeout=settings.LLM_TIMEOUT_SECONDS
+                )
+            )
+        return self._client
+
+    def is_retryable(self, error: Exception) -> bool:
+        from groq import APIConnectionError
+
+        # APIConnectionError also covers request timeouts
+        return super().is_retryable(error) or isinstance(error, APIConnectionError)
+
+    async def complete(self, model, messages, temperature, max_tokens) -> str:
+        response = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+        return response.choices[0].message.content
+
+    async def stream(self, model, messages, temperature, max_tokens) -> AsyncIterator[str]:
+        stream = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+        )
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+
+
+STUB_VOCABULARY = (
+    "the program offers strong research opportunities in machine learning and data "
+    "science with funding available for international students who meet the minimum "
+    "GPA and English language requirements applications close in January and most "
+    "scholarships cover tuition plus a living stipend for the full duration of study"
+).split()
+
+
+class StubProvider(LLMProvider):
+    """
+    Offline stand-in for load tests and benchmarks.
+
+    The reply text is a pure function of the request, so repeated runs
+    produce identical output. When the prompt contains a JSON template
+    (as SOP analysis does) the template is returned with its <0-100>
+    placeholders filled in, so callers that parse JSON keep working
+    (streamed a word at a time like any other reply).
+
+    Timing is simulated: time to first token and decoding speed are drawn
+    from log-normal distributions around LLM_STUB_TTFT_MS and
+    LLM_STUB_TOKENS_PER_SEC with spread LLM_STUB_LATENCY_SIGMA, using a
+    generator seeded with LLM_STUB_SEED so a benchmark run is repeatable.
+    One word counts as one token.
+    """
+
+    def __init__(self):
+        self._timing = random.Random(settings.LLM_STUB_SEED)
+
+    @staticmethod
+    def _request_rng(messages: List[Dict[str, str]]) -> random.Random:
+        digest = hashlib.sha256(json.dumps(messages, sort_keys=True).encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest[:8], "big") ^ settings.LLM_STUB_SEED)
+
+    def _reply(self, messages: List[Dict[str, str]], max_tokens: int) -> List[str]:
+        rng = self._request_rng(messages)
+        prompt = messages[-1]["content"] if messages else ""
+
+        template = re.search(r"\{\s*\".*\}", prompt, re.DOTALL)
+        if template:
+            filled = re.sub(r"<0-100>", lambda _: str(rng.randint(55, 95)), template.group())
+            try:
+                json.loads(filled)
+                return re.findall(r"\S+\s*", filled)
+            except ValueError:
+                pass
+
+        length = min(max_tokens, settings.LLM_STUB_OUTPUT_TOKENS)
+        words = [rng.choice(STUB_VOCABULARY) for _ in range(length)]
+        return [words[0].capitalize()] + [f" {word}" for word in words[1:]]
+
+    def _timings(self):
+        sigma = settings.LLM_STUB_LATENCY_SIGMA
+        ttft = settings.LLM_STUB_TTFT_MS / 1000 * self._timing.lognormvariate(0, sigma)
+        tokens_per_sec = settings.LLM_STUB_TOKENS_PER_SEC * self._timing.lognormvariate(0, sigma)
+        return ttft, tokens_per_sec
+
+    async def complete(self, model, messages, temperature, max_tokens) -> str:
+        tokens = self._reply(messages, max_tokens)
+        ttft, tokens_per_sec = self._timings()
+        await asyncio.sleep(ttft + len(tokens) / tokens_per_sec)
+        return "".join(tokens)
+
+    async def stream(self, model, messages, temperature, max_tokens) -> AsyncIterator[str]:
+        tokens = self._reply(messages, max_tokens)
+        ttft, tokens_per_sec = self._timings()
+        await asyncio.sleep(ttft)
+        for token in tokens:
+            yield token
+            await asyncio.sleep(1 / tokens_per_sec)
+
+
+def get_llm_provider() -> LLMProvider:
+    """Build the LLM provider selected by settings.LLM_PROVIDER."""
+    provider = settings.LLM_PROVIDER.lower()
+    if provider == "groq":
+        return GroqProvider()
+    if provider == "stub":
+        logger.warning("Using stub LLM provider; replies are synthetic")
+        return StubProvider()
+    raise ValueError(f"Unknown LLM_PROVIDER: {settings.LLM_PROVIDER}")
@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes for LLM callers; lower runs first
+LANES = {
+    "chat": 0,            # interactive, a user is waiting on the reply
+    "sop_analysis": 1,
+    "sop_generation": 2,  # long batch-style completions
+    "background": 3,      # summaries and other work nobody is waiting on
+}
+
+# Lanes nobody is watching, allowed to queue for LLM_BATCH_MAX_WAIT_SECONDS
+BATCH_LANES = {"sop_generation", "background"}
+
+
+class LLMOverloadedError(Exception):
+    """Raised when too many LLM calls are already waiting for a slot, or a
+    caller has waited longer than its lane allows."""
+
+
+class TokenBucket:
+    """Per-minute rate limit refilled continuously; a limit of 0 disables it."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount can be taken (0 if available now)."""
+        if self.capacity <= 0:
+            return 0.0
+        self._refill(now)
+        # A single request larger than the bucket only waits for a full one
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float, now: float):
+        if self.capacity <= 0:
+            return
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+    def settle(self, charged: float, actual: float, now: float):
+        """Correct an earlier take(charged) once the real amount is known."""
+        if self.capacity <= 0:
+            return
+        self._refill(now)
+        refund = min(charged, self.capacity) - min(actual, self.capacity)
+        self.tokens = min(self.capacity, self.tokens + refund)
+
+
+class _Waiter:
+    __slots__ = ("future", "tokens", "enqueued_at")
+
+    def __init__(self, future: asyncio.Future, tokens: int, enqueued_at: float):
+        self.future = future
+        self.tokens = tokens
+        self.enqueued_at = enqueued_at
+
+
+class LLMScheduler:
+    """
+    Admission control for upstream LLM calls.
+
+    Callers wait in one FIFO queue per lane. A slot goes to the lane whose
+    head has the best priority, where every LLM_PRIORITY_AGING_SECONDS of
+    waiting counts as one level, so chat goes first but long-queued SOP
+    generations still get through. A slot is only granted while fewer
+    than LLM_MAX_CONCURRENCY calls are in flight and the request and token
+    buckets can cover the call; otherwise dispatch resumes on a timer once
+    they refill. A provider 429 pauses all dispatch for its Retry-After.
+
+    The buckets live in this process, so LLM_RATE_LIMIT_RPM / _TPM (the
+    provider's limits for the key) are divided by LLM_RATE_LIMIT_PROCESSES.
+    Calls reserve prompt + max_tokens tokens and settle() hands back what
+    the reply did not use. A caller still queued after LLM_MAX_WAIT_SECONDS
+    (LLM_BATCH_MAX_WAIT_SECONDS for BATCH_LANES) gets LLMOverloadedError.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None
+    ):
+        self.max_concurrency = max_concurrency or settings.LLM_MAX_CONCURRENCY
+        self.max_queue = max_queue or settings.LLM_MAX_QUEUE
+        self.aging_seconds = settings.LLM_PRIORITY_AGING_SECONDS
+        share = max(1, settings.LLM_RATE_LIMIT_PROCESSES)
+        self._requests = TokenBucket(
+            settings.LLM_RATE_LIMIT_RPM / share if requests_per_minute is None else requests_per_minute
+        )
+        self._tokens = TokenBucket(
+            settings.LLM_RATE_LIMIT_TPM / share if tokens_per_minute is None else tokens_per_minute
+        )
+        self._lanes: Dict[str, deque] = {lane: deque() for lane in LANES}
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_at = 0.0
+
+    def queue_depth(self) -> int:
+        return sum(len(queue) for queue in self._lanes.values())
+
+    @staticmethod
+    def max_wait(lane: str) -> float:
+        if lane in BATCH_LANES:
+            return settings.LLM_BATCH_MAX_WAIT_SECONDS
+        return settings.LLM_MAX_WAIT_SECONDS
+
+    @asynccontextmanager
+    async def slot(self, lane: str, tokens: int):
+        """Hold an upstream call slot for a request of roughly tokens tokens."""
+        await self.acquire(lane, tokens)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, lane: str, tokens: int):
+        if lane not in self._lanes:
+            raise ValueError(f"Unknown LLM lane: {lane}")
+        if self.queue_depth() >= self.max_queue:
+            metrics.increment("llm.rejected")
+            raise LLMOverloadedError("Too many concurrent LLM requests")
+
+        started = time.monotonic()
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), tokens, started)
+        self._lanes[lane].append(waiter)
+        self._dispatch()
+
+        try:
+            done, _ = await asyncio.wait({waiter.future}, timeout=self.max_wait(lane))
+        except asyncio.CancelledError:
+            self._abandon(lane, waiter)
+            raise
+        if not done:
+            self._abandon(lane, waiter)
+            metrics.increment("llm.wait_timeouts")
+            metrics.increment(f"llm.wait_timeouts.{lane}")
+            raise LLMOverloadedError(f"Timed out waiting for an LLM slot in lane {lane}")
+
+        waited_ms = (time.monotonic() - started) * 1000
+        metrics.observe("llm.queue_wait_ms", waited_ms)
+        metrics.observe(f"llm.queue_wait_ms.{lane}", waited_ms)
+
+    def _abandon(self, lane: str, waiter: _Waiter):
+        if waiter.future.done() and not waiter.future.cancelled():
+            # Granted just as the caller went away
+            self.release()
+            return
+        waiter.future.cancel()
+        try:
+            self._lanes[lane].remove(waiter)
+        except ValueError:
+            pass
+        self._update_gauges()
+
+    def release(self):
+        self._in_flight -= 1
+        self._dispatch()
+
+    def settle(self, reserved: int, used: int):
+        """Charge the token bucket for what a call really used instead of
+        the prompt + max_tokens it reserved, and let waiters use the rest."""
+        self._tokens.settle(reserved, used, time.monotonic())
+        if used < reserved:
+            self._dispatch()
+
+    def pause(self, seconds: float):
+        """Stop granting slots for seconds (provider said we are rate limited)."""
+        until = time.monotonic() + seconds
+        if until > self._paused_until:
+            logger.warning(f"LLM provider rate limited, pausing dispatch for {seconds:.1f}s")
+            self._paused_until = until
+
+    def _next_waiter(self, now: float) -> Tuple[Optional[str], Optional[_Waiter]]:
+        best = None
+        for lane, queue in self._lanes.items():
+            while queue and queue[0].future.done():
+                queue.popleft()
+            if not queue:
+                continue
+            head = queue[0]
+            rank = LANES[lane] - (now - head.enqueued_at) / self.aging_seconds
+            if best is None or rank < best[0]:
+                best = (rank, lane, head)
+        return (best[1], best[2]) if best else (None, None)
+
+    def _dispatch(self):
+        now = time.monotonic()
+        while self._in_flight < self.max_concurrency:
+            lane, waiter = self._next_waiter(now)
+            if waiter is None:
+                break
+
+            delay = max(
+                self._paused_until - now,
+                self._requests.wait_time(1, now),
+                self._tokens.wait_time(waiter.tokens, now),
+            )
+            if delay > 0:
+                metrics.increment("llm.throttled")
+                self._schedule(now, delay)
+                break
+
+            self._lanes[lane].popleft()
+            self._requests.take(1, now)
+            self._tokens.take(waiter.tokens, now)
+            self._in_flight += 1
+            waiter.future.set_result(None)
+        self._update_gauges()
+
+    def _schedule(self, now: float, delay: float):
+        """Re-run dispatch after delay, keeping only the earliest pending timer."""
+        when = now + delay
+        if self._timer is not None:
+            if self._timer_at <= when:
+                return
+            self._timer.cancel()
+        self._timer_at = when
+        self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    def _update_gauges(self):
+        for lane, queue in self._lanes.items():
+            metrics.set_gauge(f"llm.queue_depth.{lane}", len(queue))
+        metrics.set_gauge("llm.queue_depth", self.queue_depth())
+        metrics.set_gauge("llm.in_flight", self._in_flight)
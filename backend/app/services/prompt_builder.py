@@ -0,0 +1,160 @@
+import logging
+import re
+from typing import List, Dict, Any, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Approximate per-message framing overhead of chat formats
+MESSAGE_OVERHEAD_TOKENS = 4
+SHINGLE_SIZE = 5
+
+
+class TokenCounter:
+    """Counts tokens with tiktoken, falling back to a chars/4 estimate."""
+
+    def __init__(self, encoding_name: str = "cl100k_base"):
+        self.encoding_name = encoding_name
+        self._encoding = None
+        self._unavailable = False
+
+    def _get_encoding(self):
+        if self._encoding is None and not self._unavailable:
+            try:
+                import tiktoken
+                self._encoding = tiktoken.get_encoding(self.encoding_name)
+            except Exception as e:
+                logger.warning(f"tiktoken unavailable, estimating token counts: {e}")
+                self._unavailable = True
+        return self._encoding
+
+    def count(self, text: str) -> int:
+        encoding = self._get_encoding()
+        if encoding is None:
+            return (len(text) + 3) // 4
+        return len(encoding.encode(text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        encoding = self._get_encoding()
+        if encoding is None:
+            return text[:max_tokens * 4]
+        return encoding.decode(encoding.encode(text)[:max_tokens])
+
+
+def _shingles(text: str) -> set:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+class ContextBuilder:
+    """
+    Packs retrieved passages and chat history into a token budget.
+
+    Passages are taken in relevance order and skipped when they mostly
+    overlap one already chosen. History is taken newest first. Passages
+    get (1 - CHAT_HISTORY_TOKEN_SHARE) of the space left after the system
+    prompt and question, and history gets whatever remains.
+    """
+
+    def __init__(
+        self,
+        budget: Optional[int] = None,
+        history_share: Optional[float] = None,
+        dedup_threshold: float = 0.6
+    ):
+        self.budget = budget or settings.CHAT_PROMPT_TOKEN_BUDGET
+        self.history_share = settings.CHAT_HISTORY_TOKEN_SHARE if history_share is None else history_share
+        self.dedup_threshold = dedup_threshold
+        self.counter = TokenCounter()
+
+    def _select_passages(self, passages: List[str], budget: int) -> List[str]:
+        selected, selected_shingles, used = [], [], 0
+        for passage in passages:
+            shingles = _shingles(passage)
+            if any(_jaccard(shingles, s) >= self.dedup_threshold for s in selected_shingles):
+                continue
+
+            tokens = self.counter.count(passage)
+            if used + tokens > budget:
+                if selected or budget - used <= 0:
+                    continue
+                # Always keep a (truncated) top passage rather than nothing
+                passage = self.counter.truncate(passage, budget - used)
+                tokens = budget - used
+
+            selected.append(passage)
+            selected_shingles.append(shingles)
+            used += tokens
+        return selected
+
+    def _select_history(self, history: List[Dict[str, str]], budget: int) -> List[Dict[str, str]]:
+        selected, used = [], 0
+        for message in reversed(history):
+            tokens = self.counter.count(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+            if used + tokens > budget:
+                break
+            selected.append(message)
+            used += tokens
+        selected.reverse()
+        # Don't open the window on a dangling assistant reply
+        if selected and selected[0]["role"] == "assistant":
+            selected = selected[1:]
+        return selected
+
+    def build(
+        self,
+        system_prompt: str,
+        history: List[Dict[str, str]],
+        passages: List[str],
+        render_question,
+    ) -> Dict[str, Any]:
+        """Assemble the message list.
+
+        render_question(context) must return the final user message for the
+        given context string. Returns {"messages", "prompt_tokens",
+        "passages_used", "history_used"}.
+        """
+        fixed = (
+            self.counter.count(system_prompt)
+            + self.counter.count(render_question(""))
+            + 2 * MESSAGE_OVERHEAD_TOKENS
+        )
+        available = max(self.budget - fixed, 0)
+
+        chosen = self._select_passages(passages, int(available * (1 - self.history_share)))
+        if chosen:
+            context = "\n".join(f"\n{i}. {passage}" for i, passage in enumerate(chosen, 1))
+        else:
+            context = "No relevant information found in the database."
+        question = render_question(context)
+        remaining = self.budget - (
+            self.counter.count(system_prompt)
+            + self.counter.count(question)
+            + 2 * MESSAGE_OVERHEAD_TOKENS
+        )
+        recent = self._select_history(history, max(remaining, 0))
+
+        messages = [{"role": "system", "content": system_prompt}]
+        messages.extend(recent)
+        messages.append({"role": "user", "content": question})
+
+        prompt_tokens = sum(
+            self.counter.count(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages
+        )
+        return {
+            "messages": messages,
+            "prompt_tokens": prompt_tokens,
+            "passages_used": len(chosen),
+            "history_used": len(recent),
+        }
+
+
+# Singleton instance
+context_builder = ContextBuilder()
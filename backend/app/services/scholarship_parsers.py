@@ -0,0 +1,90 @@
+from typing import List, Dict, Any, Optional
+
+from bs4 import BeautifulSoup
+
+# Each parser takes a listing page's HTML and returns scholarship dicts
+# (title, description, amount, deadline, country). This module has no app
+# imports so the scraper's worker processes can load it cheaply.
+
+
+def _text(node, selector: Optional[str]) -> Optional[str]:
+    found = node.select_one(selector) if selector else None
+    if found is None:
+        return None
+    return found.get_text(" ", strip=True) or None
+
+
+def parse_listing(
+    html: str,
+    item_selector: str,
+    fields: Dict[str, str],
+    country: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Pull one scholarship per item_selector match, reading each field
+    from the CSS selector given for it; items without a title are skipped."""
+    soup = BeautifulSoup(html, "html.parser")
+    scholarships = []
+    for item in soup.select(item_selector):
+        title = _text(item, fields.get("title"))
+        if not title:
+            continue
+        scholarships.append({
+            "title": title,
+            "description": _text(item, fields.get("description")),
+            "amount": _text(item, fields.get("amount")),
+            "deadline": _text(item, fields.get("deadline")),
+            "country": _text(item, fields.get("country")) or country,
+        })
+    return scholarships
+
+
+def parse_scholarships_com(html: str) -> List[Dict[str, Any]]:
+    """Graduate scholarship listings on Scholarships.com."""
+    return parse_listing(
+        html,
+        ".scholarship-list-item, table.scholarshiplist tr",
+        {
+            "title": ".scholarship-name, a",
+            "description": ".scholarship-description",
+            "amount": ".scholarship-amount, .amount",
+            "deadline": ".scholarship-deadline, .deadline",
+        },
+        country="USA",
+    )
+
+
+def parse_findamasters(html: str) -> List[Dict[str, Any]]:
+    """Funding listings on FindAMasters."""
+    return parse_listing(
+        html,
+        ".resultsRow, .funding-listing",
+        {
+            "title": "h3, .title",
+            "description": ".descFrag, .description",
+            "amount": ".fundingAmount, .amount",
+            "deadline": ".deadline",
+            "country": ".country",
+        },
+        country="UK",
+    )
+
+
+def parse_profellows(html: str) -> List[Dict[str, Any]]:
+    """Fellowship listings on ProFellow."""
+    return parse_listing(
+        html,
+        "article.fellowship, .fellowship-item",
+        {
+            "title": "h2, h3, .fellowship-title",
+            "description": ".excerpt, .description",
+            "amount": ".award, .amount",
+            "deadline": ".deadline",
+            "country": ".country",
+        },
+        country="Multiple",
+    )
+
+
+def extract_text(html: str) -> str:
+    """Visible text of a page, one block per line."""
+    return BeautifulSoup(html, "html.parser").get_text(separator="\n", strip=True)
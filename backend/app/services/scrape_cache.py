@@ -0,0 +1,123 @@
+import gzip
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+class ScrapeCache:
+    """
+    Per-URL record of the last page the scraper fetched.
+
+    Validators (ETag, Last-Modified) and a content hash sit in a small
+    SQLite table so the next run can send a conditional request and skip
+    parsing when the server answers 304 or returns identical bytes. The
+    body itself is kept gzip-compressed under SCRAPER_CACHE_DIR/pages so
+    parsers can be replayed against real pages without refetching.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = Path(path or settings.SCRAPER_CACHE_DIR)
+        self.pages_path = self.path / "pages"
+        self.pages_path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path / "cache.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def _body_path(self, url: str) -> Path:
+        return self.pages_path / f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.html.gz"
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, content_hash, size, fetched_at FROM pages WHERE url = ?",
+                (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, digest, size, fetched_at = row
+        return {
+            "etag": etag,
+            "last_modified": last_modified,
+            "content_hash": digest,
+            "size": size,
+            "fetched_at": fetched_at,
+        }
+
+    @staticmethod
+    def conditional_headers(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        headers = {}
+        if entry:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(self, url: str, body: bytes, etag: Optional[str], last_modified: Optional[str]) -> str:
+        """Store a freshly fetched page; returns its content hash."""
+        digest = content_hash(body)
+        path = self._body_path(url)
+        tmp_path = path.with_suffix(".tmp")
+        with gzip.open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, content_hash, size, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, digest, len(body), time.time())
+            )
+            self._conn.commit()
+        return digest
+
+    def touch(self, url: str, etag: Optional[str], last_modified: Optional[str]):
+        """Record that the cached page is still current, keeping any
+        validators the server sent this time."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pages SET etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified), "
+                "fetched_at = ? WHERE url = ?",
+                (etag, last_modified, time.time(), url)
+            )
+            self._conn.commit()
+
+    def load_body(self, url: str) -> Optional[bytes]:
+        """The last stored body for url, for replaying parsers offline."""
+        path = self._body_path(url)
+        if not path.exists():
+            return None
+        with gzip.open(path, "rb") as f:
+            return f.read()
+
+    def forget(self, url: str):
+        """Drop url so the next run fetches and parses it in full."""
+        with self._lock:
+            self._conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            self._conn.commit()
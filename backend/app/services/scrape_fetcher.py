@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Worth another attempt: rate limiting and transient server/gateway errors
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RobotsDisallowedError(Exception):
+    """The site's robots.txt doesn't allow our user agent to fetch this URL."""
+
+
+class ScrapeFetcher:
+    """
+    Async page fetcher shared by every source in a scrape run.
+
+    One pooled httpx client (SCRAPER_MAX_CONNECTIONS) serves the run, each
+    host gets at most SCRAPER_PER_HOST_CONCURRENCY requests at a time so a
+    slow site can't be hammered, and timeouts, connection errors, 429s and
+    5xx responses are retried up to SCRAPER_MAX_RETRIES times with jittered
+    exponential backoff (honouring Retry-After). With SCRAPER_RESPECT_ROBOTS
+    each host's robots.txt is read once per fetcher and disallowed URLs
+    raise RobotsDisallowedError instead of being requested.
+
+        async with ScrapeFetcher() as fetcher:
+            response = await fetcher.fetch(url)
+    """
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._robots: Dict[str, asyncio.Task] = {}
+
+    async def __aenter__(self) -> "ScrapeFetcher":
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.SCRAPER_TIMEOUT_SECONDS),
+            limits=httpx.Limits(max_connections=settings.SCRAPER_MAX_CONNECTIONS),
+            headers={"User-Agent": settings.SCRAPER_USER_AGENT},
+            follow_redirects=True,
+            transport=self._transport,
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._client.aclose()
+        self._client = None
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(settings.SCRAPER_PER_HOST_CONCURRENCY)
+        return self._host_limits[host]
+
+    async def _load_robots(self, origin: str) -> RobotFileParser:
+        rules = RobotFileParser()
+        try:
+            async with self._host_limit(origin):
+                response = await self._client.get(f"{origin}/robots.txt")
+        except (httpx.TimeoutException, httpx.TransportError) as e:
+            # Can't tell what's allowed, so stay off the host this run
+            logger.warning(f"Could not read robots.txt for {origin} ({e}), skipping host")
+            rules.disallow_all = True
+            return rules
+
+        # Same reading as urllib.robotparser: 401/403 forbid everything,
+        # other 4xx mean there are no rules, 5xx leave us unable to tell
+        if response.status_code in (401, 403) or response.status_code >= 500:
+            rules.disallow_all = True
+        elif response.status_code >= 400:
+            rules.allow_all = True
+        else:
+            rules.parse(response.text.splitlines())
+        return rules
+
+    async def allowed(self, url: str) -> bool:
+        if not settings.SCRAPER_RESPECT_ROBOTS:
+            return True
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        if origin not in self._robots:
+            # One robots.txt request per host, shared by concurrent fetches
+            self._robots[origin] = asyncio.ensure_future(self._load_robots(origin))
+        rules = await self._robots[origin]
+        return rules.can_fetch(settings.SCRAPER_USER_AGENT, url)
+
+    @staticmethod
+    def _retry_delay(attempt: int, response: Optional[httpx.Response]) -> float:
+        delay = random.uniform(0, settings.SCRAPER_RETRY_BASE_SECONDS * 2 ** attempt)
+        if response is not None:
+            try:
+                delay = max(delay, float(response.headers.get("Retry-After", 0)))
+            except ValueError:
+                pass
+        return min(delay, settings.SCRAPER_TIMEOUT_SECONDS)
+
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        """GET url with retries. Returns the last response (which may still
+        be an error status); raises the last httpx error if no response
+        ever came back, or RobotsDisallowedError if robots.txt forbids url."""
+        if not await self.allowed(url):
+            metrics.increment("scraper.robots_disallowed")
+            raise RobotsDisallowedError(f"robots.txt disallows {url}")
+
+        attempt = 0
+        while True:
+            response = None
+            error = None
+            started = time.perf_counter()
+            try:
+                async with self._host_limit(url):
+                    response = await self._client.get(url, headers=headers)
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                error = e
+            metrics.observe("scraper.fetch_ms", (time.perf_counter() - started) * 1000)
+
+            retryable = error is not None or response.status_code in RETRYABLE_STATUSES
+            if not retryable or attempt >= settings.SCRAPER_MAX_RETRIES:
+                if error is not None:
+                    metrics.increment("scraper.fetch_errors")
+                    raise error
+                return response
+
+            delay = self._retry_delay(attempt, response)
+            attempt += 1
+            metrics.increment("scraper.retries")
+            reason = error or f"HTTP {response.status_code}"
+            logger.warning(f"Fetching {url} failed ({reason}), retry {attempt} in {delay:.1f}s")
+            await asyncio.sleep(delay)
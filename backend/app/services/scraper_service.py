@@ -1,81 +1,64 @@
+import hashlib
 import logging
 import asyncio
-from typing import List, Dict, Any
-from bs4 import BeautifulSoup
-import requests
-from datetime import datetime
+import multiprocessing
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
+from app.core.metrics import metrics
 from app.models.scraper import ScrapedScholarship
-from app.services.email_service import send_scholarship_alert
+from app.services.scholarship_parsers import (
+    parse_scholarships_com, parse_findamasters, parse_profellows, extract_text
+)
+from app.services.scrape_cache import ScrapeCache, content_hash
+from app.services.scrape_fetcher import ScrapeFetcher
+from app.services.llm_client import llm_client
+from app.services.llm_json import parse_json_object
 
 logger = logging.getLogger(__name__)
 
 
-class ScholarshipScraper:
-    def __init__(self):
-        self.sources = [
-            {
-                "name": "Scholarships.com",
-                "url": "https://www.scholarships.com/financial-aid/college-scholarships/scholarships-by-type/graduate-scholarships/",
-                "parser": self.parse_scholarships_com
-            },
-            {
-                "name": "FindAMasters",
-                "url": "https://www.findamasters.com/funding/listings",
-                "parser": self.parse_findamasters
-            },
-            {
-                "name": "ProFellows",
-                "url": "https://www.profellow.com/fellowships/",
-                "parser": self.parse_profellows
-            }
-        ]
-    
-    def scrape_all_sources(self, db: Session) -> List[Dict[str, Any]]:
-        """Scrape all configured scholarship sources."""
-        results = []
-        
-        for source in self.sources:
-            try:
-                logger.info(f"Scraping {source['name']}...")
-                scholarships = source["parser"](source["url"])
-                
-                for scholarship in scholarships:
-                    # Check if already exists
-                    existing = db.query(ScrapedScholarship).filter(
-                        ScrapedScholarship.source_url == source["url"],
-                        ScrapedScholarship.title == scholarship["title"]
-                    ).first()
-                    
-                    if not existing:
-                        scraped = ScrapedScholarship(
-                            source_url=source["url"],
-                            source_name=source["name"],
-                            title=scholarship["title"],
-                            description=scholarship.get("description"),
-                            amount=scholarship.get("amount"),
-                            deadline=scholarship.get("deadline"),
-                            country=scholarship.get("country"),
-                            raw_data=scholarship,
-                            is_notified=False
-                        )
-                        db.add(scraped)
-                        results.append(scholarship)
-                
-                db.commit()
-                logger.info(f"Found {len(scholarships)} scholarships from {source['name']}")
-                
-            except Exception as e:
-                logger.error(f"Error scraping {source['name']}: {e}")
-        
-        return results
-    
-    def parse_scholarships_com(self, url: str) -> List[Dict[str, Any]]:
-        """Parse scholarships from Scholarships.com (mock implementation)."""
-        # Note: Actual web scraping requires respecting robots.txt and terms of service
-        # This is a simplified mock implementation
-        scholarships = [
+def title_hash(title: str) -> str:
+    """Dedup key for a listing title: case and whitespace differences
+    between scrapes don't count as a new scholarship."""
+    normalized = " ".join(title.split()).casefold()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+DEFAULT_SOURCES = [
+    {
+        "name": "Scholarships.com",
+        "url": "https://www.scholarships.com/financial-aid/college-scholarships/scholarships-by-type/graduate-scholarships/",
+        "parser": parse_scholarships_com
+    },
+    {
+        "name": "FindAMasters",
+        "url": "https://www.findamasters.com/funding/listings",
+        "parser": parse_findamasters
+    },
+    {
+        "name": "ProFellows",
+        "url": "https://www.profellow.com/fellowships/",
+        "parser": parse_profellows
+    }
+]
+
+
+# Stand-in listings used unless SCRAPER_LIVE_SOURCES is set: the parsers'
+# selectors haven't been checked against the live sites, and scraping them
+# needs their terms of service reviewed first. Same names and urls as
+# DEFAULT_SOURCES so stored rows dedup the same way either way.
+MOCK_SOURCES = [
+    {
+        "name": "Scholarships.com",
+        "url": DEFAULT_SOURCES[0]["url"],
+        "listings": [
             {
                 "title": "Graduate Excellence Award",
                 "description": "Merit-based scholarship for outstanding graduate students",
@@ -91,11 +74,11 @@ class ScholarshipScraper:
                 "country": "USA"
             }
         ]
-        return scholarships
-    
-    def parse_findamasters(self, url: str) -> List[Dict[str, Any]]:
-        """Parse scholarships from FindAMasters (mock implementation)."""
-        scholarships = [
+    },
+    {
+        "name": "FindAMasters",
+        "url": DEFAULT_SOURCES[1]["url"],
+        "listings": [
             {
                 "title": "UK Research Council Scholarship",
                 "description": "Funding for research-based masters programs",
@@ -104,11 +87,11 @@ class ScholarshipScraper:
                 "country": "UK"
             }
         ]
-        return scholarships
-    
-    def parse_profellows(self, url: str) -> List[Dict[str, Any]]:
-        """Parse fellowships from ProFellows (mock implementation)."""
-        scholarships = [
+    },
+    {
+        "name": "ProFellows",
+        "url": DEFAULT_SOURCES[2]["url"],
+        "listings": [
             {
                 "title": "Global Graduate Fellowship",
                 "description": "Fellowship for students from developing countries",
@@ -117,39 +100,295 @@ class ScholarshipScraper:
                 "country": "Multiple"
             }
         ]
+    }
+]
+
+EXTRACTION_PROMPT = """Extract every scholarship, fellowship or funding opportunity described in this page text:
+
+{content}
+
+Respond with only a JSON object of the form
+{{"scholarships": [{{"title": "...", "description": "...", "amount": "...", "deadline": "...", "country": "..."}}]}}
+Use null for anything the text doesn't state, and an empty list if there are none."""
+
+
+class ScholarshipScraper:
+    """
+    Scrapes every scholarship source concurrently.
+
+    Pages are fetched together through one ScrapeFetcher (shared connection
+    pool, per-host limits, retries) and parsed in a process pool of
+    SCRAPER_PARSE_PROCESSES workers, so a run takes about as long as the
+    slowest source rather than the sum of all of them. Pass sources to
+    point the scraper elsewhere (e.g. at a local fixture server); each is a
+    {"name", "url", "parser"} dict whose parser is a module-level function
+    taking the page HTML. By default the scraper returns MOCK_SOURCES'
+    canned listings without any network access; set SCRAPER_LIVE_SOURCES
+    to fetch the real sites (robots.txt is honoured, see ScrapeFetcher).
+
+    With SCRAPER_CACHE_ENABLED, each fetch is a conditional request against
+    the ScrapeCache entry for its URL; a 304 or a body identical to the
+    last one skips parsing, since those listings are already stored. The
+    cache (and its directory) is only created by the first live fetch.
+    """
+    
+    def __init__(
+        self,
+        sources: Optional[List[Dict[str, Any]]] = None,
+        cache: Optional[ScrapeCache] = None
+    ):
+        if sources is None:
+            sources = DEFAULT_SOURCES if settings.SCRAPER_LIVE_SOURCES else MOCK_SOURCES
+        self.sources = sources
+        self._cache = cache
+        self.last_run_stats: Dict[str, Any] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+    
+    @property
+    def cache(self) -> Optional[ScrapeCache]:
+        if self._cache is None and settings.SCRAPER_CACHE_ENABLED:
+            self._cache = ScrapeCache()
+        return self._cache
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that runs threads can copy held locks
+            self._pool = ProcessPoolExecutor(
+                max_workers=settings.SCRAPER_PARSE_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+    
+    async def _parse(self, parser: Callable[[str], Any], html: str) -> Any:
+        pool = self._get_pool()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, parser, html)
+        except BrokenProcessPool:
+            # A worker died; replace the pool for later runs and parse this page in-process
+            logger.warning("Scraper parse pool broke, recreating it")
+            if self._pool is pool:
+                self._pool = None
+                pool.shutdown(wait=False, cancel_futures=True)
+            return await asyncio.to_thread(parser, html)
+    
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+    
+    async def _scrape_source(
+        self,
+        fetcher: ScrapeFetcher,
+        source: Dict[str, Any],
+        stats: Counter
+    ) -> List[Dict[str, Any]]:
+        logger.info(f"Scraping {source['name']}...")
+        if "listings" in source:
+            return [dict(item) for item in source["listings"]]
+        url = source["url"]
+        cache = self.cache
+        entry = await asyncio.to_thread(cache.get, url) if cache else None
+        stats["requests"] += 1
+        response = await fetcher.fetch(url, headers=ScrapeCache.conditional_headers(entry))
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        
+        if response.status_code == 304 and entry:
+            await asyncio.to_thread(cache.touch, url, etag, last_modified)
+            stats["not_modified"] += 1
+            stats["bytes_saved"] += entry["size"]
+            logger.info(f"{source['name']} not modified, skipping parse")
+            return []
+        
+        response.raise_for_status()
+        body = response.content
+        stats["bytes_downloaded"] += len(body)
+        if cache is None:
+            return await self._parse(source["parser"], response.text)
+        
+        if entry and content_hash(body) == entry["content_hash"]:
+            await asyncio.to_thread(cache.touch, url, etag, last_modified)
+            stats["unchanged"] += 1
+            logger.info(f"{source['name']} unchanged, skipping parse")
+            return []
+        
+        scholarships = await self._parse(source["parser"], response.text)
+        await asyncio.to_thread(cache.put, url, body, etag, last_modified)
+        stats["changed"] += 1
+        logger.info(f"Found {len(scholarships)} scholarships from {source['name']}")
         return scholarships
     
-    def scrape_with_ai(self, url: str, db: Session) -> List[Dict[str, Any]]:
+    def _report(self, stats: Counter) -> Dict[str, Any]:
+        """Summarise a run's cache use and publish it to metrics."""
+        hits = stats["not_modified"] + stats["unchanged"]
+        report = {
+            "requests": stats["requests"],
+            "not_modified": stats["not_modified"],
+            "unchanged": stats["unchanged"],
+            "changed": stats["changed"],
+            "hit_rate": round(hits / stats["requests"], 3) if stats["requests"] else 0.0,
+            "bytes_downloaded": stats["bytes_downloaded"],
+            "bytes_saved": stats["bytes_saved"],
+        }
+        metrics.increment("scraper.cache.hits", hits)
+        metrics.increment("scraper.cache.misses", stats["changed"])
+        metrics.increment("scraper.cache.bytes_saved", stats["bytes_saved"])
+        metrics.set_gauge("scraper.cache.hit_rate", report["hit_rate"])
+        logger.info(
+            f"Scrape cache: {hits}/{stats['requests']} hits "
+            f"({stats['not_modified']} not modified, {stats['unchanged']} unchanged), "
+            f"{stats['bytes_downloaded']} bytes downloaded, {stats['bytes_saved']} saved"
+        )
+        return report
+    
+    async def scrape_sources(self) -> List[Tuple[Dict[str, Any], Optional[List[Dict[str, Any]]]]]:
+        """Fetch and parse every source at once; returns (source, scholarships)
+        pairs, with None for sources that failed and [] for ones unchanged
+        since the last run. Cache statistics end up in last_run_stats."""
+        stats = Counter()
+        async with ScrapeFetcher() as fetcher:
+            outcomes = await asyncio.gather(
+                *(self._scrape_source(fetcher, source, stats) for source in self.sources),
+                return_exceptions=True
+            )
+        
+        results = []
+        for source, outcome in zip(self.sources, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"Error scraping {source['name']}: {outcome}")
+                metrics.increment("scraper.source_errors")
+                results.append((source, None))
+            else:
+                results.append((source, outcome))
+        self.last_run_stats = self._report(stats)
+        return results
+    
+    def scrape_all_sources(self, db: Session) -> List[Dict[str, Any]]:
+        """Scrape all configured scholarship sources and store new ones.
+        
+        Runs its own event loop, so call it from a worker thread (the
+        scheduler or a background task), not from async code.
+        """
+        started = time.perf_counter()
+        scraped = asyncio.run(self.scrape_sources())
+        results = []
+        
+        for source, scholarships in scraped:
+            if not scholarships:
+                continue
+            try:
+                results.extend(self._save_new(db, source, scholarships))
+                db.commit()
+                
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Error saving scholarships from {source['name']}: {e}")
+                # Otherwise the next run would see an unchanged page and never retry the save
+                if self._cache:
+                    self._cache.forget(source["url"])
+        
+        metrics.observe("scraper.run_ms", (time.perf_counter() - started) * 1000)
+        return results
+    
+    def _save_new(
+        self,
+        db: Session,
+        source: Dict[str, Any],
+        scholarships: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Insert the listings not yet stored for this source and return them.
+        
+        Known (source_url, title_hash) keys are loaded in one query and the
+        rest go in as a single INSERT ... ON CONFLICT DO NOTHING, so a
+        concurrent run can't create duplicates; what was actually new comes
+        from the RETURNING rows. Postgres and SQLite only.
+        """
+        pending = {}
+        for scholarship in scholarships:
+            pending.setdefault(title_hash(scholarship["title"]), scholarship)
+        
+        existing = {
+            key for (key,) in db.query(ScrapedScholarship.title_hash).filter(
+                ScrapedScholarship.source_url == source["url"],
+                ScrapedScholarship.title_hash.in_(list(pending))
+            )
+        }
+        rows = [
+            {
+                "source_url": source["url"],
+                "source_name": source["name"],
+                "title": scholarship["title"],
+                "title_hash": key,
+                "description": scholarship.get("description"),
+                "amount": scholarship.get("amount"),
+                "deadline": scholarship.get("deadline"),
+                "country": scholarship.get("country"),
+                "raw_data": scholarship,
+                "is_notified": False,
+            }
+            for key, scholarship in pending.items()
+            if key not in existing
+        ]
+        metrics.increment("scraper.duplicates", len(scholarships) - len(rows))
+        if not rows:
+            return []
+        
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            stmt = postgresql.insert(ScrapedScholarship).on_conflict_do_nothing(
+                index_elements=["source_url", "title_hash"]
+            )
+        elif dialect == "sqlite":
+            stmt = sqlite.insert(ScrapedScholarship).on_conflict_do_nothing(
+                index_elements=["source_url", "title_hash"]
+            )
+        else:
+            # Without ON CONFLICT the first duplicate would abort the whole batch
+            raise ValueError(f"Unsupported database for scraped scholarships: {dialect}")
+        
+        inserted = set(db.execute(
+            stmt.values(rows).returning(ScrapedScholarship.title_hash)
+        ).scalars())
+        return [pending[key] for key in pending if key in inserted]
+    
+    async def scrape_with_ai(self, url: str, db: Session) -> List[Dict[str, Any]]:
         """
         AI-powered scraping using LLM to extract scholarship info.
-        This uses the chatbot's LLM to intelligently parse web pages.
+        Fetches url (subject to robots.txt), sends the page text to the LLM
+        on the background lane and returns the listings it found that have
+        a title; [] if the page or the reply can't be used.
         """
         try:
-            response = requests.get(url, timeout=10)
-            soup = BeautifulSoup(response.text, 'html.parser')
+            async with ScrapeFetcher() as fetcher:
+                response = await fetcher.fetch(url)
+            response.raise_for_status()
             
             # Extract main content
-            content = soup.get_text(separator='\n', strip=True)
-            
-            # Use LLM to extract structured data (simplified)
-            # In production, you'd use the Groq API here
-            prompt = f"""
-            Extract scholarship information from this text:
-            
-            {content[:2000]}
+            content = await self._parse(extract_text, response.text)
             
-            Return JSON with: title, description, amount, deadline, country
-            """
+            reply = await llm_client.complete(
+                [{"role": "user", "content": EXTRACTION_PROMPT.format(
+                    content=content[:settings.SCRAPER_AI_MAX_CHARS]
+                )}],
+                temperature=0.0,
+                max_tokens=1500,
+                lane="background",
+            )
+            fields, _ = parse_json_object(reply)
+            listings = fields.get("scholarships")
+            if not isinstance(listings, list):
+                logger.warning(f"AI scraping of {url} returned no scholarship list")
+                return []
             
-            # This would call your LLM service
-            # For now, return mock data
-            return [{
-                "title": "AI-Extracted Scholarship",
-                "description": "Scholarship found by AI scraper",
-                "amount": "$20,000",
-                "deadline": "TBD",
-                "country": "Various"
-            }]
+            scholarships = []
+            for item in listings:
+                if not isinstance(item, dict) or not str(item.get("title") or "").strip():
+                    continue
+                scholarships.append({
+                    key: (str(item[key]).strip() if item.get(key) is not None else None)
+                    for key in ("title", "description", "amount", "deadline", "country")
+                })
+            return scholarships
             
         except Exception as e:
             logger.error(f"Error in AI scraping: {e}")
@@ -0,0 +1,115 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.vector_service import vector_service
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """
+    LRU cache of chatbot answers keyed by question embedding.
+
+    A lookup hits when a cached question's embedding has cosine similarity
+    of at least CHAT_CACHE_SIMILARITY with the new one *and* retrieval
+    returned the same documents, so a paraphrase is only answered from
+    cache when the model would have seen the same context. Embeddings live
+    in one preallocated matrix so a lookup is a single matrix-vector
+    product. Every entry is tied to the knowledge base index version and
+    the whole cache is dropped when that version changes.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        max_entries: Optional[int] = None,
+        threshold: Optional[float] = None
+    ):
+        self.max_entries = max_entries or settings.CHAT_CACHE_MAX_ENTRIES
+        self.threshold = settings.CHAT_CACHE_SIMILARITY if threshold is None else threshold
+        self._lock = threading.Lock()
+        self._vectors = np.zeros((self.max_entries, dim), dtype=np.float32)
+        self._valid = np.zeros(self.max_entries, dtype=bool)
+        # slot -> (doc_ids, answer), in LRU order
+        self._entries: "OrderedDict[int, Tuple[Tuple[int, ...], str]]" = OrderedDict()
+        self._free = list(range(self.max_entries - 1, -1, -1))
+        self._version = None
+        self._hits = 0
+        self._lookups = 0
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _reset(self):
+        self._entries.clear()
+        self._valid[:] = False
+        self._free = list(range(self.max_entries - 1, -1, -1))
+
+    def _check_version(self, version: int):
+        if version != self._version:
+            if self._entries:
+                logger.info("Knowledge base reindexed, dropping cached chat answers")
+            self._reset()
+            self._version = version
+
+    def _record(self, hit: bool):
+        self._lookups += 1
+        if hit:
+            self._hits += 1
+        metrics.increment("chat.cache.hits" if hit else "chat.cache.misses")
+        metrics.set_gauge("chat.cache.hit_rate", round(self._hits / self._lookups, 4))
+
+    def get(self, embedding: np.ndarray, doc_ids: Sequence[int], version: int) -> Optional[str]:
+        """Return the cached answer for a similar question over the same documents."""
+        key = tuple(sorted(doc_ids))
+        query = self._normalize(embedding)
+        with self._lock:
+            self._check_version(version)
+            if not self._entries:
+                self._record(False)
+                return None
+
+            scores = self._vectors @ query
+            scores[~self._valid] = -1.0
+            candidates = np.flatnonzero(scores >= self.threshold)
+            for slot in candidates[np.argsort(-scores[candidates])]:
+                slot = int(slot)
+                cached_ids, answer = self._entries[slot]
+                if cached_ids == key:
+                    self._entries.move_to_end(slot)
+                    self._record(True)
+                    return answer
+
+            self._record(False)
+            return None
+
+    def put(self, embedding: np.ndarray, doc_ids: Sequence[int], version: int, answer: str):
+        key = tuple(sorted(doc_ids))
+        with self._lock:
+            self._check_version(version)
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot, _ = self._entries.popitem(last=False)
+                metrics.increment("chat.cache.evictions")
+            self._vectors[slot] = self._normalize(embedding)
+            self._valid[slot] = True
+            self._entries[slot] = (key, answer)
+            metrics.set_gauge("chat.cache.entries", len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+            metrics.set_gauge("chat.cache.entries", 0)
+
+
+# Singleton instance
+semantic_cache = SemanticCache(vector_service.embedding_dim)
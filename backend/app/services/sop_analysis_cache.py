@@ -0,0 +1,93 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.database.session import SessionLocal
+from app.models.sop import SOPAnalysisCache
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str, str]
+
+
+def sop_text_hash(sop_text: str) -> str:
+    """Hash of the SOP with whitespace normalised, so re-pasted text still matches."""
+    normalized = " ".join(sop_text.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class SOPAnalysisCacheStore:
+    """
+    LLM analyses keyed by (text hash, prompt version, model).
+
+    Entries are persisted in sop_analysis_cache so they survive restarts
+    and are shared between workers; each worker keeps the most recent
+    SOP_ANALYSIS_CACHE_SIZE in an in-memory LRU in front of the table.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or settings.SOP_ANALYSIS_CACHE_SIZE
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[CacheKey, Dict[str, Any]]" = OrderedDict()
+
+    def _remember(self, key: CacheKey, analysis: Dict[str, Any]):
+        with self._lock:
+            self._cache[key] = analysis
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def get(self, key: CacheKey) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            analysis = self._cache.get(key)
+            if analysis is not None:
+                self._cache.move_to_end(key)
+        if analysis is not None:
+            metrics.increment("sop.analysis_cache.memory_hits")
+            return dict(analysis)
+
+        text_hash, prompt_version, model = key
+        db = SessionLocal()
+        try:
+            row = db.query(SOPAnalysisCache.analysis).filter(
+                SOPAnalysisCache.text_hash == text_hash,
+                SOPAnalysisCache.prompt_version == prompt_version,
+                SOPAnalysisCache.model == model
+            ).first()
+        finally:
+            db.close()
+
+        if row is None:
+            metrics.increment("sop.analysis_cache.misses")
+            return None
+        metrics.increment("sop.analysis_cache.db_hits")
+        self._remember(key, row.analysis)
+        return dict(row.analysis)
+
+    def put(self, key: CacheKey, analysis: Dict[str, Any]):
+        text_hash, prompt_version, model = key
+        db = SessionLocal()
+        try:
+            db.add(SOPAnalysisCache(
+                text_hash=text_hash,
+                prompt_version=prompt_version,
+                model=model,
+                analysis=analysis
+            ))
+            db.commit()
+        except IntegrityError:
+            # Another request analysed the same text concurrently
+            db.rollback()
+        finally:
+            db.close()
+        self._remember(key, dict(analysis))
+
+
+# Singleton instance
+sop_analysis_cache = SOPAnalysisCacheStore()
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.database.session import SessionLocal
+from app.models.sop import SOP
+from app.services.sop_metrics import analyze_text
+from app.services.sop_service import sop_service
+
+logger = logging.getLogger(__name__)
+
+
+class SOPBatchService:
+    """
+    Analyses many SOPs in one request.
+
+    The local metrics pass runs in a process pool so large batches don't
+    hold the event loop (or the GIL), LLM analyses run with at most
+    SOP_BATCH_LLM_CONCURRENCY in flight per batch, results are yielded as
+    each document finishes, and every successful analysis is saved in a
+    single transaction at the end.
+    """
+
+    def __init__(self):
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that runs threads can copy held locks
+            self._pool = ProcessPoolExecutor(
+                max_workers=settings.SOP_BATCH_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    async def _local_metrics(self, sop_text: str) -> Dict[str, Any]:
+        pool = self._get_pool()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, analyze_text, sop_text)
+        except BrokenProcessPool:
+            # A worker died; replace the pool for later batches and finish this one in-process
+            logger.warning("SOP metrics process pool broke, recreating it")
+            if self._pool is pool:
+                self._pool = None
+                pool.shutdown(wait=False, cancel_futures=True)
+            return await asyncio.to_thread(analyze_text, sop_text)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _save_analyses(
+        self, user_id: int, analysed: List[Tuple[int, Dict[str, Any], Dict[str, Any]]]
+    ) -> List[Dict[str, int]]:
+        """Insert one SOP row per (item, analysis) in a single transaction.
+
+        Texts this user already has an analysed SOP for reuse that row.
+        """
+        if not analysed:
+            return []
+
+        db = SessionLocal()
+        try:
+            texts = list({item["sop_text"] for _, item, _ in analysed})
+            existing = dict(
+                db.query(SOP.content, SOP.id).filter(
+                    SOP.user_id == user_id,
+                    SOP.content.in_(texts),
+                    SOP.overall_score.isnot(None)
+                ).all()
+            )
+
+            new_sops = {}
+            for _, item, analysis in analysed:
+                text = item["sop_text"]
+                if text in existing or text in new_sops:
+                    continue
+                new_sops[text] = SOP(
+                    user_id=user_id,
+                    title=item.get("title") or "Analyzed SOP",
+                    content=text,
+                    overall_score=analysis.get('overall_score'),
+                    clarity_score=analysis.get('clarity_score'),
+                    motivation_score=analysis.get('motivation_score'),
+                    coherence_score=analysis.get('coherence_score'),
+                    relevance_score=analysis.get('relevance_score'),
+                    grammar_score=analysis.get('grammar_score'),
+                    strengths=analysis.get('strengths'),
+                    weaknesses=analysis.get('weaknesses'),
+                    suggestions=analysis.get('suggestions'),
+                    word_count=analysis['word_count'],
+                    reading_level=analysis['reading_level'],
+                    is_generated=False
+                )
+            db.add_all(new_sops.values())
+            db.commit()
+
+            existing.update({text: sop.id for text, sop in new_sops.items()})
+            return [
+                {"index": index, "sop_id": existing[item["sop_text"]]}
+                for index, item, _ in analysed
+            ]
+        finally:
+            db.close()
+
+    async def analyze_batch(self, user_id: int, items: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """Yield {"index", "title", "analysis"} (or "error") per SOP as it
+        completes, then a final {"done": True, ...} summary."""
+        semaphore = asyncio.Semaphore(settings.SOP_BATCH_LLM_CONCURRENCY)
+        started = time.perf_counter()
+
+        async def run(index: int, item: Dict[str, Any]):
+            try:
+                local = await self._local_metrics(item["sop_text"])
+                async with semaphore:
+                    analysis = await sop_service.analyze_sop(item["sop_text"], local=local)
+            except Exception as e:
+                logger.error(f"Batch analysis of item {index} failed: {e}")
+                analysis = {"error": "Analysis failed. Please try again."}
+            return index, item, analysis
+
+        tasks = [asyncio.create_task(run(i, item)) for i, item in enumerate(items)]
+        analysed = []
+        failed = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, item, analysis = await next_done
+                if "error" in analysis:
+                    failed += 1
+                    yield {"index": index, "title": item.get("title"), "error": analysis["error"]}
+                else:
+                    analysed.append((index, item, analysis))
+                    yield {"index": index, "title": item.get("title"), "analysis": analysis}
+        finally:
+            # Client went away mid-stream: stop spending LLM calls on it
+            for task in tasks:
+                task.cancel()
+
+        saved = await asyncio.to_thread(self._save_analyses, user_id, analysed)
+        metrics.increment("sop.batch.documents", len(items))
+        metrics.observe("sop.batch.duration_ms", (time.perf_counter() - started) * 1000)
+        yield {"done": True, "analyzed": len(analysed), "failed": failed, "saved": saved}
+
+
+# Singleton instance
+sop_batch_service = SOPBatchService()
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+from typing import Dict, Any
+
+from app.database.session import SessionLocal
+from app.models.sop import SOP
+from app.services.sop_service import sop_service
+from app.services.sop_version_service import sop_version_service
+
+logger = logging.getLogger(__name__)
+
+SOP_GENERATE_JOB = "sop_generate"
+SOP_IMPROVE_JOB = "sop_improve"
+
+ANALYSIS_COLUMNS = (
+    "overall_score", "clarity_score", "motivation_score", "coherence_score",
+    "relevance_score", "grammar_score", "strengths", "weaknesses", "suggestions",
+    "reading_level",
+)
+
+
+def _save_generated_sop(user_id: int, payload: Dict[str, Any], sop_text: str) -> int:
+    program_details = payload.get("program_details")
+    db = SessionLocal()
+    try:
+        sop = SOP(
+            user_id=user_id,
+            title=f"SOP for {program_details['program_name'] if program_details else 'Graduate Program'}",
+            content=sop_text,
+            program_id=payload.get("program_id"),
+            is_generated=True,
+            word_count=len(sop_text.split())
+        )
+        db.add(sop)
+        db.commit()
+        db.refresh(sop)
+        return sop.id
+    finally:
+        db.close()
+
+
+async def run_generate_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Generate an SOP from the profile captured at submit time and store it."""
+    payload = job["payload"]
+    sop_text = await sop_service.generate_sop(payload["user_profile"], payload.get("program_details"))
+    sop_id = await asyncio.to_thread(_save_generated_sop, job["user_id"], payload, sop_text)
+    return {"sop_id": sop_id, "word_count": len(sop_text.split())}
+
+
+def _load_sop(user_id: int, sop_id: int) -> SOP:
+    db = SessionLocal()
+    try:
+        sop = db.query(SOP).filter(SOP.id == sop_id, SOP.user_id == user_id).first()
+        if not sop:
+            raise ValueError("SOP not found")
+        db.expunge(sop)
+        return sop
+    finally:
+        db.close()
+
+
+def _save_improved_sop(sop_id: int, improved_text: str) -> int:
+    """Record the rewrite as the SOP's next version; returns the version number."""
+    db = SessionLocal()
+    try:
+        sop = db.query(SOP).filter(SOP.id == sop_id).with_for_update().first()
+        if not sop:
+            raise ValueError("SOP not found")
+        if improved_text == sop.content:
+            # Nothing changed, so the stored analysis still applies
+            return sop.version
+        version = sop_version_service.record_version(db, sop, improved_text)
+        sop.is_generated = True
+        # The stored analysis described the previous text
+        for field in ANALYSIS_COLUMNS:
+            setattr(sop, field, None)
+        db.commit()
+        return version
+    finally:
+        db.close()
+
+
+async def run_improve_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Rewrite an SOP using its stored analysis and save it as the SOP's next version."""
+    sop = await asyncio.to_thread(_load_sop, job["user_id"], job["payload"]["sop_id"])
+    analysis = {
+        'weaknesses': sop.weaknesses or [],
+        'suggestions': sop.suggestions or [],
+    }
+    improved_text = await sop_service.improve_sop(sop.content, analysis)
+    version = await asyncio.to_thread(_save_improved_sop, sop.id, improved_text)
+    return {"sop_id": sop.id, "version": version, "word_count": len(improved_text.split())}
@@ -0,0 +1,209 @@
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Any, List
+
+# One scan picks out words, sentence terminators and paragraph breaks
+TOKEN_RE = re.compile(r"\n[ \t]*\n\s*|[.!?]+|[A-Za-z]+(?:['’-][A-Za-z]+)*|\d+(?:[.,]\d+)*")
+
+# Overused SOP openers and filler phrases, matched on lowercase word sequences
+CLICHES = [
+    "from a young age",
+    "from an early age",
+    "ever since i was a child",
+    "ever since i was young",
+    "ever since childhood",
+    "since my childhood",
+    "for as long as i can remember",
+    "i have always been fascinated",
+    "i have always been passionate",
+    "i have always wanted",
+    "burning desire",
+    "it has always been my dream",
+    "my dream is to",
+    "make a difference",
+    "make the world a better place",
+    "in today's world",
+    "in today's fast paced world",
+    "fast paced world",
+    "cutting edge",
+    "state of the art",
+    "hard working",
+    "think outside the box",
+    "thinking outside the box",
+    "passion for learning",
+    "i am a quick learner",
+    "team player",
+    "thirst for knowledge",
+    "take my career to the next level",
+    "perfect fit",
+    "ideal candidate",
+]
+_CLICHE_WORDS = {tuple(re.findall(r"[a-z']+", phrase.replace("-", " "))) for phrase in CLICHES}
+_CLICHE_LENGTHS = sorted({len(words) for words in _CLICHE_WORDS})
+_MAX_CLICHE_LENGTH = _CLICHE_LENGTHS[-1]
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before
+being below between both but by can could did do does doing down during each few for from
+further had has have having he her here hers herself him himself his how i i'm i've if in
+into is it its itself just me more most my myself no nor not now of off on once only or
+other our ours ourselves out over own same she should so some such than that the their
+theirs them themselves then there these they this those through to too under until up very
+was we were what when where which while who whom why will with would you your yours
+yourself yourselves
+""".split())
+
+LONG_SENTENCE_WORDS = 35
+SHORT_SENTENCE_WORDS = 8
+LONG_PARAGRAPH_WORDS = 200
+MIN_REPEAT_COUNT = 4
+
+
+@lru_cache(maxsize=16384)
+def count_syllables(word: str) -> int:
+    """Vowel-group estimate of syllables, good enough for readability scores."""
+    word = word.lower().replace("’", "'")
+    if len(word) <= 3:
+        return 1
+    word = re.sub(r"(?:[^laeiouy]es|ed|[^laeiouy]e)$", "", word)
+    word = re.sub(r"^y", "", word)
+    return max(1, len(re.findall(r"[aeiouy]{1,2}", word)))
+
+
+def _percentile(sorted_values: List[int], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return float(sorted_values[index])
+
+
+def _reading_level(grade: float) -> str:
+    """Map a Flesch-Kincaid grade onto the levels used in SOP feedback."""
+    if grade < 13:
+        return "Undergraduate"
+    if grade < 17:
+        return "Graduate"
+    return "Professional"
+
+
+def analyze_text(text: str) -> Dict[str, Any]:
+    """Readability, sentence, paragraph, cliché and repetition metrics for an SOP.
+
+    Runs in a single pass over the text and needs no model, so it is cheap
+    enough to call on every request.
+    """
+    words = 0
+    syllables = 0
+    complex_words = 0
+    sentence_lengths: List[int] = []
+    paragraph_lengths: List[int] = []
+    sentence_words = 0
+    paragraph_words = 0
+    word_counts: Counter = Counter()
+    openers: Counter = Counter()
+    cliches: Counter = Counter()
+    window: List[str] = []
+
+    def end_sentence():
+        nonlocal sentence_words
+        if sentence_words:
+            sentence_lengths.append(sentence_words)
+            sentence_words = 0
+
+    def end_paragraph():
+        nonlocal paragraph_words
+        end_sentence()
+        if paragraph_words:
+            paragraph_lengths.append(paragraph_words)
+            paragraph_words = 0
+
+    for match in TOKEN_RE.finditer(text):
+        token = match.group()
+        first = token[0]
+        if first == "\n":
+            end_paragraph()
+            window.clear()
+            continue
+        if first in ".!?":
+            end_sentence()
+            window.clear()
+            continue
+
+        lower = token.lower().replace("’", "'")
+        if sentence_words == 0:
+            openers[lower] += 1
+        words += 1
+        sentence_words += 1
+        paragraph_words += 1
+
+        if first.isalpha():
+            word_syllables = count_syllables(lower)
+            syllables += word_syllables
+            if word_syllables >= 3 and "-" not in lower:
+                complex_words += 1
+            if lower not in STOPWORDS and len(lower) > 2:
+                word_counts[lower] += 1
+        else:
+            syllables += 1
+
+        for part in lower.split("-"):
+            window.append(part)
+        if len(window) > _MAX_CLICHE_LENGTH:
+            del window[:len(window) - _MAX_CLICHE_LENGTH]
+        for length in _CLICHE_LENGTHS:
+            if length <= len(window):
+                candidate = tuple(window[-length:])
+                if candidate in _CLICHE_WORDS:
+                    cliches[" ".join(candidate)] += 1
+    end_paragraph()
+
+    sentences = max(len(sentence_lengths), 1)
+    safe_words = max(words, 1)
+    words_per_sentence = words / sentences
+    syllables_per_word = syllables / safe_words
+    grade = 0.39 * words_per_sentence + 11.8 * syllables_per_word - 15.59 if words else 0.0
+
+    ordered = sorted(sentence_lengths)
+    mean = sum(ordered) / len(ordered) if ordered else 0.0
+    stdev = math.sqrt(sum((n - mean) ** 2 for n in ordered) / len(ordered)) if ordered else 0.0
+
+    repeat_floor = max(MIN_REPEAT_COUNT, int(0.015 * words))
+    return {
+        "word_count": words,
+        "sentence_count": len(sentence_lengths),
+        "paragraph_count": len(paragraph_lengths),
+        "reading_level": _reading_level(grade),
+        "readability": {
+            "flesch_reading_ease": round(
+                206.835 - 1.015 * words_per_sentence - 84.6 * syllables_per_word, 1
+            ) if words else 0.0,
+            "flesch_kincaid_grade": round(grade, 1),
+            "gunning_fog": round(0.4 * (words_per_sentence + 100 * complex_words / safe_words), 1),
+            "complex_word_ratio": round(complex_words / safe_words, 3),
+        },
+        "sentence_lengths": {
+            "mean": round(mean, 1),
+            "median": _percentile(ordered, 0.5),
+            "p90": _percentile(ordered, 0.9),
+            "max": ordered[-1] if ordered else 0,
+            "stdev": round(stdev, 1),
+            "long_sentences": sum(1 for n in ordered if n > LONG_SENTENCE_WORDS),
+            "short_sentences": sum(1 for n in ordered if n < SHORT_SENTENCE_WORDS),
+        },
+        "paragraphs": {
+            "word_counts": paragraph_lengths,
+            "long_paragraphs": sum(1 for n in paragraph_lengths if n > LONG_PARAGRAPH_WORDS),
+        },
+        "cliches": [{"phrase": phrase, "count": count} for phrase, count in cliches.most_common()],
+        "repeated_words": [
+            {"word": word, "count": count}
+            for word, count in word_counts.most_common(10) if count >= repeat_floor
+        ],
+        "repeated_openers": [
+            {"word": word, "count": count}
+            for word, count in openers.most_common(5)
+            if count >= 3 and count / sentences >= 0.2
+        ],
+    }
@@ -0,0 +1,404 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, literal_column
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.database.session import SessionLocal
+from app.models.sop import SOP, SOPTemplate, english_tsvector
+from app.services.lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+logger = logging.getLogger(__name__)
+
+SEARCH_KINDS = ("all", "sop", "template")
+
+# Templates share the similarity collection with SOPs; keep their ids apart
+TEMPLATE_ID_OFFSET = 1 << 40
+
+SNIPPET_WORDS = 30
+
+
+def _snippet(text: str, query: str) -> str:
+    """A window of text around the first query term, for fallback results."""
+    words = text.split()
+    terms = set(tokenize(query))
+    for i, word in enumerate(words):
+        if terms.intersection(tokenize(word)):
+            start = max(0, i - SNIPPET_WORDS // 3)
+            break
+    else:
+        start = 0
+    snippet = " ".join(words[start:start + SNIPPET_WORDS])
+    return ("... " if start else "") + snippet + (" ..." if start + SNIPPET_WORDS < len(words) else "")
+
+
+def _content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class SOPSearchService:
+    """
+    Keyword and similarity search over a user's SOPs and the SOP templates.
+
+    Keyword search runs in Postgres full-text search (GIN indexes on
+    to_tsvector) when the database is Postgres. Elsewhere each process
+    keeps a BM25 index per recently searched user (SOP_SEARCH_INDEX_USERS)
+    plus one for templates, rebuilt when a cheap signature query shows the
+    rows changed.
+
+    Similarity search embeds each SOP and template (mean of chunk
+    embeddings) into its own VectorService collection. Searches use what is
+    indexed now; when the signature shows a user's SOPs or the templates
+    changed, a single background thread re-embeds the SOPs whose updated_at
+    (templates: content hash) differs from the indexed copy, so a fresh
+    edit shows up in similarity results shortly after rather than making
+    the request wait on embedding. Reads and writes of the collection are
+    serialised by the vector backend.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._user_indexes: "OrderedDict[int, Tuple[tuple, BM25Index]]" = OrderedDict()
+        self._template_index: Optional[Tuple[tuple, BM25Index]] = None
+        self._vector_signatures: Dict[Any, tuple] = {}
+        self._vectors = None
+        self._sync_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sop-vector-sync")
+        self._sync_pending: set = set()
+
+    @property
+    def vectors(self):
+        if self._vectors is None:
+            from app.services.vector_service import VectorService, vector_service
+
+            self._vectors = VectorService(
+                settings.SOP_SEARCH_COLLECTION,
+                embedding_model=vector_service.embedding_model,
+                keep_text=False
+            )
+        return self._vectors
+
+    @staticmethod
+    def _sop_signature(db: Session, user_id: int) -> tuple:
+        return tuple(db.query(func.count(SOP.id), func.max(SOP.updated_at)).filter(
+            SOP.user_id == user_id
+        ).one())
+
+    @staticmethod
+    def _template_signature(db: Session) -> tuple:
+        # Templates have no updated_at, and an edit can keep the length; hash
+        # the texts (a small, rarely edited table)
+        digest = hashlib.sha256()
+        count = 0
+        for template_id, text in db.query(SOPTemplate.id, SOPTemplate.template_text).order_by(SOPTemplate.id):
+            digest.update(f"{template_id}:{len(text)}:".encode("utf-8"))
+            digest.update(text.encode("utf-8"))
+            count += 1
+        return (count, digest.hexdigest())
+
+    # Keyword search
+
+    def _postgres_search(
+        self, db: Session, user_id: int, query: str, kind: str, limit: int
+    ) -> List[Dict[str, Any]]:
+        ts_query = func.websearch_to_tsquery(literal_column("'english'"), query)
+        options = literal_column("'MaxWords=30, MinWords=10'")
+        rankings = []
+
+        if kind in ("all", "sop"):
+            document = english_tsvector(SOP.content)
+            rank = func.ts_rank_cd(document, ts_query)
+            rows = db.query(
+                SOP.id, SOP.title, rank.label("score"),
+                func.ts_headline(literal_column("'english'"), SOP.content, ts_query, options).label("snippet")
+            ).filter(
+                SOP.user_id == user_id,
+                document.op("@@")(ts_query)
+            ).order_by(rank.desc()).limit(limit).all()
+            rankings.append([
+                {"kind": "sop", "id": r.id, "title": r.title, "score": float(r.score), "snippet": r.snippet}
+                for r in rows
+            ])
+
+        if kind in ("all", "template"):
+            document = english_tsvector(SOPTemplate.template_text)
+            rank = func.ts_rank_cd(document, ts_query)
+            rows = db.query(
+                SOPTemplate.id, SOPTemplate.name, rank.label("score"),
+                func.ts_headline(
+                    literal_column("'english'"), SOPTemplate.template_text, ts_query, options
+                ).label("snippet")
+            ).filter(
+                document.op("@@")(ts_query)
+            ).order_by(rank.desc()).limit(limit).all()
+            rankings.append([
+                {"kind": "template", "id": r.id, "title": r.name, "score": float(r.score), "snippet": r.snippet}
+                for r in rows
+            ])
+
+        return self._merge(rankings, limit)
+
+    def _user_index(self, db: Session, user_id: int) -> BM25Index:
+        signature = self._sop_signature(db, user_id)
+        with self._lock:
+            cached = self._user_indexes.get(user_id)
+            if cached and cached[0] == signature:
+                self._user_indexes.move_to_end(user_id)
+                return cached[1]
+
+        index = BM25Index()
+        index.add_many(db.query(SOP.id, SOP.content).filter(SOP.user_id == user_id).all())
+        metrics.increment("sop.search.index_builds")
+        with self._lock:
+            self._user_indexes[user_id] = (signature, index)
+            self._user_indexes.move_to_end(user_id)
+            while len(self._user_indexes) > settings.SOP_SEARCH_INDEX_USERS:
+                self._user_indexes.popitem(last=False)
+        return index
+
+    def _templates_index(self, db: Session) -> BM25Index:
+        signature = self._template_signature(db)
+        cached = self._template_index
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        index = BM25Index()
+        index.add_many(db.query(SOPTemplate.id, SOPTemplate.template_text).all())
+        self._template_index = (signature, index)
+        return index
+
+    def _fallback_search(
+        self, db: Session, user_id: int, query: str, kind: str, limit: int
+    ) -> List[Dict[str, Any]]:
+        rankings = []
+
+        if kind in ("all", "sop"):
+            hits = self._user_index(db, user_id).search(query, limit=limit)
+            rows = {
+                r.id: r for r in db.query(SOP.id, SOP.title, SOP.content).filter(
+                    SOP.id.in_([doc_id for doc_id, _ in hits])
+                )
+            }
+            rankings.append([
+                {
+                    "kind": "sop", "id": doc_id, "title": rows[doc_id].title,
+                    "score": score, "snippet": _snippet(rows[doc_id].content, query)
+                }
+                for doc_id, score in hits if doc_id in rows
+            ])
+
+        if kind in ("all", "template"):
+            hits = self._templates_index(db).search(query, limit=limit)
+            rows = {
+                r.id: r for r in db.query(SOPTemplate.id, SOPTemplate.name, SOPTemplate.template_text).filter(
+                    SOPTemplate.id.in_([doc_id for doc_id, _ in hits])
+                )
+            }
+            rankings.append([
+                {
+                    "kind": "template", "id": doc_id, "title": rows[doc_id].name,
+                    "score": score, "snippet": _snippet(rows[doc_id].template_text, query)
+                }
+                for doc_id, score in hits if doc_id in rows
+            ])
+
+        return self._merge(rankings, limit)
+
+    @staticmethod
+    def _merge(rankings: List[List[Dict[str, Any]]], limit: int) -> List[Dict[str, Any]]:
+        """Interleave SOP and template hits by reciprocal rank; their raw
+        scores come from different indexes and aren't comparable."""
+        if len(rankings) == 1:
+            return rankings[0][:limit]
+        by_key = {(r["kind"], r["id"]): r for ranking in rankings for r in ranking}
+        keys = {key: i for i, key in enumerate(by_key)}
+        fused = reciprocal_rank_fusion(
+            [[keys[(r["kind"], r["id"])] for r in ranking] for ranking in rankings]
+        )
+        ordered = list(by_key.values())
+        return [ordered[i] for i, _ in fused[:limit]]
+
+    def search(self, db: Session, user_id: int, query: str, kind: str = "all", limit: int = 10) -> List[Dict[str, Any]]:
+        """Rank the user's SOPs and/or templates by keyword relevance to query."""
+        if kind not in SEARCH_KINDS:
+            raise ValueError(f"Unknown search kind: {kind}")
+        if not tokenize(query):
+            return []
+
+        started = time.perf_counter()
+        if db.bind.dialect.name == "postgresql":
+            results = self._postgres_search(db, user_id, query, kind, limit)
+        else:
+            results = self._fallback_search(db, user_id, query, kind, limit)
+        metrics.observe("sop.search.keyword_ms", (time.perf_counter() - started) * 1000)
+        return results
+
+    # Similarity search
+
+    def _store_vectors(self, key, signature: tuple, documents: List[Dict[str, Any]], embeddings: List[np.ndarray]):
+        """Write embeddings computed outside the lock and remember the signature
+        they were built from. A concurrent sync of the same key may write
+        older vectors last; the next signature check sees the mismatch and
+        re-embeds anything whose updated_at or content_hash is stale."""
+        with self._lock:
+            if documents:
+                self.vectors.add_documents(documents, embeddings=np.stack(embeddings))
+            self._vector_signatures[key] = signature
+        if documents:
+            metrics.increment("sop.search.embedded", len(documents))
+
+    def _sync_sop_vectors(self, db: Session, user_id: int):
+        """(Re-)embed this user's SOPs that changed since they were indexed."""
+        signature = self._sop_signature(db, user_id)
+        if self._vector_signatures.get(user_id) == signature:
+            return
+
+        rows = db.query(SOP.id, SOP.updated_at).filter(SOP.user_id == user_id).all()
+        indexed = self.vectors.backend.retrieve([r.id for r in rows])
+        stale = [
+            r.id for r in rows
+            if indexed.get(r.id, {}).get("updated_at") != (r.updated_at.isoformat() if r.updated_at else None)
+        ]
+        documents, embeddings = [], []
+        if stale:
+            for sop in db.query(SOP.id, SOP.content, SOP.updated_at).filter(SOP.id.in_(stale)):
+                documents.append({
+                    "id": sop.id,
+                    "type": "sop",
+                    "user_id": user_id,
+                    "updated_at": sop.updated_at.isoformat() if sop.updated_at else None,
+                })
+                embeddings.append(self.vectors.embed_document(sop.content))
+        self._store_vectors(user_id, signature, documents, embeddings)
+
+    def _sync_template_vectors(self, db: Session):
+        signature = self._template_signature(db)
+        if self._vector_signatures.get("templates") == signature:
+            return
+
+        rows = db.query(SOPTemplate.id, SOPTemplate.template_text).all()
+        indexed = self.vectors.backend.retrieve([TEMPLATE_ID_OFFSET + r.id for r in rows])
+        documents, embeddings = [], []
+        for row in rows:
+            content_hash = _content_hash(row.template_text)
+            if indexed.get(TEMPLATE_ID_OFFSET + row.id, {}).get("content_hash") != content_hash:
+                documents.append({
+                    "id": TEMPLATE_ID_OFFSET + row.id,
+                    "type": "template",
+                    "template_id": row.id,
+                    "content_hash": content_hash,
+                })
+                embeddings.append(self.vectors.embed_document(row.template_text))
+        self._store_vectors("templates", signature, documents, embeddings)
+
+    def _schedule_sync(self, key):
+        """Queue a background re-embed of key (a user id or "templates")."""
+        with self._lock:
+            if key in self._sync_pending:
+                return
+            self._sync_pending.add(key)
+        metrics.increment("sop.search.syncs_scheduled")
+        self._sync_pool.submit(self._run_sync, key)
+
+    def _run_sync(self, key):
+        db = SessionLocal()
+        try:
+            if key == "templates":
+                self._sync_template_vectors(db)
+            else:
+                self._sync_sop_vectors(db, key)
+        except Exception as e:
+            logger.error(f"Similarity index sync failed for {key}: {e}")
+        finally:
+            with self._lock:
+                self._sync_pending.discard(key)
+            db.close()
+
+    def similar(
+        self,
+        db: Session,
+        user_id: int,
+        text: str,
+        kind: str = "all",
+        limit: int = 5,
+        exclude_sop_id: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """SOPs and/or templates most similar in meaning to text."""
+        if kind not in SEARCH_KINDS:
+            raise ValueError(f"Unknown search kind: {kind}")
+
+        if kind in ("all", "sop") and self._vector_signatures.get(user_id) != self._sop_signature(db, user_id):
+            self._schedule_sync(user_id)
+        if kind in ("all", "template") and self._vector_signatures.get("templates") != self._template_signature(db):
+            self._schedule_sync("templates")
+
+        started = time.perf_counter()
+        vector = self.vectors.embed_document(text)
+        hits = []
+        if kind in ("all", "sop"):
+            hits += self.vectors.search_by_vector(
+                vector, limit=limit + 1, filters={"type": "sop", "user_id": user_id}
+            )
+        if kind in ("all", "template"):
+            hits += self.vectors.search_by_vector(vector, limit=limit, filters={"type": "template"})
+        hits.sort(key=lambda hit: hit["score"], reverse=True)
+
+        sop_ids = [h["id"] for h in hits if h["payload"]["type"] == "sop" and h["id"] != exclude_sop_id]
+        template_ids = [h["payload"]["template_id"] for h in hits if h["payload"]["type"] == "template"]
+        sops = {r.id: r for r in db.query(SOP.id, SOP.title, SOP.content).filter(SOP.id.in_(sop_ids))}
+        templates = {
+            r.id: r for r in db.query(SOPTemplate.id, SOPTemplate.name, SOPTemplate.template_text).filter(
+                SOPTemplate.id.in_(template_ids)
+            )
+        }
+
+        results, gone = [], []
+        for hit in hits:
+            if hit["payload"]["type"] == "sop":
+                if hit["id"] == exclude_sop_id:
+                    continue
+                row = sops.get(hit["id"])
+                if row is None:
+                    gone.append(hit["id"])
+                    continue
+                title, content = row.title, row.content
+            else:
+                row = templates.get(hit["payload"]["template_id"])
+                if row is None:
+                    gone.append(hit["id"])
+                    continue
+                title, content = row.name, row.template_text
+            results.append({
+                "kind": hit["payload"]["type"],
+                "id": row.id,
+                "title": title,
+                "score": hit["score"],
+                "snippet": " ".join(content.split()[:SNIPPET_WORDS]),
+            })
+
+        if gone:
+            # Deleted since they were indexed
+            self.remove_sops(gone)
+        metrics.observe("sop.search.similar_ms", (time.perf_counter() - started) * 1000)
+        return results[:limit]
+
+    def shutdown(self):
+        self._sync_pool.shutdown(wait=False, cancel_futures=True)
+        if self._vectors is not None:
+            self._vectors.close()
+
+    def remove_sops(self, sop_ids: List[int]):
+        """Drop deleted SOPs (or stale template ids) from the similarity index."""
+        with self._lock:
+            self.vectors.delete_documents(sop_ids)
+
+
+# Singleton instance
+sop_search_service = SOPSearchService()
@@ -1,23 +1,49 @@
+import asyncio
 import logging
-from typing import Dict, Any, Optional
-from groq import Groq
-from app.core.config import settings
 import re
+from typing import Dict, Any, Optional, List, Tuple, AsyncIterator
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.llm_client import llm_client, LLMOverloadedError
+from app.services.llm_json import IncrementalJSONParser, parse_json_object
+from app.services.sop_analysis_cache import sop_analysis_cache, sop_text_hash
+from app.services.sop_metrics import analyze_text
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever the analysis prompt changes so cached analyses are not reused
+ANALYSIS_PROMPT_VERSION = "3"
+
+SCORE_FIELDS = (
+    "overall_score", "clarity_score", "motivation_score",
+    "coherence_score", "relevance_score", "grammar_score",
+)
+LIST_FIELDS = ("strengths", "weaknesses", "suggestions")
+REQUIRED_ANALYSIS_FIELDS = SCORE_FIELDS + LIST_FIELDS
+ANALYSIS_FIELDS = REQUIRED_ANALYSIS_FIELDS + ("summary",)
+
+# Shape of each field when re-asking for it
+ANALYSIS_FIELD_TEMPLATES = {
+    **{name: "<0-100>" for name in SCORE_FIELDS},
+    **{name: '["...", "...", "..."]' for name in LIST_FIELDS},
+    "summary": '"Overall assessment in 2-3 sentences"',
+}
+
+# Scores sometimes come back as "85", "85/100" or "85%"
+SCORE_TEXT_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(?:/\s*100|%)?\s*$")
+
 
 class SOPService:
-    def __init__(self):
-        self.groq_client = Groq(api_key=settings.GROQ_API_KEY)
-        self.model = "llama-3.3-70b-versatile"
-    
-    def generate_sop(
+    async def generate_sop(
         self,
         user_profile: Dict[str, Any],
         program_details: Optional[Dict[str, Any]] = None
     ) -> str:
-        """Generate personalized SOP based on user profile."""
+        """Generate personalized SOP based on user profile.
+        
+        Raises ValueError if the LLM call fails, so callers never store an
+        error message as SOP text.
+        """
         
         prompt = f"""
 You are an expert SOP (Statement of Purpose) writer for graduate school applications. 
@@ -58,27 +84,34 @@ Generate a complete, polished SOP that admissions committees will love.
 """
 
         try:
-            response = self.groq_client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
+            sop_text = await llm_client.complete(
+                [{"role": "user", "content": prompt}],
                 temperature=0.8,
                 max_tokens=2000,
+                lane="sop_generation",
             )
-            
-            sop_text = response.choices[0].message.content
             return sop_text
             
+        except LLMOverloadedError:
+            raise
         except Exception as e:
             logger.error(f"Error generating SOP: {e}")
-            return "Error generating SOP. Please try again."
+            raise ValueError("Error generating SOP. Please try again.") from e
     
-    def analyze_sop(self, sop_text: str) -> Dict[str, Any]:
-        """Analyze SOP and provide detailed feedback."""
-        
-        # Calculate basic metrics
-        word_count = len(sop_text.split())
-        
-        prompt = f"""
+    @staticmethod
+    def _with_local_metrics(feedback: Dict[str, Any], local: Dict[str, Any]) -> Dict[str, Any]:
+        feedback['word_count'] = local['word_count']
+        feedback['reading_level'] = local['reading_level']
+        feedback['metrics'] = local
+        return feedback
+    
+    def quick_analyze_sop(self, sop_text: str) -> Dict[str, Any]:
+        """Local-only metrics for instant feedback while the LLM analysis runs."""
+        return analyze_text(sop_text)
+    
+    @staticmethod
+    def _analysis_prompt(sop_text: str) -> str:
+        return f"""
 You are an expert admissions counselor reviewing a Statement of Purpose (SOP).
 Analyze the following SOP and provide detailed, constructive feedback.
 
@@ -108,7 +141,6 @@ Provide your analysis in the following JSON format:
     "Suggestion 2",
     "Suggestion 3"
   ],
-  "reading_level": "Graduate/Professional/Undergraduate",
   "summary": "Overall assessment in 2-3 sentences"
 }}
 
@@ -121,54 +153,185 @@ SCORING CRITERIA:
 
 Be specific, constructive, and honest in your feedback.
 """
+    
+    @staticmethod
+    def _repair_prompt(problems: Dict[str, str]) -> str:
+        issues = "\n".join(f"- {name}: {problem}" for name, problem in problems.items())
+        template = ",\n".join(f'  "{name}": {ANALYSIS_FIELD_TEMPLATES[name]}' for name in problems)
+        return f"""
+Some fields of your analysis could not be used:
+{issues}
 
-        try:
-            response = self.groq_client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
+Reply with only a JSON object containing the corrected fields:
+{{
+{template}
+}}
+"""
+    
+    @staticmethod
+    def _validate_field(name: str, value: Any) -> Tuple[Any, Optional[str]]:
+        """Return (clean value, None) or (None, problem) for one analysis field."""
+        if name in SCORE_FIELDS:
+            if isinstance(value, str):
+                match = SCORE_TEXT_RE.match(value)
+                value = float(match.group(1)) if match else None
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= 100:
+                return None, "must be a number from 0 to 100"
+            return value, None
+        if name in LIST_FIELDS:
+            if isinstance(value, str):
+                value = [value]
+            if not isinstance(value, list):
+                return None, "must be a list of strings"
+            items = [item.strip() for item in value if isinstance(item, str) and item.strip()]
+            if not items:
+                return None, "must be a non-empty list of strings"
+            return items, None
+        if name == "summary":
+            if not isinstance(value, str) or not value.strip():
+                return None, "must be a short paragraph of text"
+            return value.strip(), None
+        return None, "unexpected field"
+    
+    def _check_fields(
+        self, fields: Dict[str, Any], malformed: List[str], required: Tuple[str, ...]
+    ) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """Split parsed fields into valid values and problems to re-ask about."""
+        valid: Dict[str, Any] = {}
+        problems: Dict[str, str] = {}
+        for name in required:
+            if name in fields:
+                value, problem = self._validate_field(name, fields[name])
+                if problem is None:
+                    valid[name] = value
+                else:
+                    problems[name] = problem
+            elif name in malformed:
+                problems[name] = "was not valid JSON"
+            elif name in REQUIRED_ANALYSIS_FIELDS:
+                problems[name] = "is missing"
+        return valid, problems
+    
+    async def _repair_analysis(
+        self, prompt: str, reply: str, analysis: Dict[str, Any], problems: Dict[str, str]
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Re-ask for just the invalid fields, up to SOP_ANALYSIS_REPAIR_ATTEMPTS
+        times, yielding each field as it is fixed.
+        
+        Raises ValueError when required fields are still invalid; optional
+        ones (the summary) are dropped instead.
+        """
+        attempts = 0
+        while problems and attempts < settings.SOP_ANALYSIS_REPAIR_ATTEMPTS:
+            attempts += 1
+            metrics.increment("sop.analysis.repairs")
+            logger.warning(f"Re-asking for invalid SOP analysis fields: {problems}")
+            repair = self._repair_prompt(problems)
+            reply = await llm_client.complete(
+                [
+                    {"role": "user", "content": prompt},
+                    {"role": "assistant", "content": reply},
+                    {"role": "user", "content": repair},
+                ],
                 temperature=0.3,
-                max_tokens=1500,
+                max_tokens=400,
+                lane="sop_analysis",
             )
+            fields, malformed = parse_json_object(reply)
+            fixed, problems = self._check_fields(fields, malformed, tuple(problems))
+            for name, value in fixed.items():
+                analysis[name] = value
+                yield name, value
+        
+        if any(name in REQUIRED_ANALYSIS_FIELDS for name in problems):
+            metrics.increment("sop.analysis.invalid")
+            raise ValueError(f"LLM analysis still invalid after repair: {problems}")
+    
+    async def analyze_sop_stream(
+        self, sop_text: str, local: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Analyze an SOP, yielding results as they become available.
+        
+        Yields {"metrics": ...} straight away, then {"field": name,
+        "value": ...} for each validated analysis field as the LLM output
+        arrives, and finally {"analysis": ...} with the complete feedback
+        (or {"error": ...}). Word count, reading level and the text metrics
+        come from the local analyzer; the LLM only provides scores and
+        qualitative feedback. Those are cached by normalised text, prompt
+        version and model, so resubmitting an unchanged SOP skips the LLM
+        call. Output that doesn't match the schema is re-asked for rather
+        than replaced with made-up scores.
+        """
+        
+        if local is None:
+            local = analyze_text(sop_text)
+        yield {"metrics": local}
+        
+        cache_key = (sop_text_hash(sop_text), ANALYSIS_PROMPT_VERSION, llm_client.model)
+        cached = await asyncio.to_thread(sop_analysis_cache.get, cache_key)
+        if cached is not None:
+            for name, value in cached.items():
+                yield {"field": name, "value": value}
+            yield {"analysis": self._with_local_metrics(cached, local)}
+            return
+        
+        prompt = self._analysis_prompt(sop_text)
+        parser = IncrementalJSONParser()
+        analysis: Dict[str, Any] = {}
+        reply = []
+        
+        def accept(completed):
+            for name, value in completed:
+                if name in ANALYSIS_FIELDS and name not in analysis:
+                    value, problem = self._validate_field(name, value)
+                    if problem is None:
+                        analysis[name] = value
+                        yield {"field": name, "value": value}
+        
+        try:
+            async for delta in llm_client.stream(
+                [{"role": "user", "content": prompt}],
+                temperature=0.3,
+                max_tokens=1000,
+                lane="sop_analysis",
+            ):
+                reply.append(delta)
+                for event in accept(parser.feed(delta)):
+                    yield event
+            for event in accept(parser.close()):
+                yield event
             
-            feedback_text = response.choices[0].message.content
-            
-            # Extract JSON from response
-            import json
-            import re
-            
-            # Try to extract JSON
-            json_match = re.search(r'\{.*\}', feedback_text, re.DOTALL)
-            if json_match:
-                feedback = json.loads(json_match.group())
-            else:
-                # Fallback if JSON extraction fails
-                feedback = {
-                    "overall_score": 75,
-                    "clarity_score": 75,
-                    "motivation_score": 75,
-                    "coherence_score": 75,
-                    "relevance_score": 75,
-                    "grammar_score": 75,
-                    "strengths": ["Well-written", "Clear structure"],
-                    "weaknesses": ["Could be more specific"],
-                    "suggestions": ["Add more details about experiences"],
-                    "reading_level": "Graduate",
-                    "summary": "Good SOP with room for improvement."
-                }
-            
-            feedback['word_count'] = word_count
-            
-            return feedback
+            _, problems = self._check_fields(parser.fields, parser.malformed, ANALYSIS_FIELDS)
+            async for name, value in self._repair_analysis(prompt, "".join(reply), analysis, problems):
+                yield {"field": name, "value": value}
             
+        except LLMOverloadedError:
+            raise
         except Exception as e:
             logger.error(f"Error analyzing SOP: {e}")
-            return {
-                "overall_score": 0,
-                "error": "Analysis failed. Please try again."
-            }
+            yield {"error": "Analysis failed. Please try again."}
+            return
+        
+        await asyncio.to_thread(sop_analysis_cache.put, cache_key, analysis)
+        yield {"analysis": self._with_local_metrics(dict(analysis), local)}
+    
+    async def analyze_sop(self, sop_text: str, local: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Analyze SOP and provide detailed feedback.
+        
+        Same as analyze_sop_stream but returns only the final result. Pass
+        local when the metrics were already computed (e.g. in a worker
+        process).
+        """
+        async for event in self.analyze_sop_stream(sop_text, local):
+            if "analysis" in event:
+                return event["analysis"]
+            if "error" in event:
+                return event
+        return {"error": "Analysis failed. Please try again."}
     
-    def improve_sop(self, sop_text: str, analysis: Dict[str, Any]) -> str:
-        """Generate improved version of SOP based on analysis."""
+    async def improve_sop(self, sop_text: str, analysis: Dict[str, Any]) -> str:
+        """Generate improved version of SOP based on analysis; raises
+        ValueError if the LLM call fails."""
         
         weaknesses_text = "\n".join(f"- {w}" for w in analysis.get('weaknesses', []))
         suggestions_text = "\n".join(f"- {s}" for s in analysis.get('suggestions', []))
@@ -193,19 +356,19 @@ Generate the improved SOP:
 """
 
         try:
-            response = self.groq_client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
+            improved_sop = await llm_client.complete(
+                [{"role": "user", "content": prompt}],
                 temperature=0.7,
                 max_tokens=2000,
+                lane="sop_generation",
             )
-            
-            improved_sop = response.choices[0].message.content
             return improved_sop
             
+        except LLMOverloadedError:
+            raise
         except Exception as e:
             logger.error(f"Error improving SOP: {e}")
-            return sop_text
+            raise ValueError("Error improving SOP. Please try again.") from e
 
 
 # Singleton instance
@@ -0,0 +1,158 @@
+import difflib
+import json
+import re
+from typing import List, Dict, Any, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.sop import SOP, SOPVersion
+
+# Diff at word granularity; whitespace runs are tokens so offsets stay exact
+DIFF_TOKEN_RE = re.compile(r"\s+|\S+")
+
+# Store a snapshot instead when a delta would be more than this share of the text
+MAX_DELTA_RATIO = 0.5
+
+
+def compute_delta(old: str, new: str) -> List[List[Any]]:
+    """Edits turning old into new, as [start, end, replacement] on old's characters."""
+    old_tokens = DIFF_TOKEN_RE.findall(old)
+    new_tokens = DIFF_TOKEN_RE.findall(new)
+
+    offsets = [0]
+    for token in old_tokens:
+        offsets.append(offsets[-1] + len(token))
+
+    matcher = difflib.SequenceMatcher(None, old_tokens, new_tokens, autojunk=False)
+    return [
+        [offsets[i1], offsets[i2], "".join(new_tokens[j1:j2])]
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+
+def apply_delta(text: str, delta: List[List[Any]]) -> str:
+    pieces = []
+    position = 0
+    for start, end, replacement in delta:
+        pieces.append(text[position:start])
+        pieces.append(replacement)
+        position = end
+    pieces.append(text[position:])
+    return "".join(pieces)
+
+
+class SOPVersionService:
+    """
+    Version history of an SOP, stored compactly.
+
+    The sops row always holds the latest text. Each earlier version is a
+    sop_versions row holding either a full snapshot or a word-level delta
+    against the version before it; a snapshot is taken every
+    SOP_SNAPSHOT_INTERVAL versions (or when a rewrite is too large for a
+    delta to pay off), so rebuilding any version replays a bounded number
+    of deltas.
+    """
+
+    def record_version(self, db: Session, sop: SOP, new_content: str) -> int:
+        """Make new_content the SOP's latest version; the caller commits."""
+        if new_content == sop.content:
+            return sop.version
+
+        current = sop.version or 1
+        last_snapshot = db.query(func.max(SOPVersion.version)).filter(
+            SOPVersion.sop_id == sop.id,
+            SOPVersion.content.isnot(None)
+        ).scalar()
+        if last_snapshot is None:
+            # History starts with the text as it is now
+            db.add(SOPVersion(
+                sop_id=sop.id,
+                version=current,
+                content=sop.content,
+                word_count=sop.word_count
+            ))
+            last_snapshot = current
+
+        new_version = current + 1
+        word_count = len(new_content.split())
+        delta = compute_delta(sop.content, new_content)
+        if (new_version - last_snapshot >= settings.SOP_SNAPSHOT_INTERVAL
+                or len(json.dumps(delta)) > MAX_DELTA_RATIO * len(new_content)):
+            db.add(SOPVersion(
+                sop_id=sop.id, version=new_version, content=new_content, word_count=word_count
+            ))
+            metrics.increment("sop.versions.snapshots")
+        else:
+            db.add(SOPVersion(
+                sop_id=sop.id, version=new_version, delta=delta, word_count=word_count
+            ))
+            metrics.increment("sop.versions.deltas")
+
+        sop.content = new_content
+        sop.version = new_version
+        sop.word_count = word_count
+        return new_version
+
+    def list_versions(self, db: Session, sop: SOP) -> List[Dict[str, Any]]:
+        rows = db.query(
+            SOPVersion.version, SOPVersion.word_count, SOPVersion.created_at
+        ).filter(SOPVersion.sop_id == sop.id).order_by(SOPVersion.version).all()
+        if not rows:
+            return [{"version": sop.version, "word_count": sop.word_count, "created_at": sop.created_at}]
+        return [
+            {"version": row.version, "word_count": row.word_count, "created_at": row.created_at}
+            for row in rows
+        ]
+
+    def get_content(self, db: Session, sop: SOP, version: int) -> Optional[str]:
+        """Rebuild a version from its nearest snapshot; None if it doesn't exist."""
+        if version == sop.version:
+            return sop.content
+
+        snapshot = db.query(SOPVersion.version, SOPVersion.content).filter(
+            SOPVersion.sop_id == sop.id,
+            SOPVersion.version <= version,
+            SOPVersion.content.isnot(None)
+        ).order_by(SOPVersion.version.desc()).first()
+        if snapshot is None:
+            return None
+
+        deltas = db.query(SOPVersion.delta).filter(
+            SOPVersion.sop_id == sop.id,
+            SOPVersion.version > snapshot.version,
+            SOPVersion.version <= version
+        ).order_by(SOPVersion.version).all()
+        if len(deltas) != version - snapshot.version:
+            return None
+
+        text = snapshot.content
+        for row in deltas:
+            text = apply_delta(text, row.delta)
+        return text
+
+    def diff(self, old: str, new: str) -> List[Dict[str, Any]]:
+        """Changed regions between two texts, positioned on the old text."""
+        changes = []
+        for start, end, replacement in compute_delta(old, new):
+            if start == end:
+                op = "insert"
+            elif not replacement:
+                op = "delete"
+            else:
+                op = "replace"
+            changes.append({
+                "op": op,
+                "old_start": start,
+                "old_end": end,
+                "old_text": old[start:end],
+                "new_text": replacement,
+            })
+        return changes
+
+
+# Singleton instance
+sop_version_service = SOPVersionService()
@@ -0,0 +1,648 @@
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Payload fields that can be used in search filters; indexed at collection setup
+FILTER_FIELDS = {
+    "type": "keyword",
+    "country": "keyword",
+    "field": "keyword",
+    "program_id": "integer",
+    "user_id": "integer",
+}
+
+
+QUANTIZATION_MODES = ("none", "scalar", "binary")
+
+
+def matches_filters(payload: Dict[str, Any], filters: Optional[Dict[str, Any]]) -> bool:
+    """Check a payload against {field: value or [values]} filters."""
+    for key, wanted in (filters or {}).items():
+        wanted = wanted if isinstance(wanted, (list, tuple, set)) else [wanted]
+        if payload.get(key) not in wanted:
+            return False
+    return True
+
+
+class VectorBackend:
+    """Storage/search interface used by VectorService."""
+
+    def __init__(self, collection_name: str, dim: int, quantization: Optional[str] = None):
+        self.collection_name = collection_name
+        self.dim = dim
+        self.quantization = (quantization or settings.VECTOR_QUANTIZATION).lower()
+        if self.quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown vector quantization: {self.quantization}")
+
+    def ensure_collection(self):
+        raise NotImplementedError
+
+    def upsert(self, ids: List[int], vectors: np.ndarray, payloads: List[Dict[str, Any]]):
+        raise NotImplementedError
+
+    def search(
+        self,
+        vector: np.ndarray,
+        limit: int,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Nearest neighbours of vector whose payload matches filters."""
+        raise NotImplementedError
+
+    def retrieve(self, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Return {id: payload} for the given ids."""
+        raise NotImplementedError
+
+    def delete(self, ids: List[int]):
+        """Remove the given ids; unknown ids are ignored."""
+        raise NotImplementedError
+
+    def reset(self):
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def close(self):
+        """Persist anything buffered; called on shutdown."""
+
+
+class QdrantBackend(VectorBackend):
+    """Backend that stores vectors in a Qdrant collection."""
+
+    def __init__(self, collection_name: str, dim: int, quantization: Optional[str] = None):
+        super().__init__(collection_name, dim, quantization)
+        from qdrant_client import QdrantClient
+
+        self.client = QdrantClient(
+            host=settings.QDRANT_HOST,
+            port=settings.QDRANT_PORT
+        )
+        self.ensure_collection()
+
+    def _quantization_config(self):
+        from qdrant_client.models import (
+            ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+            BinaryQuantization, BinaryQuantizationConfig,
+        )
+
+        if self.quantization == "scalar":
+            return ScalarQuantization(
+                scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+            )
+        if self.quantization == "binary":
+            return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+        return None
+
+    def ensure_collection(self):
+        """Create collection and its payload indexes if it doesn't exist."""
+        from qdrant_client.models import Distance, VectorParams, PayloadSchemaType
+
+        try:
+            collections = self.client.get_collections().collections
+            if not any(c.name == self.collection_name for c in collections):
+                self.client.create_collection(
+                    collection_name=self.collection_name,
+                    vectors_config=VectorParams(
+                        size=self.dim,
+                        distance=Distance.COSINE,
+                        on_disk=self.quantization != "none"
+                    ),
+                    quantization_config=self._quantization_config()
+                )
+                for field, schema in FILTER_FIELDS.items():
+                    self.client.create_payload_index(
+                        collection_name=self.collection_name,
+                        field_name=field,
+                        field_schema=PayloadSchemaType(schema)
+                    )
+                logger.info(f"Created collection: {self.collection_name}")
+        except Exception as e:
+            logger.error(f"Error creating collection: {e}")
+
+    @staticmethod
+    def _build_filter(filters: Optional[Dict[str, Any]]):
+        from qdrant_client.models import Filter, FieldCondition, MatchValue, MatchAny
+
+        if not filters:
+            return None
+
+        conditions = []
+        for key, value in filters.items():
+            if isinstance(value, (list, tuple, set)):
+                match = MatchAny(any=list(value))
+            else:
+                match = MatchValue(value=value)
+            conditions.append(FieldCondition(key=key, match=match))
+        return Filter(must=conditions)
+
+    def upsert(self, ids: List[int], vectors: np.ndarray, payloads: List[Dict[str, Any]]):
+        from qdrant_client.models import PointStruct
+
+        points = [
+            PointStruct(id=doc_id, vector=vector.tolist(), payload=payload)
+            for doc_id, vector, payload in zip(ids, vectors, payloads)
+        ]
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=points
+        )
+
+    def search(
+        self,
+        vector: np.ndarray,
+        limit: int,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        from qdrant_client.models import SearchParams, QuantizationSearchParams
+
+        search_params = None
+        if self.quantization != "none":
+            # Search the quantized vectors, then rescore with the originals
+            search_params = SearchParams(
+                quantization=QuantizationSearchParams(
+                    rescore=True,
+                    oversampling=settings.VECTOR_RESCORE_OVERSAMPLING
+                )
+            )
+
+        search_results = self.client.search(
+            collection_name=self.collection_name,
+            query_vector=vector.tolist(),
+            query_filter=self._build_filter(filters),
+            search_params=search_params,
+            limit=limit
+        )
+        return [
+            {"id": r.id, "score": r.score, "payload": r.payload}
+            for r in search_results
+        ]
+
+    def retrieve(self, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        points = self.client.retrieve(
+            collection_name=self.collection_name,
+            ids=ids,
+            with_payload=True
+        )
+        return {p.id: p.payload for p in points}
+
+    def delete(self, ids: List[int]):
+        from qdrant_client.models import PointIdsList
+
+        if ids:
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=PointIdsList(points=list(ids))
+            )
+
+    def reset(self):
+        self.client.delete_collection(self.collection_name)
+        self.ensure_collection()
+
+    def count(self) -> int:
+        return self.client.count(collection_name=self.collection_name).count
+
+
+# Number of set bits for every byte value, for Hamming distance on packed codes
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class NumpyBackend(VectorBackend):
+    """
+    In-process brute-force cosine index over a memory-mapped float32 matrix.
+
+    Vectors are L2-normalised on insert so a search is a single matrix-vector
+    product. Files live under VECTOR_INDEX_PATH/<collection>:
+      vectors.f32    - row-major float32 matrix, capacity rows x dim
+      ids.npy        - int64 document id for each used row
+      payloads.json  - payload for each used row
+      rows.log       - rows changed since ids.npy/payloads.json were written
+
+    A write touches only its own rows: vectors go straight into the memmap
+    and the changed (id, payload) rows are appended to rows.log as one JSON
+    line carrying the new row count. Every line is absolute, so replaying
+    the log on open is idempotent. The snapshot files are rewritten and the
+    log dropped once it outgrows the collection, on open, and on close().
+
+    With scalar quantization each row is also stored as int8 codes plus a
+    per-row scale (codes.scalar, scales.f32); with binary quantization as
+    sign bits packed into dim/8 bytes (codes.binary). Searches then scan
+    only the codes, and just the top limit * oversampling candidates are
+    rescored against their float32 rows.
+
+    Filterable payload fields are mirrored into int32 code arrays so a
+    filter becomes a vectorised mask instead of a per-row payload check.
+
+    All public methods hold one re-entrant lock: a write can remap the
+    matrices or move rows while a search or retrieve would be reading them.
+    """
+
+    # Rows scored per step when scanning quantized codes, bounding temporaries
+    CHUNK_ROWS = 16384
+
+    # Logged rows tolerated before compacting, in addition to the collection size
+    LOG_COMPACT_ROWS = 4096
+
+    def __init__(
+        self,
+        collection_name: str,
+        dim: int,
+        path: Optional[str] = None,
+        quantization: Optional[str] = None
+    ):
+        super().__init__(collection_name, dim, quantization)
+        self.path = Path(path or settings.VECTOR_INDEX_PATH) / collection_name
+        self._vectors: Optional[np.memmap] = None
+        self._codes: Optional[np.memmap] = None
+        self._scales: Optional[np.memmap] = None
+        self._capacity = 0
+        self._size = 0
+        self._ids: List[int] = []
+        self._payloads: List[Dict[str, Any]] = []
+        self._row_by_id: Dict[int, int] = {}
+        self._field_codes: Dict[str, np.ndarray] = {}
+        self._field_vocab: Dict[str, Dict[Any, int]] = {}
+        self._logged_rows = 0
+        self._lock = threading.RLock()
+        self.ensure_collection()
+
+    @property
+    def _vectors_file(self) -> Path:
+        return self.path / "vectors.f32"
+
+    @property
+    def _codes_file(self) -> Path:
+        return self.path / f"codes.{self.quantization}"
+
+    @property
+    def _code_spec(self):
+        """(dtype, row width) of the quantized code matrix."""
+        if self.quantization == "scalar":
+            return np.int8, self.dim
+        return np.uint8, (self.dim + 7) // 8
+
+    def _open_matrix(self, file: Path, dtype, width: int) -> np.memmap:
+        """Memory-map file as a capacity x width matrix, extending it if needed."""
+        nbytes = self._capacity * width * np.dtype(dtype).itemsize
+        with open(file, "ab") as f:
+            if f.tell() < nbytes:
+                f.truncate(nbytes)
+        return np.memmap(file, dtype=dtype, mode="r+", shape=(self._capacity, width))
+
+    def _open_matrices(self):
+        self._vectors = self._open_matrix(self._vectors_file, np.float32, self.dim)
+        if self.quantization != "none":
+            dtype, width = self._code_spec
+            self._codes = self._open_matrix(self._codes_file, dtype, width)
+            if self.quantization == "scalar":
+                self._scales = self._open_matrix(self.path / "scales.f32", np.float32, 1)
+
+    def _close_matrices(self):
+        for matrix in (self._vectors, self._codes, self._scales):
+            if matrix is not None:
+                matrix.flush()
+        self._vectors = self._codes = self._scales = None
+
+    @property
+    def _log_file(self) -> Path:
+        return self.path / "rows.log"
+
+    def ensure_collection(self):
+        """Open the on-disk index, creating an empty one if needed."""
+        with self._lock:
+            self._open_collection()
+
+    def _open_collection(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        ids_file = self.path / "ids.npy"
+        payloads_file = self.path / "payloads.json"
+
+        if self._vectors_file.exists() and ids_file.exists() and payloads_file.exists():
+            self._ids = np.load(ids_file).tolist()
+            with open(payloads_file) as f:
+                self._payloads = json.load(f)
+            if self._log_file.exists():
+                self._replay_log()
+            self._size = len(self._ids)
+            self._capacity = self._vectors_file.stat().st_size // (4 * self.dim)
+            codes_missing = self.quantization != "none" and not self._codes_file.exists()
+            self._open_matrices()
+            if codes_missing and self._size:
+                # Quantization was switched on for an existing index
+                logger.info(f"Building {self.quantization} codes for {self._size} vectors...")
+                for start in range(0, self._size, self.CHUNK_ROWS):
+                    rows = np.arange(start, min(start + self.CHUNK_ROWS, self._size))
+                    self._quantize_rows(rows, np.asarray(self._vectors[rows]))
+                self._codes.flush()
+            if self._log_file.exists():
+                self._compact()
+        else:
+            self._ids, self._payloads = [], []
+            self._size, self._capacity = 0, 0
+            self._field_codes = {}
+            self._close_matrices()
+            self._grow(1024)
+            self._compact()
+
+        self._row_by_id = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._field_vocab = {field: {} for field in FILTER_FIELDS}
+        self._field_codes = {
+            field: np.full(self._capacity, -1, dtype=np.int32) for field in FILTER_FIELDS
+        }
+        for row, payload in enumerate(self._payloads):
+            self._set_field_codes(row, payload)
+        logger.info(
+            f"Opened in-process index {self.path} "
+            f"({self._size} vectors, quantization={self.quantization})"
+        )
+
+    def _grow(self, min_capacity: int):
+        """Resize the memory-mapped matrices to hold at least min_capacity rows."""
+        self._close_matrices()
+        self._capacity = max(min_capacity, self._capacity * 2, 1024)
+        self._open_matrices()
+        for field, codes in self._field_codes.items():
+            grown = np.full(self._capacity, -1, dtype=np.int32)
+            grown[:len(codes)] = codes
+            self._field_codes[field] = grown
+
+    def _set_field_codes(self, row: int, payload: Dict[str, Any]):
+        for field, vocab in self._field_vocab.items():
+            value = payload.get(field)
+            if value is None or isinstance(value, (list, dict)):
+                self._field_codes[field][row] = -1
+            else:
+                self._field_codes[field][row] = vocab.setdefault(value, len(vocab))
+
+    def _filter_mask(self, filters: Dict[str, Any]) -> np.ndarray:
+        mask = np.ones(self._size, dtype=bool)
+        for key, wanted in filters.items():
+            wanted = wanted if isinstance(wanted, (list, tuple, set)) else [wanted]
+            if key in self._field_codes:
+                vocab = self._field_vocab[key]
+                codes = [vocab[v] for v in wanted if v in vocab]
+                mask &= np.isin(self._field_codes[key][:self._size], codes)
+            else:
+                mask &= np.fromiter(
+                    (matches_filters(p, {key: wanted}) for p in self._payloads),
+                    dtype=bool, count=self._size
+                )
+        return mask
+
+    def _replay_log(self):
+        """Apply rows.log on top of the snapshot just loaded."""
+        with open(self._log_file) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn last line from a crash mid-write; its vectors were never counted
+                    logger.warning(f"Ignoring truncated entry at the end of {self._log_file}")
+                    break
+                size = entry["size"]
+                missing = size - len(self._ids)
+                if missing > 0:
+                    self._ids.extend([None] * missing)
+                    self._payloads.extend([None] * missing)
+                for row, (doc_id, payload) in entry["rows"].items():
+                    row = int(row)
+                    if row < size:
+                        self._ids[row] = doc_id
+                        self._payloads[row] = payload
+                del self._ids[size:]
+                del self._payloads[size:]
+
+    def _flush(self, rows):
+        """Persist a write that changed rows (and possibly the row count)."""
+        for matrix in (self._vectors, self._codes, self._scales):
+            if matrix is not None:
+                matrix.flush()
+        changed = {
+            row: [self._ids[row], self._payloads[row]] for row in sorted(rows) if row < self._size
+        }
+        with open(self._log_file, "a") as f:
+            f.write(json.dumps({"size": self._size, "rows": changed}) + "\n")
+        self._logged_rows += max(1, len(changed))
+        if self._logged_rows > self._size + self.LOG_COMPACT_ROWS:
+            self._compact()
+
+    def _compact(self):
+        """Rewrite ids.npy/payloads.json from memory and drop the log."""
+        for matrix in (self._vectors, self._codes, self._scales):
+            if matrix is not None:
+                matrix.flush()
+        tmp_file = self.path / "ids.npy.tmp"
+        with open(tmp_file, "wb") as f:
+            np.save(f, np.asarray(self._ids, dtype=np.int64))
+        os.replace(tmp_file, self.path / "ids.npy")
+        tmp_file = self.path / "payloads.json.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(self._payloads, f)
+        os.replace(tmp_file, self.path / "payloads.json")
+        # Replaying a log over a newer snapshot is harmless, so a crash here loses nothing
+        self._log_file.unlink(missing_ok=True)
+        self._logged_rows = 0
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _quantize(self, vectors: np.ndarray):
+        """Return (codes, scales) for normalised vectors; scales is None for binary."""
+        if self.quantization == "scalar":
+            scales = np.maximum(np.abs(vectors).max(axis=-1, keepdims=True), 1e-12) / 127.0
+            codes = np.round(vectors / scales).astype(np.int8)
+            return codes, scales.astype(np.float32)
+        return np.packbits(vectors > 0, axis=-1), None
+
+    def _quantize_rows(self, rows: np.ndarray, vectors: np.ndarray):
+        codes, scales = self._quantize(vectors)
+        self._codes[rows] = codes
+        if scales is not None:
+            self._scales[rows] = scales
+
+    def _approx_scores(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Similarity estimates from the quantized codes, higher is better."""
+        query_codes, _ = self._quantize(query)
+        scores = np.empty(len(rows), dtype=np.float32)
+        for start in range(0, len(rows), self.CHUNK_ROWS):
+            chunk = rows[start:start + self.CHUNK_ROWS]
+            codes = self._codes[chunk]
+            if self.quantization == "scalar":
+                dots = codes.astype(np.float32) @ query_codes.astype(np.float32)
+                scores[start:start + len(chunk)] = dots * self._scales[chunk, 0]
+            else:
+                hamming = POPCOUNT[np.bitwise_xor(codes, query_codes)].sum(axis=1, dtype=np.int32)
+                scores[start:start + len(chunk)] = -hamming
+        return scores
+
+    def upsert(self, ids: List[int], vectors: np.ndarray, payloads: List[Dict[str, Any]]):
+        vectors = self._normalize(vectors)
+        with self._lock:
+            self._upsert(ids, vectors, payloads)
+
+    def _upsert(self, ids: List[int], vectors: np.ndarray, payloads: List[Dict[str, Any]]):
+        new_count = sum(1 for doc_id in ids if doc_id not in self._row_by_id)
+        if self._size + new_count > self._capacity:
+            self._grow(self._size + new_count)
+
+        rows = []
+        for doc_id, payload in zip(ids, payloads):
+            row = self._row_by_id.get(doc_id)
+            if row is None:
+                row = self._size
+                self._size += 1
+                self._ids.append(doc_id)
+                self._payloads.append(payload)
+                self._row_by_id[doc_id] = row
+            else:
+                self._payloads[row] = payload
+            self._set_field_codes(row, payload)
+            rows.append(row)
+
+        changed = rows
+        rows = np.asarray(rows, dtype=np.int64)
+        self._vectors[rows] = vectors
+        if self.quantization != "none":
+            self._quantize_rows(rows, vectors)
+
+        self._flush(changed)
+
+    def search(
+        self,
+        vector: np.ndarray,
+        limit: int,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        query = self._normalize(vector)
+        with self._lock:
+            return self._search(query, limit, filters)
+
+    def _search(
+        self,
+        query: np.ndarray,
+        limit: int,
+        filters: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        if self._size == 0:
+            return []
+
+        if filters:
+            rows = np.flatnonzero(self._filter_mask(filters))
+            if len(rows) == 0:
+                return []
+        else:
+            rows = np.arange(self._size)
+
+        if self.quantization != "none":
+            n_candidates = int(np.ceil(limit * settings.VECTOR_RESCORE_OVERSAMPLING))
+            if n_candidates < len(rows):
+                approx = self._approx_scores(rows, query)
+                rows = rows[np.argpartition(-approx, n_candidates - 1)[:n_candidates]]
+            rows = np.sort(rows)  # read candidate rows in file order
+            scores = self._vectors[rows] @ query
+        elif filters:
+            scores = self._vectors[rows] @ query
+        else:
+            scores = self._vectors[:self._size] @ query
+
+        limit = min(limit, len(rows))
+        if limit < len(rows):
+            top = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            top = np.arange(len(rows))
+        top = top[np.argsort(-scores[top])]
+        scores, top = scores[top], rows[top]
+
+        return [
+            {
+                "id": self._ids[row],
+                "score": float(score),
+                "payload": self._payloads[row]
+            }
+            for row, score in zip(top, scores)
+        ]
+
+    def retrieve(self, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        with self._lock:
+            return {
+                doc_id: self._payloads[self._row_by_id[doc_id]]
+                for doc_id in ids
+                if doc_id in self._row_by_id
+            }
+
+    def delete(self, ids: List[int]):
+        """Move the last row into each deleted row so rows stay contiguous."""
+        with self._lock:
+            self._delete(ids)
+
+    def _delete(self, ids: List[int]):
+        rows = sorted({self._row_by_id[i] for i in ids if i in self._row_by_id}, reverse=True)
+        changed = set()
+        for row in rows:
+            last = self._size - 1
+            del self._row_by_id[self._ids[row]]
+            if row != last:
+                for matrix in (self._vectors, self._codes, self._scales):
+                    if matrix is not None:
+                        matrix[row] = matrix[last]
+                for codes in self._field_codes.values():
+                    codes[row] = codes[last]
+                self._ids[row] = self._ids[last]
+                self._payloads[row] = self._payloads[last]
+                self._row_by_id[self._ids[row]] = row
+                changed.add(row)
+            for codes in self._field_codes.values():
+                codes[last] = -1
+            self._ids.pop()
+            self._payloads.pop()
+            self._size -= 1
+        if rows:
+            self._flush(changed)
+
+    def reset(self):
+        with self._lock:
+            self._close_matrices()
+            for file in self.path.iterdir():
+                file.unlink()
+            self._logged_rows = 0
+            self._open_collection()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._size
+
+    def close(self):
+        with self._lock:
+            if self._logged_rows or self._log_file.exists():
+                self._compact()
+
+    def memory_bytes(self) -> int:
+        """Bytes of the matrix a search scans in full (codes when quantized)."""
+        with self._lock:
+            size = self._size
+        if self.quantization == "none":
+            return size * self.dim * 4
+        _, width = self._code_spec
+        per_row = width + (4 if self.quantization == "scalar" else 0)
+        return size * per_row
+
+
+def get_vector_backend(collection_name: str, dim: int) -> VectorBackend:
+    """Build the vector backend selected by settings.VECTOR_BACKEND."""
+    backend = settings.VECTOR_BACKEND.lower()
+    if backend == "qdrant":
+        return QdrantBackend(collection_name, dim)
+    if backend == "numpy":
+        return NumpyBackend(collection_name, dim)
+    raise ValueError(f"Unknown VECTOR_BACKEND: {settings.VECTOR_BACKEND}")
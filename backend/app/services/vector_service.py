@@ -1,42 +1,57 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import json
 import logging
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import numpy as np
 from sentence_transformers import SentenceTransformer
 from app.core.config import settings
+from app.services.vector_backends import get_vector_backend, matches_filters
+from app.services.lexical_index import BM25Index, reciprocal_rank_fusion
+from app.services.document_store import document_store
 
 logger = logging.getLogger(__name__)
 
 
 class VectorService:
-    def __init__(self):
-        self.client = QdrantClient(
-            host=settings.QDRANT_HOST,
-            port=settings.QDRANT_PORT
-        )
-        # Use free local embedding model
-        logger.info("Loading embedding model...")
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+    # Words per chunk when embedding long documents (the model reads ~256 tokens)
+    DOCUMENT_CHUNK_WORDS = 180
+    
+    def __init__(
+        self,
+        collection_name: Optional[str] = None,
+        embedding_model: Optional[SentenceTransformer] = None,
+        keep_text: bool = True
+    ):
+        """Pass embedding_model to share an already loaded model between
+        collections; keep_text=False skips the document store and BM25
+        index for collections whose text lives elsewhere (e.g. SOPs)."""
+        if embedding_model is None:
+            # Use free local embedding model
+            logger.info("Loading embedding model...")
+            embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.embedding_model = embedding_model
         self.embedding_dim = 384  # Dimension for all-MiniLM-L6-v2
-        self.collection_name = settings.QDRANT_COLLECTION_NAME
+        self.collection_name = collection_name or settings.QDRANT_COLLECTION_NAME
+        self.keep_text = keep_text
         
-        self._ensure_collection_exists()
-    
-    def _ensure_collection_exists(self):
-        """Create collection if it doesn't exist."""
-        try:
-            collections = self.client.get_collections().collections
-            if not any(c.name == self.collection_name for c in collections):
-                self.client.create_collection(
-                    collection_name=self.collection_name,
-                    vectors_config=VectorParams(
-                        size=self.embedding_dim,
-                        distance=Distance.COSINE
-                    )
-                )
-                logger.info(f"Created collection: {self.collection_name}")
-        except Exception as e:
-            logger.error(f"Error creating collection: {e}")
+        self.backend = get_vector_backend(self.collection_name, self.embedding_dim)
+        
+        # BM25 index over the same documents, rebuilt lazily from the document
+        # store whenever the collection version moves past the one it was built from
+        self.lexical_index = BM25Index()
+        self._lexical_lock = threading.Lock()
+        self._lexical_version: Optional[int] = None
+        self._lexical_checked_at = float("-inf")
+        # Runs the BM25 half of hybrid_search alongside the dense half
+        self._lexical_pool = ThreadPoolExecutor(
+            max_workers=settings.HYBRID_SEARCH_THREADS, thread_name_prefix="lexical-search"
+        )
+        
+        # Repeated queries (e.g. cache lookup then search) embed only once
+        self.embed_query = lru_cache(maxsize=1024)(self._embed_query)
     
     def create_embedding(self, text: str) -> List[float]:
         """Create embedding for text using local model."""
@@ -47,50 +62,225 @@ class VectorService:
             logger.error(f"Error creating embedding: {e}")
             raise
     
-    def add_documents(self, documents: List[Dict[str, Any]]):
-        """Add documents to vector database."""
-        points = []
-        for doc in documents:
-            text = doc.get("text", "")
-            embedding = self.create_embedding(text)
-            
-            point = PointStruct(
-                id=doc["id"],
-                vector=embedding,
-                payload=doc
+    def _embed_query(self, text: str) -> np.ndarray:
+        embedding = np.asarray(self.create_embedding(text), dtype=np.float32)
+        embedding.setflags(write=False)
+        return embedding
+    
+    def create_embeddings(self, texts: List[str]) -> np.ndarray:
+        """Create embeddings for a batch of texts in one model call."""
+        try:
+            return np.asarray(
+                self.embedding_model.encode(texts, convert_to_tensor=False),
+                dtype=np.float32
             )
-            points.append(point)
+        except Exception as e:
+            logger.error(f"Error creating embeddings: {e}")
+            raise
+    
+    def embed_document(self, text: str) -> np.ndarray:
+        """Embedding of a whole document: the mean of its chunk embeddings.
         
-        self.client.upsert(
-            collection_name=self.collection_name,
-            points=points
-        )
-        logger.info(f"Added {len(points)} documents to vector database")
+        A single encode call only sees the first ~256 tokens, which for an
+        SOP would leave out everything after the opening paragraphs.
+        """
+        words = text.split()
+        chunks = [
+            " ".join(words[i:i + self.DOCUMENT_CHUNK_WORDS])
+            for i in range(0, len(words), self.DOCUMENT_CHUNK_WORDS)
+        ] or [""]
+        embeddings = self.create_embeddings(chunks)
+        embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings.mean(axis=0)
     
-    def search(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
-        """Search for similar documents."""
-        query_embedding = self.create_embedding(query)
+    def add_documents(self, documents: List[Dict[str, Any]], embeddings: Optional[np.ndarray] = None):
+        """Add documents to vector database.
         
-        search_results = self.client.search(
-            collection_name=self.collection_name,
-            query_vector=query_embedding,
-            limit=limit
-        )
+        The full "text" goes to the local document store; the vector store
+        payload keeps only ids and small filterable fields. Pass embeddings
+        to store precomputed vectors instead of embedding each "text".
+        """
+        if not documents:
+            return
         
-        results = []
-        for result in search_results:
-            results.append({
-                "id": result.id,
-                "score": result.score,
-                "payload": result.payload
-            })
+        texts = [doc.get("text", "") for doc in documents]
+        payloads = [{k: v for k, v in doc.items() if k not in ("id", "text")} for doc in documents]
         
+        if embeddings is None:
+            embeddings = self.create_embeddings(texts)
+        if self.keep_text:
+            document_store.put_many(
+                self.collection_name,
+                [(doc["id"], text) for doc, text in zip(documents, texts)]
+            )
+        self.backend.upsert(
+            ids=[doc["id"] for doc in documents],
+            vectors=embeddings,
+            payloads=payloads
+        )
+        if self.keep_text:
+            with self._lexical_lock:
+                for doc, text in zip(documents, texts):
+                    self.lexical_index.add(doc["id"], text)
+        self._bump_version()
+        
+        payload_bytes = sum(len(json.dumps(p)) for p in payloads)
+        text_bytes = sum(len(t.encode("utf-8")) for t in texts)
+        logger.info(
+            f"Added {len(documents)} documents to vector database "
+            f"({payload_bytes} payload bytes; {text_bytes} text bytes kept in document store)"
+        )
+    
+    def delete_documents(self, ids: List[int]):
+        """Remove documents from the vector store, document store and BM25 index."""
+        if not ids:
+            return
+        self.backend.delete(ids)
+        if self.keep_text:
+            document_store.delete_many(self.collection_name, ids)
+            with self._lexical_lock:
+                for doc_id in ids:
+                    self.lexical_index.remove(doc_id)
+        self._bump_version()
+    
+    def _bump_version(self):
+        version = document_store.bump_version(self.collection_name)
+        with self._lexical_lock:
+            # This process already applied the change to its BM25 index; if
+            # another process bumped in between, the gap forces a rebuild
+            if self._lexical_version == version - 1:
+                self._lexical_version = version
+    
+    def index_version(self) -> int:
+        """Changes whenever documents are added or the collection is cleared."""
+        return document_store.get_version(self.collection_name)
+    
+    def _attach_text(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fill payload["text"] for a page of results with one store read."""
+        missing = [r["id"] for r in results if "text" not in r["payload"]]
+        texts = document_store.get_many(self.collection_name, missing)
+        for result in results:
+            if result["id"] in texts:
+                result["payload"] = {**result["payload"], "text": texts[result["id"]]}
         return results
     
+    def search(
+        self,
+        query: str,
+        limit: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Search for similar documents.
+        
+        filters maps payload fields (type, country, field, program_id) to a
+        value or list of accepted values, and is applied inside the vector store.
+        """
+        return self._attach_text(self._dense_search(query, limit, filters))
+    
+    def search_by_vector(
+        self,
+        vector: np.ndarray,
+        limit: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Nearest neighbours of an existing embedding (e.g. from embed_document)."""
+        results = self.backend.search(vector, limit=limit, filters=filters)
+        return self._attach_text(results) if self.keep_text else results
+    
+    def _dense_search(
+        self,
+        query: str,
+        limit: int,
+        filters: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        return self.backend.search(self.embed_query(query), limit=limit, filters=filters)
+    
+    def _refresh_lexical_index(self):
+        """Rebuild the BM25 index if the collection changed since it was built
+        (e.g. a reindex by another process)."""
+        now = time.monotonic()
+        if now - self._lexical_checked_at < settings.LEXICAL_INDEX_REFRESH_SECONDS:
+            return
+        
+        with self._lexical_lock:
+            if now - self._lexical_checked_at < settings.LEXICAL_INDEX_REFRESH_SECONDS:
+                return
+            self._lexical_checked_at = now
+            
+            # Read the version first so changes made during the rebuild trigger another
+            version = document_store.get_version(self.collection_name)
+            if version == self._lexical_version:
+                return
+            
+            logger.info("Rebuilding lexical index from document store...")
+            index = BM25Index()
+            index.add_many(document_store.iter_texts(self.collection_name))
+            self.lexical_index = index
+            self._lexical_version = version
+    
+    def lexical_search(
+        self,
+        query: str,
+        limit: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Search documents by BM25 keyword relevance."""
+        return self._attach_text(self._lexical_search(query, limit, filters))
+    
+    def _lexical_search(
+        self,
+        query: str,
+        limit: int,
+        filters: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        self._refresh_lexical_index()
+        # BM25 has no payload index, so over-fetch and filter the hits
+        hits = self.lexical_index.search(query, limit=limit * 4 if filters else limit)
+        payloads = self.backend.retrieve([doc_id for doc_id, _ in hits])
+        
+        return [
+            {"id": doc_id, "score": score, "payload": payloads[doc_id]}
+            for doc_id, score in hits
+            if doc_id in payloads and matches_filters(payloads[doc_id], filters)
+        ][:limit]
+    
+    def hybrid_search(
+        self,
+        query: str,
+        limit: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Search with dense and BM25 retrieval, fused by reciprocal rank."""
+        candidates = max(limit * 4, 20)
+        lexical_future = self._lexical_pool.submit(self._lexical_search, query, candidates, filters)
+        dense = self._dense_search(query, candidates, filters)
+        lexical = lexical_future.result()
+        
+        payloads = {r["id"]: r["payload"] for r in lexical}
+        payloads.update({r["id"]: r["payload"] for r in dense})
+        
+        fused = reciprocal_rank_fusion(
+            [[r["id"] for r in dense], [r["id"] for r in lexical]],
+            k=settings.HYBRID_RRF_K
+        )
+        
+        return self._attach_text([
+            {"id": doc_id, "score": score, "payload": payloads[doc_id]}
+            for doc_id, score in fused[:limit]
+        ])
+    
     def delete_all(self):
         """Delete all documents from collection."""
-        self.client.delete_collection(self.collection_name)
-        self._ensure_collection_exists()
+        self.backend.reset()
+        document_store.clear(self.collection_name)
+        with self._lexical_lock:
+            self.lexical_index.clear()
+        self._bump_version()
+
+    def close(self):
+        """Flush the vector index on shutdown."""
+        self.backend.close()
+        self._lexical_pool.shutdown(wait=False)
 
 
 # Singleton instance
@@ -0,0 +1,98 @@
+"""
+Load-test the chat pipeline offline against the stub LLM provider.
+
+Simulated users each hold a multi-turn conversation in their own session,
+so retrieval, history reads/writes and prompt assembly run exactly as in
+production while the LLM itself is replaced by StubProvider. Run after
+index_knowledge_base.py so retrieval has documents to search.
+
+    python benchmark_chat_pipeline.py --users 200 --turns 3 --stream
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+import uuid
+
+# Must be set before app settings are loaded
+os.environ["LLM_PROVIDER"] = "stub"
+os.environ.setdefault("CHAT_CACHE_ENABLED", "false")
+# Provider rate limits would dominate the numbers; the stub has none
+os.environ.setdefault("LLM_RATE_LIMIT_RPM", "0")
+os.environ.setdefault("LLM_RATE_LIMIT_TPM", "0")
+
+import numpy as np
+from app.core.metrics import metrics
+from app.services.chat_history_service import chat_history
+from app.services.chat_service import chat_service
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BENCHMARK_USER_ID = 1
+QUESTIONS = [
+    "What is the GRE requirement for computer science programs in the USA?",
+    "Which scholarships are available for students going to the UK?",
+    "How much are tuition fees for data science masters in Germany?",
+    "What IELTS score do Canadian universities ask for?",
+    "Are there fully funded programs in artificial intelligence?",
+    "When are application deadlines for programs in Australia?",
+]
+
+
+async def run_user(index: int, turns: int, stream: bool, latencies: list):
+    session_id = f"benchmark-{uuid.uuid4().hex}"
+    try:
+        for turn in range(turns):
+            question = QUESTIONS[(index + turn) % len(QUESTIONS)]
+            started = time.perf_counter()
+            if stream:
+                async for _ in chat_service.chat_stream(BENCHMARK_USER_ID, question, session_id):
+                    pass
+            else:
+                await chat_service.chat(BENCHMARK_USER_ID, question, session_id)
+            latencies.append((time.perf_counter() - started) * 1000)
+    finally:
+        await asyncio.to_thread(chat_history.clear, BENCHMARK_USER_ID, session_id)
+
+
+def summarize(name: str, values):
+    if not values:
+        return
+    data = np.asarray(values, dtype=np.float64)
+    logger.info(
+        f"{name:>22}: n={len(data):5d} | avg {data.mean():8.1f} | "
+        f"p50 {np.percentile(data, 50):8.1f} | p95 {np.percentile(data, 95):8.1f} | "
+        f"max {data.max():8.1f}"
+    )
+
+
+async def main(users: int, turns: int, stream: bool):
+    latencies = []
+    started = time.perf_counter()
+    await asyncio.gather(*(run_user(i, turns, stream, latencies) for i in range(users)))
+    elapsed = time.perf_counter() - started
+
+    logger.info(
+        f"{users} users x {turns} turns ({'stream' if stream else 'complete'}): "
+        f"{len(latencies)} requests in {elapsed:.1f}s ({len(latencies) / elapsed:.1f} req/s)"
+    )
+    summarize("end_to_end_ms", latencies)
+    timings = metrics.snapshot()["timings"]
+    for name in ("chat.prepare_ms", "llm.queue_wait_ms", "llm.latency_ms", "chat.stream.ttft_ms"):
+        if name in timings:
+            t = timings[name]
+            logger.info(
+                f"{name:>22}: n={t['count']:5d} | avg {t['avg']:8.1f} | "
+                f"p50 {t['p50']:8.1f} | p95 {t['p95']:8.1f} | max {t['max']:8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--stream", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.turns, args.stream))
@@ -0,0 +1,98 @@
+import logging
+import tempfile
+import time
+import numpy as np
+from app.services.vector_backends import NumpyBackend, QdrantBackend, QUANTIZATION_MODES
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DIM = 384
+SIZES = [10_000, 100_000]
+N_QUERIES = 200
+TOP_K = 10
+BATCH_SIZE = 1000
+
+
+def make_dataset(n: int, seed: int = 42):
+    """Clustered synthetic embeddings so nearest neighbours are meaningful."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(n // 100, 1), DIM)).astype(np.float32)
+    labels = rng.integers(0, len(centers), size=n)
+    vectors = centers[labels] + 0.3 * rng.normal(size=(n, DIM)).astype(np.float32)
+    queries = centers[rng.integers(0, len(centers), size=N_QUERIES)]
+    queries = queries + 0.3 * rng.normal(size=queries.shape).astype(np.float32)
+    return vectors, queries
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    norm_vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    norm_queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    scores = norm_queries @ norm_vectors.T
+    return np.argsort(-scores, axis=1)[:, :TOP_K]
+
+
+def load(backend, vectors: np.ndarray):
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), BATCH_SIZE):
+        batch = vectors[offset:offset + BATCH_SIZE]
+        ids = list(range(offset, offset + len(batch)))
+        backend.upsert(ids, batch, [{"row": i} for i in ids])
+    return time.perf_counter() - start
+
+
+def run_queries(backend, queries: np.ndarray, truth: np.ndarray):
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        results = backend.search(query, limit=TOP_K)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len({r["id"] for r in results} & set(expected.tolist()))
+
+    latencies = np.asarray(latencies)
+    return {
+        "recall": hits / (len(queries) * TOP_K),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+    }
+
+
+def main():
+    """Compare backends and quantization modes for recall, latency and memory."""
+    for n in SIZES:
+        logger.info(f"\n📊 {n:,} vectors, {N_QUERIES} queries, recall@{TOP_K}")
+        vectors, queries = make_dataset(n)
+        truth = exact_top_k(vectors, queries)
+        float_bytes = n * DIM * 4
+
+        with tempfile.TemporaryDirectory() as tmp:
+            for mode in QUANTIZATION_MODES:
+                backends = {
+                    "numpy": NumpyBackend(f"benchmark_{n}", DIM, path=tmp, quantization=mode)
+                }
+                try:
+                    backends["qdrant"] = QdrantBackend(f"benchmark_{n}_{mode}", DIM, quantization=mode)
+                    backends["qdrant"].reset()
+                except Exception as e:
+                    logger.warning(f"Skipping Qdrant: {e}")
+
+                for name, backend in backends.items():
+                    load_seconds = load(backend, vectors)
+                    stats = run_queries(backend, queries, truth)
+                    memory = ""
+                    if name == "numpy":
+                        scanned = backend.memory_bytes()
+                        memory = f" | scan {scanned / 2**20:6.1f}MB ({float_bytes / scanned:4.1f}x smaller)"
+                    logger.info(
+                        f"{name:>7} {mode:>6}: load {load_seconds:6.1f}s | "
+                        f"recall {stats['recall']:.3f} | "
+                        f"p50 {stats['p50_ms']:6.2f}ms | p95 {stats['p95_ms']:6.2f}ms{memory}"
+                    )
+                    if name == "qdrant":
+                        backend.client.delete_collection(backend.collection_name)
+                    else:
+                        backend.reset()
+
+
+if __name__ == "__main__":
+    main()
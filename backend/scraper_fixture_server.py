@@ -0,0 +1,175 @@
+"""
+Local HTTP fixture server for the scholarship scraper.
+
+Serves listing pages shaped like each real source, with a configurable
+response delay and an optional number of 503s before success, then runs
+the scraper against them (no database writes) and compares the run time
+with the sum of the page delays. Each simulated host listens on its own
+port, since the scraper limits concurrency per host:port.
+
+Pages carry an ETag and Last-Modified and answer conditional requests with
+304, except every third source, which omits validators so repeat runs hit
+the content-hash path instead. Use --runs 2 to see the fetch cache work.
+
+    python scraper_fixture_server.py --sources 12 --hosts 6 --delay 1.0 --flaky 2
+    python scraper_fixture_server.py --runs 2 --flaky 0
+    python scraper_fixture_server.py --serve-only --port 8765
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+# Keep retries quick against the local server
+os.environ.setdefault("SCRAPER_RETRY_BASE_SECONDS", "0.1")
+# Start from an empty fetch cache rather than the app's
+os.environ.setdefault("SCRAPER_CACHE_DIR", tempfile.mkdtemp(prefix="scrape_cache_"))
+
+from app.services.scholarship_parsers import parse_scholarships_com, parse_findamasters, parse_profellows
+from app.services.scraper_service import ScholarshipScraper
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ITEMS_PER_PAGE = 20
+
+PAGES = {
+    "scholarships_com": (parse_scholarships_com, lambda i: (
+        f'<div class="scholarship-list-item"><a class="scholarship-name">Graduate Award {i}</a>'
+        f'<p class="scholarship-description">Merit scholarship number {i}</p>'
+        f'<span class="scholarship-amount">${1000 * i}</span>'
+        f'<span class="scholarship-deadline">March {i % 28 + 1}, 2027</span></div>'
+    )),
+    "findamasters": (parse_findamasters, lambda i: (
+        f'<div class="resultsRow"><h3>Research Masters Funding {i}</h3>'
+        f'<div class="descFrag">Funding for research-based masters {i}</div>'
+        f'<span class="fundingAmount">£{500 * i}</span><span class="country">UK</span></div>'
+    )),
+    "profellows": (parse_profellows, lambda i: (
+        f'<article class="fellowship"><h2>Global Fellowship {i}</h2>'
+        f'<div class="excerpt">Fellowship for graduate study {i}</div>'
+        f'<span class="award">${2000 * i}</span><span class="deadline">June 30, 2027</span></article>'
+    )),
+}
+
+
+LAST_MODIFIED = "Mon, 05 Oct 2026 09:00:00 GMT"
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """GET /<page>/<n>?delay=seconds&fail=k&validators=0|1 serves page n of
+    a listing type, answering 503 to the first k requests for that path."""
+
+    attempts: Counter = Counter()
+    lock = threading.Lock()
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        parts = url.path.strip("/").split("/")
+        if len(parts) != 2 or parts[0] not in PAGES:
+            self.send_error(404)
+            return
+
+        time.sleep(float(query.get("delay", ["0"])[0]))
+        with self.lock:
+            self.attempts[self.path] += 1
+            attempt = self.attempts[self.path]
+        if attempt <= int(query.get("fail", ["0"])[0]):
+            self.send_response(503)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+
+        _, render = PAGES[parts[0]]
+        body = "<html><body>" + "".join(render(i) for i in range(1, ITEMS_PER_PAGE + 1)) + "</body></html>"
+        data = body.encode("utf-8")
+        etag = '"' + hashlib.sha256(data).hexdigest()[:16] + '"'
+        validators = query.get("validators", ["1"])[0] == "1"
+        if validators and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        if validators:
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", port), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def fixture_sources(ports, count: int, delay: float, flaky: int):
+    names = list(PAGES)
+    sources = []
+    for n in range(count):
+        page = names[n % len(names)]
+        port = ports[n % len(ports)]
+        fail = flaky if n == 0 else 0
+        validators = 0 if n % 3 == 2 else 1
+        sources.append({
+            "name": f"fixture-{page}-{n}",
+            "url": f"http://127.0.0.1:{port}/{page}/{n}?delay={delay}&fail={fail}&validators={validators}",
+            "parser": PAGES[page][0],
+        })
+    return sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--sources", type=int, default=9)
+    parser.add_argument("--hosts", type=int, default=0, help="simulated hosts (default: one per source)")
+    parser.add_argument("--delay", type=float, default=1.0, help="seconds each page takes to respond")
+    parser.add_argument("--flaky", type=int, default=1, help="503s the first source returns before succeeding")
+    parser.add_argument("--runs", type=int, default=1, help="scrape runs, sharing one fetch cache")
+    parser.add_argument("--serve-only", action="store_true")
+    args = parser.parse_args()
+
+    ports = [args.port + i for i in range(args.hosts or args.sources)]
+    servers = [start_server(port) for port in ports]
+    logger.info(f"Fixture servers on 127.0.0.1 ports {ports[0]}-{ports[-1]}")
+    if args.serve_only:
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            return
+
+    scraper = ScholarshipScraper(fixture_sources(ports, args.sources, args.delay, args.flaky))
+    try:
+        for run in range(1, args.runs + 1):
+            started = time.perf_counter()
+            results = asyncio.run(scraper.scrape_sources())
+            elapsed = time.perf_counter() - started
+
+            found = sum(len(items) for _, items in results if items)
+            failed = sum(1 for _, items in results if items is None)
+            print(f"\nRun {run}: {args.sources} sources, {found} scholarships, {failed} failed")
+            print(f"Elapsed: {elapsed:.2f}s (sequential would be >= {args.sources * args.delay:.2f}s)")
+            print(f"Cache: {scraper.last_run_stats}")
+    finally:
+        scraper.shutdown()
+        for server in servers:
+            server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import asyncio
+import gc
+
+from app.services.llm_client import LLMClient
+from app.services.llm_providers import LLMProvider
+from app.services.llm_scheduler import LLMScheduler
+
+MESSAGES = [{"role": "user", "content": "Which countries have the cheapest masters programs?"}]
+
+
+class SlowProvider(LLMProvider):
+    """Answers after release() is called, counting upstream calls."""
+
+    def __init__(self, fail: bool = False):
+        self.calls = 0
+        self.fail = fail
+        self.released = asyncio.Event()
+
+    async def complete(self, model, messages, temperature, max_tokens) -> str:
+        self.calls += 1
+        await self.released.wait()
+        if self.fail:
+            raise RuntimeError("upstream failed")
+        return f"reply {self.calls}"
+
+
+def make_client(provider: LLMProvider) -> LLMClient:
+    client = LLMClient()
+    client.scheduler = LLMScheduler(requests_per_minute=0, tokens_per_minute=0)
+    client._provider = provider
+    return client
+
+
+async def test_coalescing():
+    print("Identical concurrent calls share one upstream call...")
+    provider = SlowProvider()
+    client = make_client(provider)
+    tasks = [asyncio.create_task(client.complete(MESSAGES, temperature=0.7)) for _ in range(5)]
+    # Same temperature bucket, so still the same call
+    tasks.append(asyncio.create_task(client.complete(MESSAGES, temperature=0.71)))
+    await asyncio.sleep(0.01)
+    provider.released.set()
+    replies = await asyncio.gather(*tasks)
+    assert provider.calls == 1 and set(replies) == {"reply 1"}, (provider.calls, replies)
+    assert not client._pending
+    print(f"✅ {len(tasks)} callers, {provider.calls} upstream call")
+
+    print("\nDifferent lanes or prompts are not coalesced...")
+    provider = SlowProvider()
+    client = make_client(provider)
+    provider.released.set()
+    await asyncio.gather(
+        client.complete(MESSAGES, lane="chat"),
+        client.complete(MESSAGES, lane="background"),
+        client.complete(MESSAGES + [{"role": "user", "content": "And in Europe?"}], lane="chat"),
+    )
+    assert provider.calls == 3, provider.calls
+    print("✅ 3 distinct calls reached the provider")
+
+
+async def test_cancellation():
+    print("\nCancelling one waiter doesn't affect the others...")
+    provider = SlowProvider()
+    client = make_client(provider)
+    first = asyncio.create_task(client.complete(MESSAGES))
+    second = asyncio.create_task(client.complete(MESSAGES))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    await asyncio.sleep(0.01)
+    provider.released.set()
+    assert await second == "reply 1"
+    assert first.cancelled() and provider.calls == 1
+    print("✅ Remaining waiter got the shared reply")
+
+    print("\nA failed call whose waiters all went away is not reported as unretrieved...")
+    unhandled = []
+    loop = asyncio.get_running_loop()
+    loop.set_exception_handler(lambda loop, context: unhandled.append(context["message"]))
+    provider = SlowProvider(fail=True)
+    client = make_client(provider)
+    waiters = [asyncio.create_task(client.complete(MESSAGES)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    provider.released.set()
+    await asyncio.sleep(0.01)
+    assert not client._pending
+    gc.collect()
+    await asyncio.sleep(0)
+    assert not unhandled, unhandled
+    print("✅ No 'exception was never retrieved' warnings")
+
+
+async def main():
+    await test_coalescing()
+    await test_cancellation()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
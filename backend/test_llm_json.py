@@ -0,0 +1,67 @@
+from app.services.llm_json import IncrementalJSONParser, loads_tolerant, parse_json_object
+
+ANALYSIS = """Sure! Here is the {analysis} you asked for:
+
+```json
+{
+  "overall_score": 82,
+  "strengths": ["Clear goals", "Relevant \\"hands-on\\" projects, e.g. {robotics}"],
+  "weaknesses": ["Too long",],
+  "suggestions": [{"section": "intro", "text": "Open with a hook"}],
+  "reading_level": "Graduate"
+}
+```
+Let me know if you need anything else."""
+
+
+def test_complete_output():
+    print("Checking parse_json_object on a fenced reply with prose around it...")
+    fields, malformed = parse_json_object(ANALYSIS)
+    assert malformed == [], malformed
+    assert fields["overall_score"] == 82
+    assert fields["strengths"][1] == 'Relevant "hands-on" projects, e.g. {robotics}'
+    assert fields["weaknesses"] == ["Too long"], "trailing comma should be tolerated"
+    assert fields["suggestions"][0]["section"] == "intro"
+    assert fields["reading_level"] == "Graduate"
+    print(f"✅ Parsed fields: {sorted(fields)}")
+
+
+def test_streaming():
+    print("\nChecking that any chunking yields the same fields, in order...")
+    expected, _ = parse_json_object(ANALYSIS)
+    for size in (1, 2, 3, 7, 64):
+        parser = IncrementalJSONParser()
+        seen = []
+        for i in range(0, len(ANALYSIS), size):
+            seen.extend(key for key, _ in parser.feed(ANALYSIS[i:i + size]))
+        # Every field completes before the closing brace, so close() adds nothing
+        assert parser.done
+        seen.extend(key for key, _ in parser.close())
+        assert parser.fields == expected, f"chunk size {size} differs"
+        assert seen == list(expected), seen
+    print("✅ Chunk sizes 1, 2, 3, 7 and 64 all agree")
+
+
+def test_bad_output():
+    print("\nChecking malformed and truncated replies...")
+    fields, malformed = parse_json_object('{"overall_score": 7O, "strengths": ["ok"]}')
+    assert fields == {"strengths": ["ok"]} and malformed == ["overall_score"]
+
+    fields, malformed = parse_json_object('{"overall_score": 75, "strengths": ["a", "b"]')
+    assert fields == {"overall_score": 75, "strengths": ["a", "b"]}, "truncated last field should be salvaged"
+
+    fields, malformed = parse_json_object('{"overall_score": 75, "strengths": ["a", "b')
+    assert fields == {"overall_score": 75} and malformed == []
+
+    fields, malformed = parse_json_object("I could not analyze this SOP.")
+    assert fields == {} and malformed == []
+
+    assert loads_tolerant("True") is True and loads_tolerant("None") is None
+    assert loads_tolerant('{"a": [1, 2,],}') == {"a": [1, 2]}
+    print("✅ Bad fields are reported without losing the good ones")
+
+
+if __name__ == "__main__":
+    test_complete_output()
+    test_streaming()
+    test_bad_output()
@@ -0,0 +1,106 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+from app.services.llm_scheduler import LLMScheduler, LLMOverloadedError
+
+
+async def test_lane_priority():
+    print("Waiting calls are granted chat first, background last...")
+    scheduler = LLMScheduler(max_concurrency=1, requests_per_minute=0, tokens_per_minute=0)
+    await scheduler.acquire("chat", 10)  # hold the only slot
+
+    granted = []
+
+    async def call(lane: str):
+        await scheduler.acquire(lane, 10)
+        granted.append(lane)
+
+    lanes = ["background", "sop_generation", "sop_analysis", "chat"]
+    tasks = []
+    for lane in lanes:
+        tasks.append(asyncio.create_task(call(lane)))
+        await asyncio.sleep(0.001)
+    for _ in lanes:
+        scheduler.release()
+        await asyncio.sleep(0.001)
+    await asyncio.gather(*tasks)
+    assert granted == ["chat", "sop_analysis", "sop_generation", "background"], granted
+    print(f"✅ Granted in order: {granted}")
+
+    print("\nA long-queued background call overtakes fresh chat calls...")
+    scheduler.aging_seconds = 0.01
+    granted.clear()
+    background = asyncio.create_task(call("background"))
+    await asyncio.sleep(0.1)  # worth 10 lanes of priority
+    chat = asyncio.create_task(call("chat"))
+    await asyncio.sleep(0.001)
+    scheduler.release()
+    scheduler.release()
+    await asyncio.gather(background, chat)
+    assert granted == ["background", "chat"], granted
+    print("✅ Aging let the background call through first")
+
+
+async def test_overload():
+    print("\nA full queue rejects new callers...")
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=2, requests_per_minute=0, tokens_per_minute=0)
+    await scheduler.acquire("chat", 10)
+    queued = [asyncio.create_task(scheduler.acquire("chat", 10)) for _ in range(2)]
+    await asyncio.sleep(0.001)
+    try:
+        await scheduler.acquire("chat", 10)
+        raise AssertionError("expected LLMOverloadedError")
+    except LLMOverloadedError:
+        pass
+    print("✅ Third waiter rejected")
+
+    print("\nA caller that waits past its lane's limit gives up...")
+    for task in queued:
+        task.cancel()
+    await asyncio.gather(*queued, return_exceptions=True)
+    assert scheduler.queue_depth() == 0
+    original = settings.LLM_MAX_WAIT_SECONDS
+    settings.LLM_MAX_WAIT_SECONDS = 0.05
+    try:
+        await scheduler.acquire("chat", 10)
+        raise AssertionError("expected LLMOverloadedError")
+    except LLMOverloadedError:
+        pass
+    finally:
+        settings.LLM_MAX_WAIT_SECONDS = original
+    assert scheduler.queue_depth() == 0 and scheduler._in_flight == 1
+    print("✅ Timed out and left the queue")
+
+    print("\nUnused reserved tokens go back to the bucket...")
+    scheduler = LLMScheduler(requests_per_minute=0, tokens_per_minute=6000)
+    await scheduler.acquire("chat", 1500)
+    scheduler.settle(1500, 300)
+    scheduler.release()
+    assert scheduler._tokens.tokens > 5600, scheduler._tokens.tokens
+    print(f"✅ {scheduler._tokens.tokens:.0f} of 6000 tokens available after a 300-token reply")
+
+
+def test_overload_response():
+    print("\nThe API answers LLMOverloadedError with 503...")
+
+    @app.get("/__test_llm_overloaded")
+    def overloaded():
+        raise LLMOverloadedError("Too many concurrent LLM requests")
+
+    response = TestClient(app).get("/__test_llm_overloaded")
+    assert response.status_code == 503, response.status_code
+    assert response.headers["Retry-After"] == "5"
+    print(f"✅ {response.status_code} {response.json()['detail']}")
+
+
+async def main():
+    await test_lane_priority()
+    await test_overload()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
+    test_overload_response()
@@ -0,0 +1,53 @@
+import asyncio
+from collections import Counter
+
+from scraper_fixture_server import start_server, fixture_sources  # points SCRAPER_CACHE_DIR at a temp dir
+from app.services.scraper_service import ScholarshipScraper
+
+SOURCES = 6
+
+
+class CountingScraper(ScholarshipScraper):
+    """Records which parsers ran; parsing itself still goes through the process pool."""
+
+    def __init__(self, sources):
+        super().__init__(sources)
+        self.parsed: Counter = Counter()
+
+    async def _parse(self, parser, html):
+        self.parsed[parser.__name__] += 1
+        return await super()._parse(parser, html)
+
+
+def test_cached_pages_skip_parsing():
+    server = start_server(0)
+    sources = fixture_sources([server.server_address[1]], SOURCES, delay=0, flaky=0)
+    scraper = CountingScraper(sources)
+    calls = scraper.parsed
+
+    try:
+        print("First run fetches and parses every page...")
+        results = asyncio.run(scraper.scrape_sources())
+        assert all(items for _, items in results), "every source should yield listings"
+        assert scraper.last_run_stats["changed"] == SOURCES, scraper.last_run_stats
+        assert sum(calls.values()) == SOURCES, calls
+        print(f"✅ {SOURCES} pages parsed: {scraper.last_run_stats}")
+
+        print("\nSecond run gets 304s or identical pages and parses nothing...")
+        calls.clear()
+        results = asyncio.run(scraper.scrape_sources())
+        stats = scraper.last_run_stats
+        with_validators = sum(1 for n in range(SOURCES) if n % 3 != 2)
+        assert stats["not_modified"] == with_validators, stats
+        assert stats["unchanged"] == SOURCES - with_validators, stats
+        assert stats["changed"] == 0, stats
+        assert not calls, f"parsers ran for {sorted(calls)}"
+        assert all(items == [] for _, items in results), results
+        print(f"✅ {stats['not_modified']} not modified, {stats['unchanged']} unchanged, 0 parsed")
+    finally:
+        scraper.shutdown()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    test_cached_pages_skip_parsing()
@@ -0,0 +1,70 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.session import Base
+from app import models  # noqa: F401 - registers every table on Base
+from app.models.scraper import ScrapedScholarship
+from app.services.scraper_service import scraper_service, title_hash
+
+SOURCE = {"name": "Test Scholarships", "url": "https://example.org/scholarships"}
+OTHER_SOURCE = {"name": "Other Scholarships", "url": "https://example.com/funding"}
+
+
+def listing(title: str, amount: str = "$10,000") -> dict:
+    return {"title": title, "description": f"About {title}", "amount": amount, "country": "USA"}
+
+
+def test_save_new():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+
+    try:
+        print("First run stores every distinct listing...")
+        first = [
+            listing("Fulbright Foreign Student Program"),
+            listing("Chevening Scholarship"),
+            listing("  chevening   SCHOLARSHIP "),  # same listing, differently formatted
+        ]
+        new = scraper_service._save_new(db, SOURCE, first)
+        db.commit()
+        assert [s["title"] for s in new] == ["Fulbright Foreign Student Program", "Chevening Scholarship"], new
+        print(f"✅ {len(new)} new, in-batch duplicate dropped")
+
+        print("\nSecond run only returns listings not seen before...")
+        second = [
+            listing("FULBRIGHT foreign student program", amount="$12,000"),
+            listing("DAAD Study Scholarship"),
+        ]
+        new = scraper_service._save_new(db, SOURCE, second)
+        db.commit()
+        assert [s["title"] for s in new] == ["DAAD Study Scholarship"], new
+        print("✅ Known listing skipped, new one stored")
+
+        print("\nThe same title from another source is a different listing...")
+        new = scraper_service._save_new(db, OTHER_SOURCE, [listing("Chevening Scholarship")])
+        db.commit()
+        assert len(new) == 1, new
+        print("✅ Stored under the other source")
+
+        assert scraper_service._save_new(db, SOURCE, first + second) == []
+        assert scraper_service._save_new(db, SOURCE, []) == []
+
+        rows = db.query(ScrapedScholarship).order_by(ScrapedScholarship.id).all()
+        assert len(rows) == 4
+        assert {(row.source_url, row.title_hash) for row in rows} == {
+            (SOURCE["url"], title_hash("Fulbright Foreign Student Program")),
+            (SOURCE["url"], title_hash("Chevening Scholarship")),
+            (SOURCE["url"], title_hash("DAAD Study Scholarship")),
+            (OTHER_SOURCE["url"], title_hash("Chevening Scholarship")),
+        }
+        # The first stored copy wins; later scrapes don't overwrite it
+        fulbright = next(row for row in rows if row.title.startswith("Fulbright"))
+        assert fulbright.amount == "$10,000" and fulbright.is_notified is False
+        print(f"\n✅ {len(rows)} rows in scraped_scholarships, no duplicates")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    test_save_new()
@@ -0,0 +1,48 @@
+import numpy as np
+
+from app.services.semantic_cache import SemanticCache
+
+DIM = 32
+
+
+def nearby(vector: np.ndarray, rng: np.random.Generator, noise: float) -> np.ndarray:
+    return vector + noise * rng.standard_normal(len(vector)).astype(np.float32)
+
+
+def test_semantic_cache():
+    rng = np.random.default_rng(3)
+    cache = SemanticCache(DIM, max_entries=3, threshold=0.9)
+    question = rng.standard_normal(DIM).astype(np.float32)
+
+    print("Empty cache misses...")
+    assert cache.get(question, [1, 2], version=1) is None
+    cache.put(question, [2, 1], version=1, answer="Answer A")
+    print("✅ Miss, then stored")
+
+    print("\nSimilar question over the same documents hits...")
+    assert cache.get(nearby(question, rng, 0.05), [1, 2], version=1) == "Answer A"
+    print("✅ Hit (doc id order doesn't matter)")
+
+    print("\nMisses that must not be answered from cache...")
+    assert cache.get(question, [1, 3], version=1) is None, "different retrieved documents"
+    assert cache.get(rng.standard_normal(DIM), [1, 2], version=1) is None, "unrelated question"
+    print("✅ Different documents and unrelated questions miss")
+
+    print("\nReindexing the knowledge base drops every entry...")
+    assert cache.get(question, [1, 2], version=2) is None
+    assert cache.get(question, [1, 2], version=1) is None, "old entries must not come back"
+    print("✅ Index version change invalidates the cache")
+
+    print("\nLeast recently used entry is evicted when full...")
+    questions = [rng.standard_normal(DIM).astype(np.float32) for _ in range(4)]
+    for i, q in enumerate(questions[:3]):
+        cache.put(q, [i], version=3, answer=f"Answer {i}")
+    assert cache.get(questions[0], [0], version=3) == "Answer 0"  # now most recent
+    cache.put(questions[3], [3], version=3, answer="Answer 3")
+    assert cache.get(questions[1], [1], version=3) is None
+    assert [cache.get(questions[i], [i], version=3) for i in (0, 2, 3)] == ["Answer 0", "Answer 2", "Answer 3"]
+    print("✅ Oldest unused entry evicted")
+
+
+if __name__ == "__main__":
+    test_semantic_cache()
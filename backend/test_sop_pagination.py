@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.config import settings
+from app.database.session import Base, get_db
+from app import models  # noqa: F401 - registers every table on Base
+from app.models.sop import SOP
+from app.models.user import User
+from app.api.deps import get_current_active_user
+from app.main import app
+
+
+def test_keyset_pagination():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    TestSession = sessionmaker(bind=engine)
+
+    db = TestSession()
+    db.add_all([
+        User(id=1, email="student@example.com", hashed_password="x", full_name="Student"),
+        User(id=2, email="other@example.com", hashed_password="x", full_name="Other"),
+    ])
+    # Batches of SOPs share a timestamp, as after a bulk import or batch generation
+    base = datetime(2026, 9, 1, 12, 0, 0)
+    for i in range(23):
+        db.add(SOP(
+            user_id=1, title=f"SOP {i}", content=f"Statement number {i}",
+            created_at=base + timedelta(minutes=i // 5), word_count=3
+        ))
+    db.add(SOP(user_id=2, title="Not mine", content="Someone else's statement", created_at=base))
+    db.commit()
+    expected = [
+        sop.id for sop in db.query(SOP).filter(SOP.user_id == 1).order_by(SOP.created_at.desc(), SOP.id.desc())
+    ]
+
+    def override_get_db():
+        session = TestSession()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_active_user] = lambda: db.get(User, 1)
+    client = TestClient(app)
+    url = f"{settings.API_V1_PREFIX}/sop/"
+
+    try:
+        for limit in (1, 4, 5, 23, 100):
+            seen, cursor, pages = [], None, 0
+            while True:
+                params = {"limit": limit}
+                if cursor:
+                    params["cursor"] = cursor
+                response = client.get(url, params=params)
+                assert response.status_code == 200, response.text
+                page = response.json()
+                seen.extend(item["id"] for item in page["items"])
+                pages += 1
+                cursor = page["next_cursor"]
+                if not cursor:
+                    break
+            assert seen == expected, f"limit {limit}: {seen}"
+            print(f"✅ limit={limit}: {len(seen)} SOPs in {pages} pages, each once, newest first")
+
+        response = client.get(url, params={"cursor": "not-a-cursor"})
+        assert response.status_code == 400
+        print("✅ Malformed cursor rejected with 400")
+    finally:
+        app.dependency_overrides.clear()
+        db.close()
+
+
+if __name__ == "__main__":
+    test_keyset_pagination()
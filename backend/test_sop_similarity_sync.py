@@ -0,0 +1,87 @@
+import hashlib
+import tempfile
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.config import settings
+from app.database.session import Base
+from app import models  # noqa: F401 - registers every table on Base
+from app.models.sop import SOPTemplate
+from app.services import sop_search_service as search_module
+from app.services.sop_search_service import SOPSearchService, TEMPLATE_ID_OFFSET, _content_hash
+from app.services.vector_service import VectorService
+
+TEMPLATES = {
+    "Computer Science": "I want to study computer science in Canada because of its research labs.",
+    "Finance": "My goal is a masters in finance in London to work in investment banking.",
+}
+
+
+class HashingModel:
+    """Bag-of-words embedding: texts sharing words land close together."""
+
+    def encode(self, text, convert_to_tensor=False):
+        if isinstance(text, list):
+            return np.stack([self.encode(t) for t in text])
+        vector = np.zeros(384, dtype=np.float32)
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.strip(".,").encode()).hexdigest(), 16) % 384] += 1
+        return vector / (np.linalg.norm(vector) or 1)
+
+
+def indexed_hash(service: SOPSearchService, template_id: int) -> str:
+    key = TEMPLATE_ID_OFFSET + template_id
+    return service.vectors.backend.retrieve([key])[key]["content_hash"]
+
+
+def test_template_resync():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    TestSession = sessionmaker(bind=engine)
+    search_module.SessionLocal = TestSession  # the background sync opens its own session
+
+    settings.VECTOR_BACKEND = "numpy"
+    settings.VECTOR_INDEX_PATH = tempfile.mkdtemp(prefix="sop_vectors_")
+    service = SOPSearchService()
+    service._vectors = VectorService(settings.SOP_SEARCH_COLLECTION, embedding_model=HashingModel(), keep_text=False)
+
+    db = TestSession()
+    try:
+        for name, text in TEMPLATES.items():
+            db.add(SOPTemplate(name=name, template_text=text))
+        db.commit()
+        cs, finance = db.query(SOPTemplate).order_by(SOPTemplate.id).all()
+
+        print("Templates are embedded on first sync...")
+        service._sync_template_vectors(db)
+        assert indexed_hash(service, cs.id) == _content_hash(cs.template_text)
+        print("✅ Both templates indexed with their content hash")
+
+        print("\nAn edit that keeps the text length still changes the signature...")
+        before = service._template_signature(db)
+        edited = cs.template_text.replace("Canada", "Sweden")
+        assert len(edited) == len(cs.template_text)
+        cs.template_text = edited
+        db.commit()
+        assert service._template_signature(db) != before
+        print("✅ Signature changed")
+
+        print("\nsimilar() schedules a resync that re-embeds the edited template...")
+        service.similar(db, user_id=1, text="studying in Sweden", kind="template")
+        service._sync_pool.submit(lambda: None).result()  # single worker: waits for the sync
+        assert indexed_hash(service, cs.id) == _content_hash(edited)
+        assert indexed_hash(service, finance.id) == _content_hash(finance.template_text)
+        results = service.similar(db, user_id=1, text="computer science in Sweden", kind="template")
+        assert results[0]["id"] == cs.id and "Sweden" in results[0]["snippet"], results
+        assert not service._sync_pending
+        print("✅ Edited template re-embedded and found by its new text")
+    finally:
+        db.close()
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    test_template_resync()
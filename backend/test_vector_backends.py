@@ -0,0 +1,83 @@
+import tempfile
+
+import numpy as np
+
+from app.services.vector_backends import NumpyBackend, matches_filters, QUANTIZATION_MODES
+
+DIM = 64
+COUNTRIES = ["USA", "UK", "Canada", "Germany"]
+FIELDS = ["Computer Science", "Data Science", "Finance", None]
+
+FILTERS = [
+    {"type": "program"},
+    {"type": "scholarship", "country": "UK"},
+    {"country": ["USA", "Canada"], "field": "Data Science"},
+    {"program_id": 3},
+    {"university": "Uni 2"},  # not an indexed field, checked per payload
+    {"country": "France"},  # value never indexed
+    {"type": "program", "country": []},
+]
+
+
+def make_payload(rng: np.random.Generator, doc_id: int) -> dict:
+    doc_type = "program" if doc_id % 3 else "scholarship"
+    payload = {"type": doc_type, "country": COUNTRIES[rng.integers(len(COUNTRIES))]}
+    if doc_type == "program":
+        payload["field"] = FIELDS[rng.integers(len(FIELDS))]
+        payload["program_id"] = int(rng.integers(6))
+        payload["university"] = f"Uni {rng.integers(4)}"
+    return payload
+
+
+def expected_ids(payloads: dict, filters: dict) -> set:
+    return {doc_id for doc_id, payload in payloads.items() if matches_filters(payload, filters)}
+
+
+def check(backend: NumpyBackend, payloads: dict, query: np.ndarray, label: str):
+    for filters in FILTERS:
+        wanted = expected_ids(payloads, filters)
+        results = backend.search(query, limit=len(payloads), filters=filters)
+        found = {r["id"] for r in results}
+        assert found == wanted, f"{label} {filters}: {len(found)} results, expected {len(wanted)}"
+        assert all(matches_filters(r["payload"], filters) for r in results)
+        scores = [r["score"] for r in results]
+        assert scores == sorted(scores, reverse=True)
+
+        top = backend.search(query, limit=5, filters=filters)
+        assert {r["id"] for r in top} <= wanted and len(top) == min(5, len(wanted))
+
+
+def test_filters():
+    rng = np.random.default_rng(5)
+    query = rng.standard_normal(DIM).astype(np.float32)
+
+    for quantization in QUANTIZATION_MODES:
+        print(f"\nQuantization: {quantization}")
+        with tempfile.TemporaryDirectory() as path:
+            backend = NumpyBackend("test_collection", DIM, path=path, quantization=quantization)
+            ids = list(range(500))
+            payloads = {doc_id: make_payload(rng, doc_id) for doc_id in ids}
+            vectors = rng.standard_normal((len(ids), DIM)).astype(np.float32)
+            backend.upsert(ids, vectors, [payloads[i] for i in ids])
+            check(backend, payloads, query, "after insert")
+            print(f"   ✅ {len(FILTERS)} filters match a payload scan over {backend.count()} rows")
+
+            # Re-tag some rows and delete others; masks must follow the moved rows
+            for doc_id in ids[:50]:
+                payloads[doc_id] = dict(payloads[doc_id], country="UK", type="scholarship")
+                payloads[doc_id].pop("program_id", None)
+            backend.upsert(ids[:50], vectors[:50], [payloads[i] for i in ids[:50]])
+            deleted = ids[100:400:3]
+            backend.delete(deleted)
+            for doc_id in deleted:
+                del payloads[doc_id]
+            check(backend, payloads, query, "after update/delete")
+            print(f"   ✅ Still exact after updating 50 and deleting {len(deleted)} rows")
+
+            reopened = NumpyBackend("test_collection", DIM, path=path, quantization=quantization)
+            check(reopened, payloads, query, "after reopen")
+            print("   ✅ Still exact after reopening from disk")
+
+
+if __name__ == "__main__":
+    test_filters()
@@ -55,6 +55,7 @@ const SOPTool = () => {
   
   // My SOPs Tab
   const [mySops, setMySops] = useState([]);
+  const [sopsCursor, setSopsCursor] = useState(null);
   const [viewDialog, setViewDialog] = useState(false);
   const [selectedSOP, setSelectedSOP] = useState(null);
   
@@ -74,22 +75,37 @@ const SOPTool = () => {
     }
   };
 
-  const loadMySops = async () => {
+  const loadMySops = async (cursor = null) => {
     try {
-      const response = await sopAPI.getSops();
-      setMySops(response.data);
+      const response = await sopAPI.getSops(cursor ? { cursor } : {});
+      const { items, next_cursor: nextCursor } = response.data;
+      setMySops((previous) => (cursor ? [...previous, ...items] : items));
+      setSopsCursor(nextCursor);
     } catch (error) {
       console.error('Error loading SOPs:', error);
     }
   };
 
+  // The list only carries summaries; fetch the full text when it's needed
+  const withContent = async (sop, action) => {
+    try {
+      const response = await sopAPI.getSop(sop.id);
+      action(response.data);
+    } catch (error) {
+      setMessage('❌ Error loading SOP');
+    }
+  };
+
   const handleGenerate = async () => {
     setLoading(true);
     setMessage('');
     try {
-      const response = await sopAPI.generate({
+      const { data: job } = await sopAPI.generate({
         program_id: selectedProgram || null,
       });
+      setMessage('⏳ Generating your SOP...');
+      const finished = await sopAPI.waitForJob(job.job_id);
+      const response = await sopAPI.getSop(finished.result.sop_id);
       setGeneratedSOP(response.data.content);
       setMessage('✅ SOP generated successfully!');
       loadMySops();
@@ -456,22 +472,19 @@ const SOPTool = () => {
                             )}
                             <Chip label={`${sop.word_count} words`} size="small" />
                           </Box>
-                          <Typography variant="body2" color="text.secondary" noWrap>
-                            {sop.content.substring(0, 100)}...
-                          </Typography>
                           <Box sx={{ mt: 2, display: 'flex', gap: 1 }}>
                             <Button
                               size="small"
-                              onClick={() => {
-                                setSelectedSOP(sop);
+                              onClick={() => withContent(sop, (full) => {
+                                setSelectedSOP(full);
                                 setViewDialog(true);
-                              }}
+                              })}
                             >
                               View
                             </Button>
                             <Button
                               size="small"
-                              onClick={() => handleDownload(sop.content, sop.title)}
+                              onClick={() => withContent(sop, (full) => handleDownload(full.content, full.title))}
                             >
                               Download
                             </Button>
@@ -480,6 +493,13 @@ const SOPTool = () => {
                       </Card>
                     </Grid>
                   ))}
+                  {sopsCursor && (
+                    <Grid item xs={12}>
+                      <Button variant="outlined" onClick={() => loadMySops(sopsCursor)}>
+                        Load more
+                      </Button>
+                    </Grid>
+                  )}
                 </Grid>
               )}
             </CardContent>
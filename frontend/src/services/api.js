@@ -105,10 +105,25 @@ export const sopAPI = {
   generate: (data) => api.post('/sop/generate', data),
   analyze: (data) => api.post('/sop/analyze', data),
   improve: (sopId) => api.post(`/sop/improve/${sopId}`),
-  getSops: () => api.get('/sop/'),
+  getJob: (jobId) => api.get(`/sop/jobs/${jobId}`),
+  // Poll a generate/improve job until it completes or fails
+  waitForJob: async (jobId, intervalMs = 1500) => {
+    for (;;) {
+      const { data: job } = await api.get(`/sop/jobs/${jobId}`);
+      if (job.status === 'completed') return job;
+      if (job.status === 'failed') throw new Error(job.error || 'Job failed');
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+  },
+  // Returns { items, next_cursor }; pass next_cursor as cursor for the next page
+  getSops: (params) => api.get('/sop/', { params }),
   getSop: (id) => api.get(`/sop/${id}`),
   updateSop: (id, data) => api.put(`/sop/${id}`, data),
   deleteSop: (id) => api.delete(`/sop/${id}`),
+  getVersions: (id) => api.get(`/sop/${id}/versions`),
+  getVersion: (id, version) => api.get(`/sop/${id}/versions/${version}`),
+  diffVersions: (id, fromVersion, toVersion) =>
+    api.get(`/sop/${id}/diff`, { params: { from_version: fromVersion, to_version: toVersion } }),
 };
 
 // Admission Prediction API